@@ -41,6 +41,6 @@ echo "💡 Next steps:"
 echo "  1. Add your Claude chat exports to the vault/ directory"
 echo "  2. Run: python src/index_conversations.py"
 echo "  3. Search: python src/search.py 'your query'"
-echo "  4. Web UI: streamlit run src/app.py"
+echo "  4. Web UI: streamlit run src/app_modern.py"
 echo ""
 echo "🌍 Web UI will be available at: http://localhost:8501"
\ No newline at end of file
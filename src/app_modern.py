@@ -12,17 +12,8 @@ import sys
 from datetime import datetime
 import json
 
-# Import your existing search functionality
-try:
-    from search import search_conversations
-    from index_conversations import load_vector_store
-except ImportError:
-    # Fallback if modules not found
-    def search_conversations(query, top_k=5):
-        return [{"content": f"Mock result for: {query}", "source": "demo.md", "score": 0.95}]
-    
-    def load_vector_store():
-        return None
+from search_engine import SearchEngine
+from search_filters import SearchFilters
 
 # 🎨 Page Config with French Coastal Theme
 st.set_page_config(
@@ -88,11 +79,20 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# 🧠 One engine (model, indexes, caches) shared by every session and rerun
+@st.cache_resource(show_spinner="🧠 Loading the embedding model and index...")
+def get_engine() -> SearchEngine:
+    return SearchEngine()
+
+engine = get_engine()
+
 # 🎯 Initialize Session State
 if 'search_history' not in st.session_state:
     st.session_state.search_history = []
 if 'total_searches' not in st.session_state:
     st.session_state.total_searches = 0
+if 'active_search' not in st.session_state:
+    st.session_state.active_search = None
 
 # 🎨 Main Header
 st.markdown("""
@@ -122,10 +122,11 @@ with col2:
     )
 
 with col3:
+    result_cache = engine.stats()['result_cache']
     ui.metric_card(
         title="Vector DB Status",
-        content="🟢 Active",
-        description="ChromaDB ready",
+        content="🟢 Active" if engine.ready else "🔴 Not indexed",
+        description=f"{result_cache['hits']} cached / {result_cache['misses']} fresh searches",
         key="metric3"
     )
 
@@ -208,18 +209,37 @@ if search_clicked and search_query:
         'timestamp': datetime.now(),
         'mode': search_mode
     })
-    
+    # Kept across reruns, so paging and the result buttons are served from the engine's cache
+    st.session_state.active_search = {
+        'query': search_query,
+        'mode': search_mode,
+        'time_filter': time_filter,
+        'page': 0
+    }
+
+active_search = st.session_state.active_search
+if active_search:
     # Show loading spinner
     with st.spinner('🔍 Searching Claude\'s memory...'):
         try:
             # Perform actual search
-            results = search_conversations(search_query, top_k=max_results)
+            results = engine.page(
+                active_search['query'],
+                active_search['page'],
+                per_page=max_results,
+                mode=active_search['mode'],
+                filters=SearchFilters.from_time_filter(active_search['time_filter'])
+            )
             
             if results:
                 # Success alert
                 ui.alert(
                     text=f"Found {len(results)} relevant conversations! 🎉",
-                    description="Results ranked by semantic similarity",
+                    description={
+                        "semantic": "Results ranked by semantic similarity",
+                        "keyword": "Results ranked by BM25 keyword match",
+                        "hybrid": "Results ranked by fused keyword and semantic rank",
+                    }.get(active_search['mode'], "Results ranked by semantic similarity"),
                     alert_type="default",
                     key="success_alert"
                 )
@@ -251,14 +271,31 @@ if search_clicked and search_query:
                                 st.write("Copied to clipboard!")
                         with col2:
                             if ui.button(text="🔗 View Full", key=f"view_{i}", variant="outline"):
-                                # Show full content in modal
+                                # Whole conversation via the turn index; just the chunk if the file changed
+                                turns = engine.attach_context([dict(result)], -1)[0].get('context')
+                                full_text = "\n\n".join(
+                                    f"**{turn['speaker'].title()}:** {turn['content']}" for turn in turns
+                                ) if turns else result.get('content', '')
                                 ui.alert_dialog(
                                     show=True,
                                     title="Full Conversation",
-                                    description=result.get('content', ''),
+                                    description=full_text,
                                     confirm_label="Close",
                                     key=f"modal_{i}"
                                 )
+                
+                # Pagination
+                col1, col2, col3 = st.columns([1, 2, 1])
+                with col1:
+                    if active_search['page'] > 0 and ui.button(text="⬅️ Previous", key="prev_page", variant="outline"):
+                        active_search['page'] -= 1
+                        st.rerun()
+                with col2:
+                    st.markdown(f"Page {active_search['page'] + 1}")
+                with col3:
+                    if len(results) == max_results and ui.button(text="Next ➡️", key="next_page", variant="outline"):
+                        active_search['page'] += 1
+                        st.rerun()
             else:
                 # No results alert
                 ui.alert(
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Benchmarks
+Measure indexing throughput, cold start, query latency and recall on synthetic vaults
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import EMBEDDING_MODEL, KEYWORD_INDEX_PATH, VECTOR_BACKEND
+from synthetic_vault import generate_vault, resolve_size, sample_queries
+
+SRC_DIR = Path(__file__).resolve().parent
+WARMUP_QUERIES = 5
+COLD_START_RUNS = 3
+TRUTH_BLOCK_ROWS = 65536
+
+# Modules that must not be imported before a search actually needs the model
+HEAVY_MODULES = ('torch', 'transformers', 'sentence_transformers', 'langchain', 'langchain_core',
+                 'langchain_huggingface', 'langchain_chroma', 'chromadb', 'numpy')
+
+# Metrics shown side by side by --compare: (path in the JSON report, higher is better)
+COMPARED_METRICS = [
+    ('stages.parse.per_sec', True),
+    ('stages.split.per_sec', True),
+    ('stages.embed.per_sec', True),
+    ('stages.write.per_sec', True),
+    ('cold_start.open_seconds', False),
+    ('cli_start.help_seconds', False),
+    ('cli_start.exact_seconds', False),
+    ('cli_start.keyword_seconds', False),
+    ('queries.semantic.p50_ms', False),
+    ('queries.semantic.p95_ms', False),
+    ('queries.semantic.p99_ms', False),
+    ('queries.keyword.p50_ms', False),
+    ('queries.keyword.p99_ms', False),
+    ('queries.hybrid.p50_ms', False),
+    ('queries.hybrid.p99_ms', False),
+    ('queries.exact.p50_ms', False),
+    ('queries.exact.p99_ms', False),
+    ('recall.value', True),
+]
+
+
+class HashedEmbeddings:
+    """Deterministic stand-in for the model: a random vector per token, summed
+
+    Texts that share words get similar vectors, so nearest-neighbour structure
+    and recall are meaningful, but 1M chunks embed in minutes instead of hours.
+    Use it to measure the index and search, not the model.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._tokens: Dict[str, np.ndarray] = {}
+
+    def _token(self, token: str) -> np.ndarray:
+        vector = self._tokens.get(token)
+        if vector is None:
+            rng = np.random.default_rng(zlib.crc32(token.encode('utf-8')))
+            vector = self._tokens[token] = rng.standard_normal(self.dim).astype(np.float32)
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            vector += self._token(token.strip('.,:;!?()`\'"'))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def _rate(count: int, seconds: float) -> Dict[str, float]:
+    return {'count': count, 'seconds': seconds, 'per_sec': count / seconds if seconds > 0 else 0.0}
+
+
+def _percentiles(latencies: Sequence[float]) -> Dict[str, float]:
+    ms = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'count': len(ms), 'mean_ms': float(ms.mean()), 'p50_ms': float(p50),
+            'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+
+def measure_parsing(loader, files: List[Path]) -> Dict[str, Any]:
+    """Time turn parsing and chunk splitting separately, without embedding"""
+    parse_seconds = split_seconds = 0.0
+    turns = chunks = size = 0
+
+    for path in files:
+        size += path.stat().st_size
+        start = time.perf_counter()
+        with open(path, encoding='utf-8') as f:
+            file_turns = list(loader._iter_conversation_turns(f, path.stat().st_mtime))
+        parse_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for turn in file_turns:
+            chunks += len(loader.splitter.split_text(turn['content']))
+        split_seconds += time.perf_counter() - start
+        turns += len(file_turns)
+
+    parse = _rate(turns, parse_seconds)
+    parse['mb_per_sec'] = size / 2 ** 20 / parse_seconds if parse_seconds > 0 else 0.0
+    return {'parse': parse, 'split': _rate(chunks, split_seconds), 'bytes': size, 'chunks': chunks}
+
+
+class GroundTruth:
+    """Every written vector, kept on disk for brute-force top-k"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.ids: List[np.ndarray] = []
+        self.dim = 0
+        self.matrix: Optional[np.memmap] = None
+        self.id_array: Optional[np.ndarray] = None
+
+    def add(self, ids: Sequence[str], vectors: Sequence[Sequence[float]]):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.dim = matrix.shape[1]
+        self.file.write((matrix / np.where(norms == 0, 1.0, norms)).tobytes())
+        self.ids.append(np.asarray(ids, dtype='S40'))
+
+    def finish(self):
+        self.file.close()
+        self.id_array = np.concatenate(self.ids) if self.ids else np.zeros(0, dtype='S40')
+        if len(self.id_array):
+            self.matrix = np.memmap(self.path, dtype=np.float32, mode='r',
+                                    shape=(len(self.id_array), self.dim))
+
+    def top_k(self, query: Sequence[float], k: int) -> List[str]:
+        q = np.asarray(query, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = np.empty(len(self.id_array), dtype=np.float32)
+        for start in range(0, len(scores), TRUTH_BLOCK_ROWS):
+            block = self.matrix[start:start + TRUTH_BLOCK_ROWS]
+            scores[start:start + len(block)] = block @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [doc_id.decode('ascii') for doc_id in self.id_array[top]]
+
+
+def build_index(loader, files: List[Path], embedder, backend: str, quantization: Optional[str],
+                batch_size: int, workers: int, truth: GroundTruth, shards: int = 1) -> Dict[str, Any]:
+    """Index the vault through the real embedding pipeline, timing each store"""
+    from embedding_pipeline import run_pipeline
+    from index_conversations import document_id
+    from keyword_index import KeywordIndex
+    from vector_store import open_vector_store, publish_index
+
+    store = open_vector_store(backend, embedder, writable=True, quantization=quantization, shards=shards)
+    keyword_index = KeywordIndex.load(KEYWORD_INDEX_PATH)
+    timings = {'vector_store': 0.0, 'keyword_index': 0.0}
+
+    def documents():
+        for path in files:
+            yield from loader.iter_file_documents(path)
+
+    def write(batch, vectors):
+        ids = [document_id(doc) for doc in batch]
+        texts = [doc.page_content for doc in batch]
+        metadatas = [doc.metadata for doc in batch]
+
+        start = time.perf_counter()
+        store.add(ids, vectors, texts, metadatas)
+        timings['vector_store'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        keyword_index.add(ids, texts, metadatas)
+        timings['keyword_index'] += time.perf_counter() - start
+
+        truth.add(ids, vectors)
+
+    in_process = workers <= 1 or isinstance(embedder, HashedEmbeddings)
+    report = run_pipeline(
+        documents(), write, EMBEDDING_MODEL,
+        embed=embedder.embed_documents if in_process else None,
+        batch_size=batch_size,
+        workers=1 if in_process else workers
+    )
+
+    start = time.perf_counter()
+    store.save()
+    keyword_index.save()
+    timings['save'] = time.perf_counter() - start
+    truth.finish()
+    publish_index(store, backend=backend, model=EMBEDDING_MODEL, dim=truth.dim,
+                  quantization=getattr(store, 'quantization', 'none'), shards=shards)
+
+    chunks = report.chunks
+    return {
+        'embed': _rate(chunks, report.stages['embed'].seconds),
+        'write': _rate(chunks, report.stages['write'].seconds),
+        'write_vector_store': _rate(chunks, timings['vector_store']),
+        'write_keyword_index': _rate(chunks, timings['keyword_index']),
+        'save_seconds': timings['save'],
+        'pipeline': report.as_dict(),
+        'store': store,
+        'keyword_index': keyword_index,
+    }
+
+
+_COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+from search import load_vector_store, load_keyword_index
+imported = time.perf_counter()
+store = load_vector_store(backend={backend!r})
+opened = time.perf_counter()
+keyword_index = load_keyword_index()
+loaded = time.perf_counter()
+model = None
+if {with_model!r}:
+    from search import load_embedder
+    load_embedder(use_cache=False).embed_query("warm up")
+    model = time.perf_counter() - loaded
+print(json.dumps({{'import_seconds': imported - start, 'open_seconds': opened - imported,
+                  'keyword_seconds': loaded - opened, 'model_seconds': model}}))
+"""
+
+
+def measure_cold_start(backend: str, with_model: bool) -> Dict[str, Any]:
+    """Median of fresh-interpreter runs: imports, opening the indexes, loading the model"""
+    script = _COLD_START_SCRIPT.format(src=str(SRC_DIR), backend=backend, with_model=with_model)
+    runs = []
+    for _ in range(COLD_START_RUNS):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True,
+                                text=True, check=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        run['process_seconds'] = time.perf_counter() - start
+        runs.append(run)
+
+    result = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        result[key] = float(np.median(values)) if values else None
+    return result
+
+
+_IMPORT_CHECK_SCRIPT = """
+import json, sys
+sys.path.insert(0, {src!r})
+import search
+print(json.dumps(sorted(name for name in {modules!r} if name in sys.modules)))
+"""
+
+
+def measure_cli_start(query: str) -> Dict[str, Any]:
+    """Wall time of whole search.py invocations that should never load the model
+
+    Also records which heavy modules a bare ``import search`` pulls in; the
+    list should stay empty.
+    """
+    cli = [sys.executable, str(SRC_DIR / "search.py")]
+    commands = {
+        'help_seconds': cli + ['--help'],
+        'exact_seconds': cli + [query, '--mode', 'exact', '--no-daemon'],
+        'keyword_seconds': cli + [query, '--mode', 'keyword', '--no-daemon'],
+    }
+    result: Dict[str, Any] = {}
+    for key, command in commands.items():
+        runs = []
+        for _ in range(COLD_START_RUNS):
+            start = time.perf_counter()
+            subprocess.run(command, capture_output=True, check=True)
+            runs.append(time.perf_counter() - start)
+        result[key] = float(np.median(runs))
+
+    script = _IMPORT_CHECK_SCRIPT.format(src=str(SRC_DIR), modules=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+    result['heavy_modules_on_import'] = json.loads(output)
+    return result
+
+
+def measure_queries(store, keyword_index, embedder, queries: List[str], k: int) -> Dict[str, Any]:
+    """Latency per search mode, measured through run_search like the CLI"""
+    from search import run_search, load_substring_index
+
+    substring_index = load_substring_index()
+    results = {}
+    for mode in ('semantic', 'keyword', 'hybrid', 'exact'):
+        index = substring_index if mode == 'exact' else keyword_index
+        latencies = []
+        for i, query in enumerate(queries):
+            # Exact mode looks for the first word, as a typed identifier would be
+            text = query.split()[0] if mode == 'exact' else query
+            start = time.perf_counter()
+            run_search(store, text, k, float('-inf'), mode, index, None, embedder)
+            if i >= WARMUP_QUERIES:
+                latencies.append(time.perf_counter() - start)
+        results[mode] = _percentiles(latencies)
+    substring_index.close()
+    return results
+
+
+def measure_recall(store, embedder, truth: GroundTruth, queries: List[str], k: int) -> Dict[str, Any]:
+    """Recall@k of the vector store against brute force over every written vector"""
+    found = expected = 0
+    for query in queries:
+        vector = embedder.embed_query(query)
+        exact = set(truth.top_k(vector, k))
+        returned = {doc_id for doc_id, _, _, _ in store.search(vector, k)}
+        found += len(exact & returned)
+        expected += len(exact)
+    return {'k': k, 'queries': len(queries), 'value': found / expected if expected else 1.0}
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'commit': commit,
+    }
+
+
+def run_benchmark(chunks: int, workdir: Path, backend: str = VECTOR_BACKEND,
+                  quantization: Optional[str] = None, embedder_name: str = "model",
+                  batch_size: int = 256, workers: int = 1, query_count: int = 200,
+                  k: int = 5, seed: int = 0, shards: int = 1) -> Dict[str, Any]:
+    """Generate a vault in workdir, index it there and measure everything"""
+    from index_conversations import ClaudeChatLoader
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    previous_cwd = os.getcwd()
+    # config paths are relative, so the benchmark index lives under workdir/data
+    os.chdir(workdir)
+    try:
+        for stale in ("vault", "data"):
+            shutil.rmtree(stale, ignore_errors=True)
+
+        print(f"📝 Generating synthetic vault ({chunks:,} chunks)...")
+        start = time.perf_counter()
+        corpus = generate_vault(Path("vault"), chunks, seed)
+        corpus['generate_seconds'] = time.perf_counter() - start
+
+        loader = ClaudeChatLoader("vault")
+        files = loader.list_files()
+
+        print("⏱️ Parsing and splitting...")
+        parsing = measure_parsing(loader, files)
+        corpus['chunks'] = parsing['chunks']
+
+        if embedder_name == "hashed":
+            embedder = HashedEmbeddings()
+        else:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            embedder = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+        print(f"🧠 Embedding and writing ({embedder_name} embeddings, {backend} backend)...")
+        truth = GroundTruth(workdir / "truth.f32")
+        indexing = build_index(loader, files, embedder, backend, quantization, batch_size, workers, truth,
+                               shards)
+        store = indexing.pop('store')
+        keyword_index = indexing.pop('keyword_index')
+
+        print("🧊 Measuring cold start...")
+        cold_start = measure_cold_start(backend, with_model=embedder_name == "model")
+        cli_start = measure_cli_start(sample_queries(1, seed + 2)[0])
+        if cli_start['heavy_modules_on_import']:
+            print(f"⚠️ 'import search' loaded: {', '.join(cli_start['heavy_modules_on_import'])}")
+
+        print(f"🔎 Running {query_count} queries per mode...")
+        queries = sample_queries(query_count + WARMUP_QUERIES, seed + 1)
+        latency = measure_queries(store, keyword_index, embedder, queries, k)
+        recall = measure_recall(store, embedder, truth, queries[WARMUP_QUERIES:], k)
+        store.close()
+    finally:
+        os.chdir(previous_cwd)
+
+    return {
+        'config': {
+            'chunks_target': chunks, 'backend': backend, 'quantization': quantization or 'none',
+            'embedder': embedder_name, 'model': EMBEDDING_MODEL, 'batch_size': batch_size,
+            'workers': workers, 'queries': query_count, 'k': k, 'seed': seed, 'shards': shards,
+        },
+        'environment': environment(),
+        'corpus': corpus,
+        'stages': {
+            'parse': parsing['parse'],
+            'split': parsing['split'],
+            **indexing,
+        },
+        'cold_start': cold_start,
+        'cli_start': cli_start,
+        'queries': latency,
+        'recall': recall,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def _lookup(report: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = report
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """Summary table, with the change against a previous run if given"""
+    print(f"\n📊 {report['corpus']['chunks']:,} chunks, {report['config']['backend']} backend, "
+          f"{report['config']['embedder']} embeddings")
+    print("=" * 60)
+    for path, higher_is_better in COMPARED_METRICS:
+        value = _lookup(report, path)
+        if value is None:
+            continue
+        line = f"{path:32} {value:12.3f}"
+        old = _lookup(baseline, path) if baseline else None
+        if old:
+            change = (value - old) / old * 100
+            mark = '✅' if (change > 0) == higher_is_better else '⚠️'
+            line += f"   {old:12.3f}  {change:+6.1f}% {mark if abs(change) >= 0.1 else ''}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark indexing and search on a synthetic vault",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python src/benchmark.py --chunks 1k
+  python src/benchmark.py --chunks 100k --embedder hashed --backend flat
+  python src/benchmark.py --chunks 1m --embedder hashed --backend flat --quantization int8
+  python src/benchmark.py --chunks 1k --compare benchmark-1k.json --output after.json
+        """
+    )
+    parser.add_argument("--chunks", default="1k", help="Vault size: 1k, 10k, 100k, 1m or a number (default: 1k)")
+    parser.add_argument("--backend", choices=("chroma", "flat"), default=VECTOR_BACKEND,
+                        help=f"Vector store to benchmark (default: {VECTOR_BACKEND})")
+    parser.add_argument("--quantization", choices=("none", "int8", "binary"), default=None,
+                        help="Flat backend only: first-pass encoding")
+    parser.add_argument("--embedder", choices=("model", "hashed"), default="model",
+                        help="model (the real sentence-transformer) or hashed (fast, model-free vectors "
+                             "for measuring the index at 100k+ chunks) (default: model)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Embedding batch size (default: 256)")
+    parser.add_argument("--workers", type=int, default=1, help="Embedding worker processes (default: 1)")
+    parser.add_argument("--shards", type=int, default=1, help="Vector store shards (default: 1)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per search mode (default: 200)")
+    parser.add_argument("--k", type=int, default=5, help="Results per query and recall cutoff (default: 5)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the vault (default: 0)")
+    parser.add_argument("--workdir", help="Where to build the vault and index (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the work directory afterwards")
+    parser.add_argument("--output", help="JSON report path (default: benchmark-<chunks>.json)")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    chunks = resolve_size(args.chunks)
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    output = Path(args.output or f"benchmark-{args.chunks}.json").absolute()
+    baseline = json.loads(Path(args.compare).read_text(encoding='utf-8')) if args.compare else None
+
+    try:
+        report = run_benchmark(chunks, workdir.absolute(), args.backend, args.quantization, args.embedder,
+                               args.batch_size, args.workers, args.queries, args.k, args.seed, args.shards)
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print_report(report, baseline)
+    print(f"\n💾 Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Chunk Metadata
+Interned, one-array-per-field chunk metadata shared by the flat store and keyword index
+"""
+
+import json
+import mmap
+import os
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from search_filters import SearchFilters
+
+# Fields every chunk carries, in the order the loader writes them
+FIELDS = ('source', 'filename', 'conversation_id', 'speaker', 'conversation_turn', 'chunk_id',
+          'total_chunks', 'timestamp', 'conversation_timestamp', 'char_start', 'char_end')
+
+# (column, typecode), widest first so every column of a mapped file stays
+# aligned; 'file', 'conversation' and 'speaker' are codes into the interned tables
+_COLUMNS = (
+    ('timestamp', 'd'), ('conversation_timestamp', 'd'),
+    ('char_start', 'Q'), ('char_end', 'Q'),
+    ('file', 'I'), ('conversation', 'I'), ('conversation_turn', 'I'), ('chunk_id', 'I'),
+    ('total_chunks', 'I'),
+    ('speaker', 'B'),
+)
+_HEADER = array('Q', [0, 0]).itemsize * 2
+
+
+class ChunkMetadata:
+    """Metadata of one stored chunk, read like the dict the loader produced
+
+    Built from the columns only for the hits being returned, with slots
+    instead of a per-chunk dict.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for field in FIELDS:
+            setattr(self, field, values.get(field))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in FIELDS else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in FIELDS
+
+    def keys(self) -> Tuple[str, ...]:
+        return FIELDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def __repr__(self) -> str:
+        return f"ChunkMetadata({self.to_dict()!r})"
+
+
+class MetadataColumns:
+    """Per-chunk metadata as one array per field
+
+    Source paths, conversation IDs and speakers are interned into tables, so
+    a row costs 49 bytes however long its path is. Rows are addressed by the owner's row or
+    document number. ``mask`` evaluates SearchFilters over whole columns with
+    NumPy; ``accept`` checks single rows, for callers that only visit a few
+    and should not pay for importing NumPy.
+    """
+
+    def __init__(self, sources: Optional[List[str]] = None, speakers: Optional[List[str]] = None,
+                 conversations: Optional[List[str]] = None):
+        for name, typecode in _COLUMNS:
+            setattr(self, name, array(typecode))
+        self.sources: List[str] = sources or []
+        self.speakers: List[str] = speakers or []
+        # Conversation UUIDs of account exports; markdown files have ''
+        self.conversations: List[str] = conversations or []
+        self._source_ids = {source: i for i, source in enumerate(self.sources)}
+        self._conversation_ids = {conversation: i for i, conversation in enumerate(self.conversations)}
+        self._views: List[memoryview] = []
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getstate__(self):
+        return {'columns': {name: getattr(self, name) for name, _ in _COLUMNS},
+                'sources': self.sources, 'speakers': self.speakers,
+                'conversations': self.conversations}
+
+    def __setstate__(self, state):
+        # Pickles from before conversation IDs lack the table; their version check rejects them
+        self.__init__(state['sources'], state['speakers'], state.get('conversations'))
+        for name, column in state['columns'].items():
+            setattr(self, name, column)
+
+    # Updates
+
+    def _intern(self, value: str, table: List[str]) -> int:
+        try:
+            return table.index(value)
+        except ValueError:
+            table.append(value)
+            return len(table) - 1
+
+    def append(self, metadata: Dict[str, Any]):
+        source = metadata.get('source', '')
+        file_id = self._source_ids.get(source)
+        if file_id is None:
+            file_id = self._source_ids[source] = len(self.sources)
+            self.sources.append(source)
+        self.file.append(file_id)
+        conversation = metadata.get('conversation_id') or ''
+        conversation_id = self._conversation_ids.get(conversation)
+        if conversation_id is None:
+            conversation_id = self._conversation_ids[conversation] = len(self.conversations)
+            self.conversations.append(conversation)
+        self.conversation.append(conversation_id)
+        self.speaker.append(self._intern(metadata.get('speaker', 'unknown'), self.speakers))
+        self.timestamp.append(float(metadata.get('timestamp') or 0.0))
+        self.conversation_timestamp.append(float(metadata.get('conversation_timestamp') or 0.0))
+        for name in ('conversation_turn', 'chunk_id', 'total_chunks', 'char_start', 'char_end'):
+            getattr(self, name).append(int(metadata.get(name) or 0))
+
+    def truncate(self, count: int):
+        """Drop rows from count on"""
+        for name, _ in _COLUMNS:
+            del getattr(self, name)[count:]
+
+    def take(self, rows: Iterable[int]) -> "MetadataColumns":
+        """Copy of the given rows, in order, with the same string tables"""
+        taken = MetadataColumns(list(self.sources), list(self.speakers), list(self.conversations))
+        rows = list(rows)
+        for name, _ in _COLUMNS:
+            column, out = getattr(self, name), getattr(taken, name)
+            out.extend(column[row] for row in rows)
+        return taken
+
+    # Reads
+
+    def row(self, row: int) -> ChunkMetadata:
+        source = self.sources[self.file[row]]
+        return ChunkMetadata(
+            source=source,
+            filename=os.path.basename(source),
+            conversation_id=self.conversations[self.conversation[row]],
+            speaker=self.speakers[self.speaker[row]],
+            conversation_turn=self.conversation_turn[row],
+            chunk_id=self.chunk_id[row],
+            total_chunks=self.total_chunks[row],
+            timestamp=self.timestamp[row],
+            conversation_timestamp=self.conversation_timestamp[row],
+            char_start=self.char_start[row],
+            char_end=self.char_end[row]
+        )
+
+    def file_ids(self, filename: str) -> List[int]:
+        """Codes of every source with this file name"""
+        return [i for i, source in enumerate(self.sources) if os.path.basename(source) == filename]
+
+    def mask(self, filters: Optional[SearchFilters], count: Optional[int] = None):
+        """NumPy bool array over the first count rows, or None when nothing is filtered"""
+        if not filters:
+            return None
+        import numpy as np
+
+        n = len(self) if count is None else count
+        mask = np.ones(n, dtype=bool)
+        if not n:
+            return mask
+
+        def column(name: str, typecode: str):
+            return np.frombuffer(getattr(self, name), dtype=typecode, count=n)
+
+        if filters.since is not None:
+            mask &= column('timestamp', 'd') >= filters.since
+        if filters.until is not None:
+            mask &= column('timestamp', 'd') <= filters.until
+        if filters.speaker is not None:
+            if filters.speaker not in self.speakers:
+                return np.zeros(n, dtype=bool)
+            mask &= column('speaker', 'B') == self.speakers.index(filters.speaker)
+        if filters.filename is not None:
+            file_ids = self.file_ids(filters.filename)
+            if not file_ids:
+                return np.zeros(n, dtype=bool)
+            mask &= np.isin(column('file', 'I'), file_ids)
+        return mask
+
+    def accept(self, filters: Optional[SearchFilters]) -> Optional[Callable[[int], bool]]:
+        """Per-row filter predicate, or None when nothing is filtered"""
+        if not filters:
+            return None
+        speaker = file_ids = None
+        if filters.speaker is not None:
+            if filters.speaker not in self.speakers:
+                return lambda row: False
+            speaker = self.speakers.index(filters.speaker)
+        if filters.filename is not None:
+            file_ids = set(self.file_ids(filters.filename))
+            if not file_ids:
+                return lambda row: False
+
+        since, until = filters.since, filters.until
+        times, speakers, files = self.timestamp, self.speaker, self.file
+
+        def accept(row: int) -> bool:
+            return ((since is None or times[row] >= since)
+                    and (until is None or times[row] <= until)
+                    and (speaker is None or speakers[row] == speaker)
+                    and (file_ids is None or files[row] in file_ids))
+        return accept
+
+    # Persistence
+
+    def tables(self) -> Dict[str, List[str]]:
+        return {'sources': self.sources, 'speakers': self.speakers, 'conversations': self.conversations}
+
+    def write_columns(self, f, count: Optional[int] = None):
+        """Write the first count rows of every column back to back"""
+        n = len(self) if count is None else count
+        for name, _ in _COLUMNS:
+            column = getattr(self, name)
+            f.write(memoryview(column)[:n].tobytes() if n < len(column) else column.tobytes())
+
+    @classmethod
+    def map_columns(cls, view: memoryview, position: int, count: int,
+                    tables: Dict[str, List[str]]) -> Tuple["MetadataColumns", int]:
+        """Columns read in place from a buffer written by write_columns; returns the end position
+
+        The views must be released with release() before the buffer is closed.
+        """
+        columns = cls(tables['sources'], tables['speakers'], tables['conversations'])
+        for name, typecode in _COLUMNS:
+            size = array(typecode).itemsize * count
+            raw = view[position:position + size]
+            cast = raw.cast(typecode)
+            setattr(columns, name, cast)
+            columns._views += [raw, cast]
+            position += size
+        return columns, position
+
+    def release(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+
+    def save(self, path: Path, count: Optional[int] = None):
+        """Write a standalone metadata file: header, columns, then the string tables"""
+        n = len(self) if count is None else count
+        tmp_path = Path(path).with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            table_start = _HEADER + sum(array(typecode).itemsize * n for _, typecode in _COLUMNS)
+            array('Q', [n, table_start]).tofile(f)
+            self.write_columns(f, n)
+            f.write(json.dumps(self.tables(), ensure_ascii=False).encode('utf-8'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, writable: bool = False) -> "MetadataColumns":
+        """Open a file written by save(): mapped in place, or copied into growable arrays"""
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return cls()
+
+        count, table_start = array('Q', mapped[:_HEADER])
+        tables = json.loads(mapped[table_start:])
+        if writable:
+            columns = cls(tables['sources'], tables['speakers'], tables['conversations'])
+            position = _HEADER
+            for name, typecode in _COLUMNS:
+                size = array(typecode).itemsize * count
+                getattr(columns, name).frombytes(mapped[position:position + size])
+                position += size
+            mapped.close()
+            return columns
+
+        view = memoryview(mapped)
+        columns, _ = cls.map_columns(view, _HEADER, count, tables)
+        # The views keep the map alive until release()
+        columns._views.insert(0, view)
+        return columns
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Account Export Reader
+Stream conversations and messages out of Claude's conversations.json without loading it whole
+"""
+
+import hashlib
+import json
+from typing import Any, Container, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from search_filters import parse_timestamp
+
+# Characters read per block; a conversation larger than this just takes more reads
+READ_BLOCK = 1 << 20
+
+_WHITESPACE = ' \t\r\n'
+
+# An error this close to the end of the buffer may just be a value cut off there
+_TRUNCATION_MARGIN = 6
+_SENDERS = {'human': 'human', 'user': 'human', 'assistant': 'claude', 'claude': 'claude'}
+
+
+def read_blocks(f: TextIO, size: int = READ_BLOCK) -> Iterator[str]:
+    """A text file as fixed-size blocks"""
+    return iter(lambda: f.read(size), '')
+
+
+def iter_json_array(blocks: Iterable[str]) -> Iterator[Any]:
+    """Decode the items of a top-level JSON array one at a time
+
+    ``blocks`` is the document in pieces, e.g. read_blocks(f). Only the item
+    being decoded and the unread rest of the buffer are held, so memory is
+    bounded by the largest item rather than the document. An item that does
+    not fit in the buffer doubles it before the next attempt, which keeps
+    re-decoding a large item linear overall. A syntax error is raised as soon
+    as it is found, without reading the rest of the document.
+    """
+    decoder = json.JSONDecoder()
+    blocks = iter(blocks)
+    buffer = ''
+    position = 0
+
+    def fill(target: int = 0) -> bool:
+        """Drop what was consumed and read until at least target characters are unread"""
+        nonlocal buffer, position
+        pending = [buffer[position:]]
+        unread = len(pending[0])
+        read_any = False
+        while not read_any or unread < target:
+            block = next(blocks, None)
+            if block is None:
+                break
+            pending.append(block)
+            unread += len(block)
+            read_any = True
+        buffer, position = ''.join(pending), 0
+        return read_any
+
+    def peek() -> Optional[str]:
+        """Next non-whitespace character, reading more as needed; None at the end"""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return None
+
+    if peek() != '[':
+        raise ValueError("expected a JSON array of conversations")
+    position += 1
+    if peek() == ']':
+        return
+
+    while True:
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError as e:
+                # Only a value cut off by the end of the buffer fails there (or
+                # as a string that never closes); anything earlier is malformed
+                truncated = (e.pos >= len(buffer) - _TRUNCATION_MARGIN
+                             or e.msg.startswith('Unterminated string'))
+                if not truncated or not fill(2 * (len(buffer) - position)):
+                    raise
+        position = end
+        yield item
+
+        separator = peek()
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f"expected ',' or ']' between conversations, found {separator!r}")
+        position += 1
+        peek()
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Text of one chat message; newer exports keep it in typed content parts"""
+    text = message.get('text') or ''
+    if text.strip():
+        return text
+    parts = [part.get('text') or '' for part in message.get('content') or []
+             if isinstance(part, dict) and part.get('type') == 'text']
+    return '\n\n'.join(part for part in parts if part)
+
+
+def iter_conversations(blocks: Iterable[str]) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """(ID, version, conversation) for every conversation in an account export
+
+    The ID is the conversation's UUID (its position for exports without
+    one); the version is a digest of everything in it, so a conversation
+    that was continued or edited gets a new one.
+    """
+    for position, conversation in enumerate(iter_json_array(blocks)):
+        if not isinstance(conversation, dict):
+            continue
+        conversation_id = str(conversation.get('uuid') or f"conversation-{position}")
+        encoded = json.dumps(conversation, sort_keys=True, ensure_ascii=False)
+        version = hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:16]
+        yield conversation_id, version, conversation
+
+
+def conversation_versions(blocks: Iterable[str]) -> Dict[str, str]:
+    """Version of every conversation in an export, by ID"""
+    return {conversation_id: version for conversation_id, version, _ in iter_conversations(blocks)}
+
+
+def iter_export_turns(blocks: Iterable[str], fallback_timestamp: float = 0.0,
+                      versions: Optional[Dict[str, str]] = None,
+                      skip: Container[str] = ()) -> Iterator[Dict[str, Any]]:
+    """Turns of every conversation in an account export, in file order
+
+    The turns have the same shape as the markdown parser's, plus the
+    conversation's ID and 'turn', the message's index within it. Offsets are
+    relative to the message text, since the file holds it JSON-escaped.
+    ``versions`` receives every conversation's version; conversations in
+    ``skip`` yield no turns.
+    """
+    for conversation_id, version, conversation in iter_conversations(blocks):
+        if versions is not None:
+            versions[conversation_id] = version
+        if conversation_id in skip:
+            continue
+        conversation_timestamp = (parse_timestamp(str(conversation.get('created_at') or ''))
+                                  or fallback_timestamp)
+        for turn, message in enumerate(conversation.get('chat_messages') or []):
+            content = message_text(message)
+            stripped = content.strip()
+            if not stripped:
+                continue
+            start = len(content) - len(content.lstrip())
+            yield {
+                'content': stripped,
+                'speaker': _SENDERS.get(str(message.get('sender') or '').lower(), 'unknown'),
+                'timestamp': parse_timestamp(str(message.get('created_at') or '')) or conversation_timestamp,
+                'conversation_timestamp': conversation_timestamp,
+                'conversation_id': conversation_id,
+                'turn': turn,
+                'start': start,
+                'end': start + len(stripped)
+            }
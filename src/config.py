@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Configuration
+Shared paths and model settings for the indexer, CLI and web UI
+"""
+
+from pathlib import Path
+
+# Embedding model used for both indexing and queries
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Fast, good quality
+# EMBEDDING_MODEL = "all-mpnet-base-v2"  # Slower, better quality
+
+# Longest input the model reads before truncating (its max_seq_length); turns are
+# chunked to this many tokens of the model's own tokenizer, with some overlap
+EMBEDDING_MAX_TOKENS = 256  # all-mpnet-base-v2: 384
+CHUNK_OVERLAP_TOKENS = 25
+
+# Where Claude chat exports live: markdown chats, and account exports
+# (conversations.json from Settings > Export data), streamed without loading whole
+VAULT_PATH = Path("vault")
+VAULT_PATTERNS = ("*.md", "conversations*.json")
+
+# Where the index lives; Chroma is written to a new chroma_db.g<N> by every
+# indexing pass, and INDEX_INFO_PATH names the one searches should open
+DATA_DIR = Path("data")
+DB_PATH = DATA_DIR / "chroma_db"
+MANIFEST_PATH = DATA_DIR / "index_manifest.json"
+
+# Unix socket of the warm search daemon (python src/search_daemon.py)
+SOCKET_PATH = DATA_DIR / "search.sock"
+
+# Local HTTP/JSON search API (python src/search_api.py)
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+
+# Persistent embedding cache, keyed by model name and normalized chunk text
+EMBEDDING_CACHE_DIR = DATA_DIR / "embedding_cache"
+EMBEDDING_CACHE_MAX_MB = 512
+QUERY_CACHE_MAX_MB = 64
+
+# In-memory caches of the shared SearchEngine behind the web UI: query vectors
+# and result lists, both emptied when the indexer publishes a new generation
+ENGINE_VECTOR_CACHE_SIZE = 1024
+ENGINE_RESULT_CACHE_SIZE = 256
+
+# BM25 inverted index for keyword and hybrid search
+KEYWORD_INDEX_PATH = DATA_DIR / "keyword_index"
+
+# Vector store backend: "chroma" (HNSW, SQLite) or "flat" (exact search over a
+# memory-mapped NumPy matrix). The indexer records its choice in INDEX_INFO_PATH.
+VECTOR_BACKEND = "chroma"
+FLAT_DB_PATH = DATA_DIR / "flat_db"
+FLAT_DTYPE = "float32"  # or "float16" to halve disk and RAM
+FLAT_QUANTIZATION = "none"  # "int8" (4x) or "binary" (32x) first pass, rescored at full precision
+INDEX_INFO_PATH = DATA_DIR / "index_info.json"
+# Held by whichever indexer or compaction run is writing the index
+INDEX_LOCK_PATH = DATA_DIR / "index.lock"
+
+# Vector store shards (index_conversations.py --shards N); each vault file lives
+# in one shard under SHARDS_PATH/NN, queries fan out to all of them
+SHARDS = 1
+SHARDS_PATH = DATA_DIR / "shards"
+
+# SimHash fingerprints of stored chunks and the near-duplicate copies folded into them
+DEDUP_INDEX_PATH = DATA_DIR / "dedup_index"
+
+# Byte offsets of every turn and chunk, for expanding results to their context
+TURN_INDEX_PATH = DATA_DIR / "turn_index.bin"
+
+# Single-file, memory-mappable copy of the index for serving on other machines
+# (index_conversations.py --export-snapshot, search.py --snapshot)
+SNAPSHOT_PATH = DATA_DIR / "index.snapshot"
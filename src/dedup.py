@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Near-Duplicate Detection
+SimHash fingerprints with LSH banding, so repeated chunks are embedded and stored once
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+DEDUP_VERSION = 1
+
+FINGERPRINT_BITS = 64
+
+# Chunks whose fingerprints differ in at most this many bits are duplicates.
+# With BANDS > MAX_DISTANCE, two such fingerprints always agree on a whole
+# band (pigeonhole), so band lookups find every match.
+MAX_DISTANCE = 3
+BANDS = 4
+BAND_BITS = FINGERPRINT_BITS // BANDS
+
+# Word shingle length; chunks shorter than MIN_NEAR_TOKENS only match exactly,
+# since a few changed words move a short text's fingerprint by little
+SHINGLE = 3
+MIN_NEAR_TOKENS = 24
+
+_TOKEN = re.compile(r'\w+')
+
+# Metadata kept for every collapsed copy, enough to show and open it
+LOCATION_FIELDS = ('source', 'filename', 'conversation_id', 'speaker', 'conversation_turn',
+                   'chunk_id', 'timestamp', 'char_start', 'char_end')
+
+
+def simhash(text: str) -> Tuple[int, int]:
+    """(64-bit SimHash of the text's word shingles, number of words)"""
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) >= SHINGLE:
+        shingles = [' '.join(tokens[i:i + SHINGLE]) for i in range(len(tokens) - SHINGLE + 1)]
+    else:
+        shingles = [' '.join(tokens)]
+
+    digests = b''.join(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+                       for shingle in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), FINGERPRINT_BITS)
+    # Majority vote per bit position
+    votes = bits.sum(axis=0, dtype=np.int32) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes).tobytes(), 'big'), len(tokens)
+
+
+def _bands(fingerprint: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(fingerprint >> (band * BAND_BITS)) & mask for band in range(BANDS)]
+
+
+class NearDuplicateIndex:
+    """Fingerprints of every stored chunk, plus the copies collapsed into each
+
+    ``fingerprints.json`` maps stored chunk IDs to their fingerprint and
+    file; it is only read by the indexer. ``duplicates.json`` maps a stored
+    chunk ID to the locations of its collapsed copies and is what search
+    reads to show them.
+    """
+
+    def __init__(self, path: Path, max_distance: int = MAX_DISTANCE):
+        self.path = Path(path)
+        self.max_distance = max_distance
+        self.fingerprints: Dict[str, Tuple[int, str]] = {}
+        self.duplicates: Dict[str, List[Dict[str, Any]]] = {}
+        self.bands: List[Dict[int, List[str]]] = [{} for _ in range(BANDS)]
+        self.saved_embeddings = 0
+
+    @property
+    def fingerprints_file(self) -> Path:
+        return self.path / "fingerprints.json"
+
+    @property
+    def duplicates_file(self) -> Path:
+        return self.path / "duplicates.json"
+
+    @classmethod
+    def load(cls, path: Path) -> "NearDuplicateIndex":
+        index = cls(path)
+        if not index.fingerprints_file.exists():
+            return index
+        data = json.loads(index.fingerprints_file.read_text(encoding='utf-8'))
+        if data.get('version') != DEDUP_VERSION:
+            # Unknown layout: start over, every chunk is then treated as new
+            return index
+        for doc_id, (fingerprint, source) in data['fingerprints'].items():
+            index._register(doc_id, int(fingerprint, 16), source)
+        if index.duplicates_file.exists():
+            index.duplicates = json.loads(index.duplicates_file.read_text(encoding='utf-8'))
+        return index
+
+    def save(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        fingerprints = {doc_id: [f"{fingerprint:016x}", source]
+                        for doc_id, (fingerprint, source) in self.fingerprints.items()}
+        for target, data in ((self.fingerprints_file, {'version': DEDUP_VERSION, 'fingerprints': fingerprints}),
+                             (self.duplicates_file, self.duplicates)):
+            tmp_path = target.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(data, separators=(',', ':')), encoding='utf-8')
+            os.replace(tmp_path, target)
+
+    def _register(self, doc_id: str, fingerprint: int, source: str):
+        self.fingerprints[doc_id] = (fingerprint, source)
+        for table, key in zip(self.bands, _bands(fingerprint)):
+            table.setdefault(key, []).append(doc_id)
+
+    def match(self, fingerprint: int, tokens: int) -> Optional[str]:
+        """ID of a stored chunk within the distance limit, if any"""
+        limit = self.max_distance if tokens >= MIN_NEAR_TOKENS else 0
+        for table, key in zip(self.bands, _bands(fingerprint)):
+            for doc_id in table.get(key, ()):
+                entry = self.fingerprints.get(doc_id)
+                if entry is not None and bin(entry[0] ^ fingerprint).count('1') <= limit:
+                    return doc_id
+        return None
+
+    def check(self, doc_id: str, text: str, metadata: Dict[str, Any]) -> Optional[str]:
+        """Stored chunk this one duplicates, or None after registering it as new
+
+        A duplicate is recorded as a location of the chunk it matched and
+        must not be embedded or stored.
+        """
+        fingerprint, tokens = simhash(text)
+        original = self.match(fingerprint, tokens)
+        if original is None:
+            self._register(doc_id, fingerprint, metadata.get('source', ''))
+            return None
+
+        location = {field: metadata.get(field) for field in LOCATION_FIELDS}
+        location['id'] = doc_id
+        self.duplicates.setdefault(original, []).append(location)
+        self.saved_embeddings += 1
+        return original
+
+    def forget(self, sources: Iterable[str], ids: Iterable[str] = ()) -> Set[str]:
+        """Drop everything recorded for these files before they are re-indexed
+
+        ``ids`` are single chunks to drop, for a file that is only partly
+        re-indexed. Returns the other files holding copies of chunks that are
+        now gone: those copies were never stored, so their files must be
+        re-indexed too.
+        """
+        sources = set(sources)
+        ids = set(ids)
+        orphaned: Set[str] = set()
+
+        def dropped(doc_id: str, source: str) -> bool:
+            return source in sources or doc_id in ids
+
+        for original in list(self.duplicates):
+            locations = [loc for loc in self.duplicates[original]
+                         if not dropped(loc.get('id'), loc['source'])]
+            if dropped(original, self.fingerprints.get(original, (0, None))[1]):
+                orphaned.update(loc['source'] for loc in locations)
+                locations = []
+            if locations:
+                self.duplicates[original] = locations
+            else:
+                del self.duplicates[original]
+
+        gone = {doc_id for doc_id, (_, source) in self.fingerprints.items() if dropped(doc_id, source)}
+        for doc_id in gone:
+            del self.fingerprints[doc_id]
+        if gone:
+            for table in self.bands:
+                for key in list(table):
+                    kept = [doc_id for doc_id in table[key] if doc_id not in gone]
+                    if kept:
+                        table[key] = kept
+                    else:
+                        del table[key]
+
+        return orphaned - sources
+
+    def copies(self) -> int:
+        return sum(len(locations) for locations in self.duplicates.values())
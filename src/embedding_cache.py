@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Embedding Cache
+Persistent, size-capped cache of vectors keyed by model and normalized text
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_MB
+
+try:
+    import fcntl
+except ImportError:  # Windows - no advisory locks, run single-writer by convention
+    fcntl = None
+
+KEY_BYTES = 16
+EVICT_FRACTION = 0.1
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a chunk: NFC unicode, collapsed whitespace"""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    """128-bit key for a (model, normalized text) pair"""
+    digest = hashlib.blake2b(digest_size=KEY_BYTES)
+    digest.update(model_name.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_text(text).encode('utf-8'))
+    return digest.digest()
+
+
+class EmbeddingCache:
+    """Vectors stored in a memory-mapped record file with an in-memory hash index
+
+    Each record holds its key next to its vector, so the index can be rebuilt
+    from the file alone and a slot can never be read back under the wrong key.
+    A parallel array of access ticks drives least-recently-used eviction once
+    the file reaches its size cap. Only one process may write at a time; any
+    other process opening the same cache gets a read-only view. Within a
+    process, threads share the cache under a lock.
+    """
+
+    def __init__(self, model_name: str, namespace: str = "documents",
+                 cache_dir: Path = EMBEDDING_CACHE_DIR,
+                 max_mb: int = EMBEDDING_CACHE_MAX_MB):
+        safe_model = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.path = Path(cache_dir) / f"{safe_model}-{namespace}"
+        self.model_name = model_name
+        self.max_bytes = max_mb * 1024 * 1024
+        self.records = None
+        self.ticks = None
+        self.slots: Dict[bytes, int] = {}
+        self.free: List[int] = []
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.writable = False
+        self._lock_file = None
+        # Slots, free list and clock are shared by the daemon's request threads
+        self.lock = threading.RLock()
+
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            if meta.get('model') == model_name:
+                self._open(meta['dim'], meta['capacity'])
+
+    # Storage
+
+    def _acquire_write_lock(self) -> bool:
+        self.path.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            return True
+        self._lock_file = open(self.path / "lock", 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+
+    def _open(self, dim: int, capacity: Optional[int] = None):
+        """Map the record file, creating it if needed"""
+        record = np.dtype([('key', f'V{KEY_BYTES}'), ('vec', '<f4', (dim,))])
+        if capacity is None:
+            capacity = max(1, self.max_bytes // (record.itemsize + 8))
+
+        self.writable = self._acquire_write_lock()
+        records_path = self.path / "records.bin"
+        ticks_path = self.path / "ticks.bin"
+        exists = records_path.exists() and ticks_path.exists()
+
+        if not exists and not self.writable:
+            return
+
+        mode = ('r+' if exists else 'w+') if self.writable else 'r'
+        self.records = np.memmap(records_path, dtype=record, mode=mode, shape=(capacity,))
+        self.ticks = np.memmap(ticks_path, dtype='<i8', mode=mode, shape=(capacity,))
+        self.dim = dim
+
+        if not exists:
+            (self.path / "meta.json").write_text(json.dumps({
+                'model': self.model_name,
+                'dim': dim,
+                'capacity': capacity
+            }), encoding='utf-8')
+
+        # Rebuild the hash index from the keys stored in the file
+        keys = self.records['key']
+        occupied = keys != np.zeros(1, dtype=keys.dtype)[0]
+        for slot in np.flatnonzero(occupied):
+            self.slots[keys[slot].tobytes()] = int(slot)
+        self.free = np.flatnonzero(~occupied).tolist()[::-1]
+        self.clock = int(self.ticks.max()) + 1 if capacity else 0
+
+    def _evict(self):
+        """Drop the least recently used tenth of the cache"""
+        count = max(1, int(len(self.ticks) * EVICT_FRACTION))
+        victims = np.argpartition(self.ticks, count - 1)[:count]
+        keys = self.records['key']
+        for slot in victims:
+            self.slots.pop(keys[slot].tobytes(), None)
+        empty = np.zeros(1, dtype=self.records.dtype)[0]
+        self.records[victims] = empty
+        self.ticks[victims] = 0
+        self.free.extend(int(slot) for slot in victims)
+
+    # Public API
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, or None on a miss"""
+        found: List[Optional[np.ndarray]] = [None] * len(texts)
+        wanted = [cache_key(self.model_name, text) for text in texts]
+        with self.lock:
+            if self.records is None:
+                self.misses += len(texts)
+                return found
+
+            keys = self.records['key']
+            for i, key in enumerate(wanted):
+                slot = self.slots.get(key)
+                # Re-check the stored key: another process may have reused the slot
+                if slot is not None and keys[slot].tobytes() == key:
+                    found[i] = np.array(self.records['vec'][slot])
+                    if self.writable:
+                        self.ticks[slot] = self.clock
+                        self.clock += 1
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store freshly computed vectors"""
+        if not texts:
+            return
+        with self.lock:
+            if self.records is None:
+                self._open(len(vectors[0]))
+            if not self.writable or self.records is None:
+                return
+
+            for text, vector in zip(texts, vectors):
+                key = cache_key(self.model_name, text)
+                slot = self.slots.get(key)
+                if slot is None:
+                    if not self.free:
+                        self._evict()
+                    slot = self.free.pop()
+                    self.slots[key] = slot
+                self.records[slot] = (key, np.asarray(vector, dtype=np.float32))
+                self.ticks[slot] = self.clock
+                self.clock += 1
+
+    def flush(self):
+        with self.lock:
+            if self.writable and self.records is not None:
+                self.records.flush()
+                self.ticks.flush()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that consults an EmbeddingCache first
+
+    ``embedder`` may be a function returning the model, which is then only
+    called on the first cache miss: a search answered from the cache never
+    loads it.
+    """
+
+    def __init__(self, embedder: Union[Embeddings, Callable[[], Embeddings]], cache: EmbeddingCache):
+        self._embedder = embedder if isinstance(embedder, Embeddings) else None
+        self._load = None if isinstance(embedder, Embeddings) else embedder
+        self._load_lock = threading.Lock()
+        self.cache = cache
+
+    @property
+    def embedder(self) -> Embeddings:
+        if self._embedder is None:
+            with self._load_lock:
+                if self._embedder is None:
+                    self._embedder = self._load()
+        return self._embedder
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            computed = self.embedder.embed_documents([texts[i] for i in missing])
+            self.cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+        return [list(map(float, vector)) for vector in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        cached = self.cache.get_many([text])[0]
+        if cached is not None:
+            return cached.tolist()
+        vector = self.embedder.embed_query(text)
+        self.cache.put_many([text], [vector])
+        self.cache.flush()
+        return vector
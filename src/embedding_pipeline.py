@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Embedding Pipeline
+Stream chunks through batched, multi-process embedding into the vector store
+"""
+
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from metrics import METRICS
+
+DEFAULT_BATCH_SIZE = 256
+
+# Batches' worth of chunks sorted by length together, so each batch the
+# model sees pads to a similar length; 1 keeps stream order
+BUCKET_WINDOW = 8
+
+# Embedding function: list of texts -> list of vectors
+EmbedFn = Callable[[List[str]], List[List[float]]]
+# Writer: (documents, vectors) -> None
+WriteFn = Callable[[List[Document], List[List[float]]], None]
+
+
+def default_workers() -> int:
+    """Worker processes for a CPU-only box; each gets a share of the cores"""
+    cpus = os.cpu_count() or 1
+    return max(1, min(4, cpus // 2))
+
+
+def threads_per_worker(workers: int) -> int:
+    """Split the cores evenly so workers do not fight over them"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def iter_batches(documents: Iterable[Document], batch_size: int,
+                 window: int = 1) -> Iterator[List[Document]]:
+    """Group a stream of chunks into lists of at most batch_size
+
+    With a ``window`` above 1, that many batches' worth of chunks are read
+    at a time and sorted by text length before being cut into batches, so
+    short chunks are no longer padded to the length of long ones.
+    """
+    span = batch_size * max(1, window)
+    buffer: List[Document] = []
+    for doc in documents:
+        buffer.append(doc)
+        if len(buffer) >= span:
+            yield from _cut(buffer, batch_size, window > 1)
+            buffer = []
+    if buffer:
+        yield from _cut(buffer, batch_size, window > 1)
+
+
+def _cut(documents: List[Document], batch_size: int, by_length: bool) -> Iterator[List[Document]]:
+    if by_length:
+        documents.sort(key=lambda doc: len(doc.page_content))
+    for start in range(0, len(documents), batch_size):
+        yield documents[start:start + batch_size]
+
+
+class StageStats:
+    """Chunks processed and busy time for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.chunks = 0
+        self.seconds = 0.0
+
+    def add(self, chunks: int, seconds: float):
+        self.chunks += chunks
+        self.seconds += seconds
+
+    @property
+    def rate(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+
+class PipelineReport:
+    """Throughput of a pipeline run, per stage and end to end"""
+
+    def __init__(self, workers: int, threads: int, batch_size: int):
+        self.workers = workers
+        self.threads = threads
+        self.batch_size = batch_size
+        self.stages = {name: StageStats(name) for name in ('load', 'embed', 'write')}
+        self.wall_seconds = 0.0
+        self.cache_hits = 0
+        self.peak_rss_mb = 0.0
+        self.throttled = 0
+
+    @property
+    def chunks(self) -> int:
+        return self.stages['write'].chunks
+
+    def as_dict(self) -> Dict[str, float]:
+        report = {
+            'chunks': self.chunks,
+            'wall_seconds': self.wall_seconds,
+            'workers': self.workers,
+            'threads_per_worker': self.threads,
+            'batch_size': self.batch_size,
+            'cache_hits': self.cache_hits,
+            'peak_rss_mb': self.peak_rss_mb,
+            'throttled': self.throttled,
+        }
+        for stage in self.stages.values():
+            report[f'{stage.name}_seconds'] = stage.seconds
+            report[f'{stage.name}_chunks_per_sec'] = stage.rate
+        return report
+
+    def print(self):
+        print(f"⏱️ Pipeline: {self.chunks} chunks in {self.wall_seconds:.1f}s "
+              f"({self.workers} workers x {self.threads} threads, batch {self.batch_size})")
+        for stage in self.stages.values():
+            # Embed time is summed across workers, so its rate is per worker
+            per = " per worker" if stage.name == 'embed' and self.workers > 1 else ""
+            print(f"   {stage.name:<6} {stage.rate:10.1f} chunks/s{per} ({stage.seconds:.1f}s busy)")
+        if self.wall_seconds > 0:
+            print(f"   total  {self.chunks / self.wall_seconds:10.1f} chunks/s")
+        if self.cache_hits:
+            print(f"   cache  {self.cache_hits} of {self.chunks} chunks served from the embedding cache")
+        if self.peak_rss_mb:
+            print(f"   memory peak {self.peak_rss_mb:.0f} MB, throttled {self.throttled} times")
+
+
+# Worker process state - one model copy per process
+_worker_embed: Optional[EmbedFn] = None
+
+
+def _init_worker(model_name: str, num_threads: int):
+    """Load a private model copy with a bounded thread pool"""
+    global _worker_embed
+
+    # Must be set before torch initialises its thread pools
+    os.environ['OMP_NUM_THREADS'] = str(num_threads)
+    os.environ['MKL_NUM_THREADS'] = str(num_threads)
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+
+    import torch
+    torch.set_num_threads(num_threads)
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    _worker_embed = HuggingFaceEmbeddings(model_name=model_name).embed_documents
+
+
+def _embed_in_worker(texts: List[str]) -> Tuple[List[List[float]], float]:
+    start = time.perf_counter()
+    vectors = _worker_embed(texts)
+    return vectors, time.perf_counter() - start
+
+
+class _Batch:
+    """A batch on its way through the pipeline, with any cached vectors filled in"""
+
+    def __init__(self, documents: List[Document], cache):
+        self.documents = documents
+        texts = [doc.page_content for doc in documents]
+        cached = cache.get_many(texts) if cache else [None] * len(texts)
+        self.vectors: List[Any] = [None if v is None else v.tolist() for v in cached]
+        self.missing = [i for i, vector in enumerate(self.vectors) if vector is None]
+        self.missing_texts = [texts[i] for i in self.missing]
+
+    def fill(self, computed: List[List[float]], cache):
+        if cache:
+            cache.put_many(self.missing_texts, computed)
+        for i, vector in zip(self.missing, computed):
+            self.vectors[i] = vector
+
+
+def run_pipeline(documents: Iterable[Document],
+                 write: WriteFn,
+                 model_name: str,
+                 embed: Optional[EmbedFn] = None,
+                 cache=None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 workers: int = 1,
+                 threads: Optional[int] = None,
+                 max_in_flight: Optional[int] = None,
+                 max_memory_mb: Optional[float] = None,
+                 bucket_window: int = BUCKET_WINDOW) -> PipelineReport:
+    """Embed and store a stream of chunks
+
+    Stages: load (pull batches from ``documents``), embed (``workers``
+    processes, each with its own model copy, or ``embed`` in-process when
+    workers is 1) and write (a single thread calling ``write``). At most
+    ``max_in_flight`` batches are held in memory at once, and no new batch
+    is pulled while this process is above ``max_memory_mb`` until the ones
+    in flight have been written. Chunks found in ``cache`` (an
+    EmbeddingCache) skip the embed stage entirely. Chunks are length-bucketed
+    ``bucket_window`` batches at a time (see iter_batches), so ``write`` sees
+    them in that order rather than the order of ``documents``.
+    """
+    threads = threads or threads_per_worker(workers)
+    max_in_flight = max_in_flight or max(2, workers * 2)
+    report = PipelineReport(workers, threads, batch_size)
+    start = time.perf_counter()
+
+    # Writer stage runs in its own thread so storage overlaps embedding
+    write_queue: "queue.Queue" = queue.Queue(maxsize=max_in_flight)
+    write_errors: List[BaseException] = []
+
+    def writer():
+        while True:
+            item = write_queue.get()
+            if item is None:
+                return
+            batch, vectors = item
+            if write_errors:
+                write_queue.task_done()
+                continue
+            t0 = time.perf_counter()
+            try:
+                write(batch, vectors)
+                seconds = time.perf_counter() - t0
+                report.stages['write'].add(len(batch), seconds)
+                METRICS.observe('index_write', seconds)
+                METRICS.inc('chunks_indexed', len(batch))
+            except BaseException as e:
+                write_errors.append(e)
+            finally:
+                write_queue.task_done()
+
+    writer_thread = threading.Thread(target=writer, name="index-writer", daemon=True)
+    writer_thread.start()
+
+    batches = iter_batches(documents, batch_size, bucket_window)
+
+    def over_memory() -> bool:
+        rss = current_rss_mb()
+        if rss is None:
+            return False
+        report.peak_rss_mb = max(report.peak_rss_mb, rss)
+        return max_memory_mb is not None and rss > max_memory_mb
+
+    def next_batch() -> Optional[_Batch]:
+        if over_memory():
+            # Backpressure: let everything in flight reach storage first
+            report.throttled += 1
+            write_queue.join()
+        t0 = time.perf_counter()
+        documents = next(batches, None)
+        if documents is None:
+            return None
+        batch = _Batch(documents, cache)
+        report.stages['load'].add(len(documents), time.perf_counter() - t0)
+        report.cache_hits += len(documents) - len(batch.missing)
+        METRICS.inc('embedding_cache_hits', len(documents) - len(batch.missing))
+        return batch
+
+    try:
+        if workers <= 1:
+            while not write_errors:
+                batch = next_batch()
+                if batch is None:
+                    break
+                if batch.missing:
+                    if embed is None:
+                        _init_worker(model_name, threads)
+                        embed = _worker_embed
+                    t0 = time.perf_counter()
+                    batch.fill(embed(batch.missing_texts), cache)
+                    seconds = time.perf_counter() - t0
+                    report.stages['embed'].add(len(batch.missing), seconds)
+                    METRICS.observe('index_embed', seconds)
+                write_queue.put((batch.documents, batch.vectors))
+        else:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(model_name, threads)) as pool:
+                pending: List[Tuple[_Batch, Optional[Future]]] = []
+                exhausted = False
+                while pending or not exhausted:
+                    # Keep the pool fed without buffering the whole corpus
+                    while not exhausted and len(pending) < max_in_flight and not write_errors:
+                        if pending and over_memory():
+                            break
+                        batch = next_batch()
+                        if batch is None:
+                            exhausted = True
+                            break
+                        future = pool.submit(_embed_in_worker, batch.missing_texts) if batch.missing else None
+                        pending.append((batch, future))
+                    if not pending:
+                        break
+                    # Hand batches to the writer in submission order
+                    batch, future = pending.pop(0)
+                    if future is not None:
+                        vectors, seconds = future.result()
+                        batch.fill(vectors, cache)
+                        report.stages['embed'].add(len(batch.missing), seconds)
+                        METRICS.observe('index_embed', seconds)
+                    write_queue.put((batch.documents, batch.vectors))
+                    if write_errors:
+                        exhausted = True
+    finally:
+        write_queue.put(None)
+        writer_thread.join()
+        if cache:
+            cache.flush()
+
+    if write_errors:
+        raise write_errors[0]
+
+    report.wall_seconds = time.perf_counter() - start
+    return report
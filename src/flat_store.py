@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Flat Vector Store
+Exact or quantized search over a memory-mapped NumPy matrix; opens without SQLite or HNSW
+"""
+
+import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import FLAT_DB_PATH, FLAT_DTYPE, FLAT_QUANTIZATION
+from chunk_metadata import ChunkMetadata, MetadataColumns
+from keyword_index import map_snapshot, read_record
+from search_filters import SearchFilters
+
+STORE_VERSION = 3
+ID_DTYPE = 'S40'  # hex SHA-1 chunk IDs
+SCORE_BLOCK_ROWS = 65536
+
+# First-pass encodings: "none" scans the full vectors, "int8" one byte per
+# dimension (4x smaller than float32), "binary" one bit (32x smaller)
+QUANTIZATIONS = ("none", "int8", "binary")
+
+# Candidates rescored at full precision per requested result; sign bits lose
+# more ordering than int8 codes, so binary needs a deeper candidate list
+RESCORE_FACTOR = {'int8': 4, 'binary': 20}
+MIN_RESCORE = 50
+
+# Set bits in each byte value, for Hamming distances over packed sign bits
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+_COLUMNS = ('ids', 'alive', 'offsets', 'scales')
+# vectors.npy, rows.3.jsonl, ... - group 1 is the generation, absent for 0
+_DATA_FILE = re.compile(r'^(?:vectors|codes|columns|metadata|rows)(?:\.(\d+))?\.(?:npy|npz|bin|jsonl)$')
+
+# (id, text, metadata, relevance score)
+Hit = Tuple[str, str, ChunkMetadata, float]
+
+
+def relevance_from_cosine(cosine: np.ndarray) -> np.ndarray:
+    """Map cosine similarity to the relevance scale Chroma reports for L2 indexes
+
+    For unit vectors the squared L2 distance is 2 - 2cos, and LangChain turns a
+    Chroma distance d into 1 - d / sqrt(2). Using the same mapping keeps
+    --threshold meaning the same whichever backend built the index.
+    """
+    return 1.0 - (2.0 - 2.0 * cosine) / np.sqrt(2.0)
+
+
+class FlatVectorStore:
+    """Append-only vector matrix with tombstones and a row sidecar
+
+    Layout of the store directory:
+      vectors.npy   (capacity, dim) float32/float16, memory-mapped, rows L2-normalised
+      codes.npy     (capacity, width) int8 codes or packed sign bits, if quantized
+      columns.npz   per-row id, alive flag, text offset and int8 scale
+      metadata.bin  per-row metadata columns (MetadataColumns), filtered as masks
+      tables.json   row count, dimension, dtype and generation
+      rows.jsonl    chunk id and text, read by offset for returned hits only
+
+    Rows past the recorded count are ignored, and every file but the
+    append-only ones is replaced atomically on save, so readers never see a
+    half-written add. compact() writes the live rows to a new generation of
+    data files (vectors.1.npy, ...) that tables.json then points at.
+
+    When quantized, queries scan only codes.npy and rescore a short candidate
+    list against the full vectors, so just those rows of vectors.npy are paged in.
+    """
+
+    def __init__(self, path: Path = FLAT_DB_PATH, dtype: str = FLAT_DTYPE,
+                 quantization: str = FLAT_QUANTIZATION):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (choose from {', '.join(QUANTIZATIONS)})")
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.quantization = quantization
+        self.dim = 0
+        self.count = 0
+        # Bumped by compact(), which writes a fresh set of data files
+        self.generation = 0
+        self.vectors: Optional[np.memmap] = None
+        self.codes: Optional[np.memmap] = None
+        self.ids = np.zeros(0, dtype=ID_DTYPE)
+        self.alive = np.zeros(0, dtype=bool)
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.meta = MetadataColumns()
+        self._id_rows: Optional[Dict[bytes, int]] = None
+        self._rows_file = None
+        # rows.jsonl as of open(), for read-only stores
+        self._snapshot = None
+        self._writable = False
+
+    # Persistence
+
+    def _file(self, stem: str, suffix: str, generation: Optional[int] = None) -> Path:
+        """Data file of a generation; generation 0 keeps the original names"""
+        generation = self.generation if generation is None else generation
+        return self.path / (f"{stem}.{generation}{suffix}" if generation else f"{stem}{suffix}")
+
+    @property
+    def vectors_file(self) -> Path:
+        return self._file("vectors", ".npy")
+
+    @property
+    def codes_file(self) -> Path:
+        return self._file("codes", ".npy")
+
+    @property
+    def rows_file(self) -> Path:
+        return self._file("rows", ".jsonl")
+
+    @property
+    def metadata_file(self) -> Path:
+        return self._file("metadata", ".bin")
+
+    @property
+    def columns_file(self) -> Path:
+        return self._file("columns", ".npz")
+
+    @property
+    def code_width(self) -> int:
+        """Bytes per row in codes.npy"""
+        if self.quantization == "binary":
+            return (self.dim + 7) // 8
+        return self.dim if self.quantization == "int8" else 0
+
+    def exists(self) -> bool:
+        return (self.path / "tables.json").exists()
+
+    @classmethod
+    def open(cls, path: Path = FLAT_DB_PATH, writable: bool = False,
+             dtype: str = FLAT_DTYPE, quantization: Optional[str] = None) -> "FlatVectorStore":
+        """Map an existing store, or start an empty one if writable
+
+        Passing a quantization that differs from the stored one re-encodes the
+        codes from the full vectors (writable only); nothing is re-embedded.
+        """
+        store = cls(path, dtype, quantization or FLAT_QUANTIZATION)
+        store._writable = writable
+        if not store.exists():
+            if not writable:
+                raise FileNotFoundError(f"No flat vector store at {path}")
+            return store
+
+        try:
+            store._load(writable)
+        except FileNotFoundError:
+            if writable:
+                raise
+            # A compaction replaced the generation between reading tables.json
+            # and opening its files; the new one is complete, so read that
+            store = cls(path, dtype, quantization or FLAT_QUANTIZATION)
+            store._load(writable)
+
+        if quantization and quantization != store.quantization:
+            if not writable:
+                raise ValueError(f"Store is quantized as {store.quantization}, not {quantization}")
+            store.requantize(quantization)
+        return store
+
+    def _load(self, writable: bool):
+        tables = json.loads((self.path / "tables.json").read_text(encoding='utf-8'))
+        if tables.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported flat store version: {tables.get('version')}")
+        self.generation = tables.get('generation', 0)
+        self.dim = tables['dim']
+        self.count = tables['count']
+        self.dtype = np.dtype(tables['dtype'])
+        self.quantization = tables.get('quantization', 'none')
+        if not self.metadata_file.exists():
+            raise FileNotFoundError(f"Missing {self.metadata_file}")
+        self.meta = MetadataColumns.load(self.metadata_file, writable)
+        if writable:
+            # Metadata is saved first, so it may hold rows an interrupted save never published
+            self.meta.truncate(self.count)
+
+        with np.load(self.columns_file) as columns:
+            for name in _COLUMNS:
+                if name in columns:
+                    setattr(self, name, columns[name])
+        if len(self.scales) < self.count:
+            self.scales = np.ones(self.count, dtype=np.float32)
+
+        mode = 'r+' if writable else 'r'
+        # A store saved before its first add (e.g. an empty shard) has no matrices yet
+        if self.count or self.vectors_file.exists():
+            self.vectors = np.load(self.vectors_file, mmap_mode=mode)
+            if self.quantization != "none":
+                self.codes = np.load(self.codes_file, mmap_mode=mode)
+
+        if not writable:
+            self._snapshot = map_snapshot(self.rows_file)
+
+    def save(self):
+        """Flush vectors and text, then atomically publish the new row count"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        if self.vectors is not None:
+            self.vectors.flush()
+        if self.codes is not None:
+            self.codes.flush()
+        if self._rows_file is not None:
+            self._rows_file.flush()
+            os.fsync(self._rows_file.fileno())
+
+        n = self.count
+        self.meta.save(self.metadata_file, n)
+        tmp_columns = self.path / "columns.tmp.npz"
+        np.savez(tmp_columns, **{name: getattr(self, name)[:n] for name in _COLUMNS})
+        os.replace(tmp_columns, self.columns_file)
+
+        tmp_tables = self.path / "tables.json.tmp"
+        tmp_tables.write_text(json.dumps({
+            'version': STORE_VERSION,
+            'dim': self.dim,
+            'count': n,
+            'dtype': self.dtype.name,
+            'quantization': self.quantization,
+            'generation': self.generation
+        }), encoding='utf-8')
+        os.replace(tmp_tables, self.path / "tables.json")
+
+    def index_info(self) -> Dict[str, Any]:
+        """Nothing for index_info.json: tables.json names the current generation"""
+        return {}
+
+    def close(self):
+        if self._rows_file is not None:
+            self._rows_file.close()
+            self._rows_file = None
+        self._snapshot = None
+        if not self._writable:
+            self.meta.release()
+            self.meta = MetadataColumns()
+        self.vectors = None
+        self.codes = None
+
+    # Updates
+
+    def _grow(self, target: Path, matrix: Optional[np.memmap], capacity: int,
+              width: int, dtype) -> np.memmap:
+        """Copy the live rows of a matrix file into a larger one and remap it"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix('.tmp.npy')
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=(capacity, width))
+        if self.count and matrix is not None:
+            grown[:self.count] = matrix[:self.count]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, target)
+        return np.load(target, mmap_mode='r+')
+
+    def _reserve(self, extra: int):
+        """Make room for extra rows, doubling the matrices when they are full"""
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        needed = self.count + extra
+        if needed > capacity:
+            new_capacity = max(needed, capacity * 2, 1024)
+            self.vectors = self._grow(self.vectors_file, self.vectors, new_capacity, self.dim, self.dtype)
+            if self.quantization != "none":
+                code_dtype = np.int8 if self.quantization == "int8" else np.uint8
+                self.codes = self._grow(self.codes_file, self.codes, new_capacity, self.code_width, code_dtype)
+
+        if len(self.ids) < needed:
+            size = max(needed, 2 * len(self.ids), 1024)
+            for name in _COLUMNS:
+                column = getattr(self, name)
+                grown = np.zeros(size, dtype=column.dtype)
+                grown[:len(column)] = column
+                setattr(self, name, grown)
+
+    def _encode(self, matrix: np.ndarray) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """Quantize normalised rows: int8 with a per-row scale, or packed sign bits"""
+        if self.quantization == "int8":
+            peak = np.abs(matrix).max(axis=1)
+            scales = np.where(peak == 0, 1.0, peak / 127.0).astype(np.float32)
+            codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+            return codes, scales
+        ones = np.ones(len(matrix), dtype=np.float32)
+        if self.quantization == "binary":
+            return np.packbits(matrix > 0, axis=1), ones
+        return None, ones
+
+    def requantize(self, quantization: str):
+        """Switch encodings by re-encoding every row from the full vectors"""
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (choose from {', '.join(QUANTIZATIONS)})")
+        self.quantization = quantization
+        self.codes = None
+        if quantization == "none":
+            if self.codes_file.exists():
+                self.codes_file.unlink()
+            return
+        if self.vectors is None:
+            return
+
+        code_dtype = np.int8 if quantization == "int8" else np.uint8
+        self.codes = self._grow(self.codes_file, None, self.vectors.shape[0], self.code_width, code_dtype)
+        for start in range(0, self.count, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, self.count)
+            codes, scales = self._encode(self.vectors[start:end].astype(np.float32))
+            self.codes[start:end] = codes
+            self.scales[start:end] = scales
+
+    def _id_index(self) -> Dict[bytes, int]:
+        if self._id_rows is None:
+            live = np.flatnonzero(self.alive[:self.count])
+            self._id_rows = {self.ids[row]: int(row) for row in live}
+        return self._id_rows
+
+    def add(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+            texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        """Append rows; an ID that is already stored is replaced"""
+        if not ids:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if not self.dim:
+            self.dim = matrix.shape[1]
+        if matrix.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match store ({self.dim})")
+
+        self.delete(ids)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1.0, norms)
+
+        self._reserve(len(ids))
+        if self._rows_file is None:
+            self._rows_file = open(self.rows_file, 'ab')
+
+        start = self.count
+        self.vectors[start:start + len(ids)] = matrix.astype(self.dtype)
+        codes, scales = self._encode(matrix)
+        if codes is not None:
+            self.codes[start:start + len(ids)] = codes
+        self.scales[start:start + len(ids)] = scales
+        id_rows = self._id_index()
+
+        for i, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+            row = start + i
+            self.offsets[row] = self._rows_file.tell()
+            line = json.dumps({'id': doc_id, 'text': text}, ensure_ascii=False)
+            self._rows_file.write(line.encode('utf-8') + b'\n')
+            self.meta.append(metadata)
+
+            key = doc_id.encode('ascii')
+            self.ids[row] = key
+            self.alive[row] = True
+            id_rows[key] = row
+
+        self.count += len(ids)
+
+    def delete(self, ids: Sequence[str]):
+        """Tombstone rows; space is reclaimed by compaction"""
+        id_rows = self._id_index()
+        for doc_id in ids:
+            row = id_rows.pop(doc_id.encode('ascii'), None)
+            if row is not None:
+                self.alive[row] = False
+
+    def live_ids(self) -> List[str]:
+        return [doc_id.decode('ascii') for doc_id in self.ids[:self.count][self.alive[:self.count]]]
+
+    def iter_rows(self, batch_size: int = 4096) -> Iterator[tuple]:
+        """(ids, vectors, texts, metadatas) of every live row, in batches"""
+        live = np.flatnonzero(self.alive[:self.count])
+        for start in range(0, len(live), batch_size):
+            rows = live[start:start + batch_size]
+            hits = self.fetch(rows, np.zeros(len(rows)))
+            yield ([hit[0] for hit in hits], np.asarray(self.vectors[rows], dtype=np.float32),
+                   [hit[1] for hit in hits], [hit[2] for hit in hits])
+
+    def compact(self) -> Dict[str, int]:
+        """Rewrite the live rows, in order, as a new generation of data files
+
+        The new files are complete before tables.json is replaced to point at
+        them, so a reader opens one generation or the other, and readers that
+        already mapped the old files keep them until they close. Older
+        generations are deleted afterwards; on Windows, files still mapped by a
+        reader stay until the next compaction. Returns row counts before and after.
+        """
+        if not self._writable:
+            raise ValueError("Open the store writable to compact it")
+        if self._rows_file is not None:
+            self._rows_file.close()
+            self._rows_file = None
+
+        live = np.flatnonzero(self.alive[:self.count])
+        before = self.count
+        generation = self.generation + 1
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        offsets = np.zeros(len(live), dtype=np.int64)
+        with open(self._file("rows", ".jsonl", generation), 'wb') as dst:
+            if len(live):
+                with open(self.rows_file, 'rb') as src:
+                    for i, row in enumerate(live):
+                        src.seek(int(self.offsets[row]))
+                        offsets[i] = dst.tell()
+                        dst.write(src.readline())
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        def copy(matrix: Optional[np.memmap], stem: str) -> Optional[np.memmap]:
+            if matrix is None:
+                return None
+            target = self._file(stem, ".npy", generation)
+            out = np.lib.format.open_memmap(target, mode='w+', dtype=matrix.dtype,
+                                            shape=(len(live), matrix.shape[1]))
+            for start in range(0, len(live), SCORE_BLOCK_ROWS):
+                out[start:start + SCORE_BLOCK_ROWS] = matrix[live[start:start + SCORE_BLOCK_ROWS]]
+            out.flush()
+            del out
+            return np.load(target, mmap_mode='r+')
+
+        vectors, codes = copy(self.vectors, "vectors"), copy(self.codes, "codes")
+        self.meta = self.meta.take(live)
+        self.ids, self.scales = self.ids[live], self.scales[live]
+        self.alive = np.ones(len(live), dtype=bool)
+        self.offsets = offsets
+        self.vectors, self.codes = vectors, codes
+        self.count = len(live)
+        self.generation = generation
+        self._id_rows = None
+        self.save()
+        self.remove_stale_generations()
+        return {'rows_before': before, 'rows_after': self.count}
+
+    def remove_stale_generations(self):
+        """Delete data files of every generation but the current one"""
+        for path in self.path.iterdir():
+            match = _DATA_FILE.match(path.name)
+            if match and int(match.group(1) or 0) != self.generation:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    # Queries
+
+    def _mask(self, filters: Optional[SearchFilters]) -> np.ndarray:
+        """Rows that are alive and pass the filters, evaluated column-wise"""
+        n = self.count
+        mask = self.alive[:n].copy()
+        matching = self.meta.mask(filters, n)
+        if matching is not None:
+            mask &= matching
+        return mask
+
+    def _candidates(self, filters: Optional[SearchFilters],
+                    ids: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Rows to score: those passing the filters, or the live rows of ``ids``"""
+        if ids is None:
+            return np.flatnonzero(self._mask(filters))
+        id_rows = self._id_index()
+        rows = (id_rows.get(doc_id.encode('ascii')) for doc_id in ids)
+        return np.array(sorted(row for row in rows if row is not None), dtype=np.int64)
+
+    @staticmethod
+    def _unit(query: Sequence[float]) -> np.ndarray:
+        q = np.asarray(query, dtype=np.float32)
+        return q / (np.linalg.norm(q) or 1.0)
+
+    def scores(self, query: Sequence[float]) -> np.ndarray:
+        """Cosine similarity of every row to the query"""
+        q = self._unit(query)
+        out = np.empty(self.count, dtype=np.float32)
+        # Score in blocks so float16 rows are widened a slice at a time
+        for start in range(0, self.count, SCORE_BLOCK_ROWS):
+            block = self.vectors[start:min(start + SCORE_BLOCK_ROWS, self.count)]
+            out[start:start + len(block)] = block.astype(np.float32, copy=False) @ q
+        return out
+
+    def approx_scores(self, query: Sequence[float]) -> np.ndarray:
+        """First-pass scores from the quantized codes; higher is closer"""
+        q = self._unit(query)
+        query_bits = np.packbits(q > 0)
+        out = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, self.count)
+            block = self.codes[start:end]
+            if self.quantization == "int8":
+                out[start:end] = (block.astype(np.float32) @ q) * self.scales[start:end]
+            else:
+                out[start:end] = -_POPCOUNT[block ^ query_bits].sum(axis=1, dtype=np.int32)
+        return out
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the k highest scores, best first"""
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def rank(self, query: Sequence[float], candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k candidate rows and their exact cosine similarities
+
+        Quantized stores shortlist by code scores, then rescore the shortlist
+        against the full vectors read from disk.
+        """
+        if self.quantization == "none":
+            scores = self.scores(query)[candidates]
+            top = self._top(scores, k)
+            return candidates[top], scores[top]
+
+        depth = max(k * RESCORE_FACTOR[self.quantization], MIN_RESCORE)
+        shortlist = np.sort(candidates[self._top(self.approx_scores(query)[candidates], depth)])
+        exact = self.vectors[shortlist].astype(np.float32) @ self._unit(query)
+        top = self._top(exact, k)
+        return shortlist[top], exact[top]
+
+    def search(self, query: Sequence[float], k: int = 5,
+               filters: Optional[SearchFilters] = None,
+               ids: Optional[Sequence[str]] = None) -> List[Hit]:
+        """Top-k by cosine similarity among rows that pass the filters (or among ``ids``)"""
+        if not self.count:
+            return []
+        candidates = self._candidates(filters, ids)
+        if not len(candidates):
+            return []
+
+        rows, scores = self.rank(query, candidates, k)
+        return self.fetch(rows, relevance_from_cosine(scores))
+
+    def search_many(self, queries: Sequence[Sequence[float]], k: int = 5,
+                    filters: Optional[SearchFilters] = None, workers: int = 4,
+                    ids: Optional[Sequence[str]] = None) -> List[List[Hit]]:
+        """Top-k for many queries at once
+
+        Exact stores score every block against all queries in one matrix
+        product and keep a running top-k per query; quantized stores rank
+        the queries on a thread pool (NumPy releases the GIL).
+        """
+        if not self.count or not len(queries):
+            return [[] for _ in queries]
+        candidates = self._candidates(filters, ids)
+        if not len(candidates):
+            return [[] for _ in queries]
+
+        if self.quantization != "none":
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                ranked = list(pool.map(lambda query: self.rank(query, candidates, k), queries))
+        else:
+            ranked = self._rank_many(queries, candidates, k)
+        return [self.fetch(rows, relevance_from_cosine(scores)) for rows, scores in ranked]
+
+    def _rank_many(self, queries: Sequence[Sequence[float]], candidates: np.ndarray,
+                   k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        q = np.asarray(queries, dtype=np.float32)
+        q /= np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        k = min(k, len(candidates))
+        best_rows = np.empty((0, len(q)), dtype=np.int64)
+        best_scores = np.empty((0, len(q)), dtype=np.float32)
+
+        for start in range(0, len(candidates), SCORE_BLOCK_ROWS):
+            rows = candidates[start:start + SCORE_BLOCK_ROWS]
+            if rows[-1] - rows[0] + 1 == len(rows):
+                # Contiguous (unfiltered) rows: a slice of the map, no gather copy
+                vectors = self.vectors[rows[0]:rows[-1] + 1]
+            else:
+                vectors = self.vectors[rows]
+            block = vectors.astype(np.float32, copy=False) @ q.T
+            # Merge this block's top-k with the running top-k, per query column
+            scores = np.concatenate([best_scores, block])
+            rows = np.concatenate([best_rows, np.broadcast_to(rows[:, None], block.shape)])
+            top = np.argpartition(-scores, min(k, len(scores)) - 1, axis=0)[:k]
+            best_scores = np.take_along_axis(scores, top, axis=0)
+            best_rows = np.take_along_axis(rows, top, axis=0)
+
+        order = np.argsort(-best_scores, axis=0)
+        best_scores = np.take_along_axis(best_scores, order, axis=0)
+        best_rows = np.take_along_axis(best_rows, order, axis=0)
+        return [(best_rows[:, i], best_scores[:, i]) for i in range(len(q))]
+
+    def measure_recall(self, k: int = 5, samples: int = 200, seed: int = 0) -> float:
+        """Recall@k of the quantized search against exact search
+
+        Queries are stored vectors nudged with noise, so the nearest neighbour
+        is not always the query's own row.
+        """
+        live = np.flatnonzero(self.alive[:self.count])
+        if self.quantization == "none" or not len(live):
+            return 1.0
+
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(live, size=min(samples, len(live)), replace=False)
+        found = 0
+        for row in picks:
+            query = self.vectors[row].astype(np.float32) + rng.normal(0, 0.05, self.dim).astype(np.float32)
+            exact = set(live[self._top(self.scores(query)[live], k)].tolist())
+            approx = set(self.rank(query, live, k)[0].tolist())
+            found += len(exact & approx)
+        return found / (len(picks) * min(k, len(live)))
+
+    def footprint(self) -> Dict[str, float]:
+        """MB scanned per query versus the full-precision matrix"""
+        full = self.count * self.dim * self.dtype.itemsize / 2 ** 20
+        scanned = self.count * self.code_width / 2 ** 20 if self.quantization != "none" else full
+        return {'full_mb': full, 'scan_mb': scanned}
+
+    def fetch(self, rows: Sequence[int], scores: Sequence[float]) -> List[Hit]:
+        """Read text for the given rows; metadata comes from the columns"""
+        if self._snapshot is not None:
+            records = [read_record(self._snapshot, int(self.offsets[row])) for row in rows]
+        else:
+            if self._rows_file is not None:
+                self._rows_file.flush()
+            records = []
+            with open(self.rows_file, 'rb') as f:
+                for row in rows:
+                    f.seek(int(self.offsets[row]))
+                    records.append(json.loads(f.readline()))
+        return [(record['id'], record['text'], self.meta.row(int(row)), float(score))
+                for record, row, score in zip(records, rows, scores)]
@@ -6,160 +6,1146 @@ Process and index Claude chat exports for semantic search
 
 import os
 import re
+import shutil
+import argparse
 from pathlib import Path
-from typing import List, Dict, Any
+import time
+import threading
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Container, Iterable, Iterator, Optional, Set
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from tqdm import tqdm
 
+from config import (EMBEDDING_MODEL, EMBEDDING_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, VAULT_PATH, VAULT_PATTERNS, DB_PATH, FLAT_DB_PATH, MANIFEST_PATH,
+                    KEYWORD_INDEX_PATH, INDEX_INFO_PATH, DEDUP_INDEX_PATH, SHARDS, SHARDS_PATH,
+                    TURN_INDEX_PATH, SNAPSHOT_PATH, VECTOR_BACKEND)
+from manifest import IndexManifest, chunk_id
+from embedding_pipeline import DEFAULT_BATCH_SIZE, default_workers, run_pipeline
+from embedding_cache import EmbeddingCache
+from keyword_index import KeywordIndex
+from dedup import NearDuplicateIndex
+from turn_index import TurnIndex
+from claude_export import conversation_versions, iter_export_turns, read_blocks
+from search_filters import TIMESTAMP_PATTERN, parse_timestamp
+from metrics import METRICS, Stopwatch, profiled
+from snapshot import export_snapshot
+from flat_store import QUANTIZATIONS
+from vault_watcher import POLL_INTERVAL, DEBOUNCE_SECONDS, BackgroundIndexer, VaultWatcher
+from vector_store import (BACKENDS, chroma_generations, index_writer_lock, open_vector_store,
+                          publish_index, read_index_info, shard_of, shard_path, write_index_info)
+
+# Bump whenever parsing or chunk metadata changes; indexes built by an older
+# version are rebuilt from scratch (the embedding cache keeps that cheap)
+PARSER_VERSION = 8
+
+# Fallback chunking when the model's tokenizer cannot be loaded
+CHUNK_CHARS = 500
+CHUNK_OVERLAP_CHARS = 50
+_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# "Date: 2024-05-01", "**Created:** ...", "exported_at: ..." lines in an export header
+_METADATA_LINE = re.compile(
+    r'^\W*(date|created|created[ _]at|updated|updated[ _]at|exported|exported[ _]at|timestamp)\W*:',
+    re.IGNORECASE
+)
+
+# "Human: ...", "**Claude:** ...", or a "## Assistant" heading on its own line
+_SPEAKER_LINE = re.compile(
+    r'^(#{1,6}[ \t]+)?\**(human|user|claude|assistant)\**[ \t]*(?(1)(?::\**[ \t]*|$)|:\**[ \t]*)',
+    re.IGNORECASE
+)
+_SPEAKERS = {'human': 'human', 'user': 'human', 'claude': 'claude', 'assistant': 'claude'}
+
+# Opening or closing line of a fenced code block
+_FENCE = re.compile(r'^[ \t]{0,3}(`{3,}|~{3,})')
+
+def _is_metadata_line(line: str, in_turn: bool = False) -> bool:
+    """True for an export header line; inside a turn its value must be nothing but a date"""
+    match = _METADATA_LINE.match(line)
+    if not match:
+        return False
+    if not in_turn:
+        return True
+    # "Updated: I changed the loop..." is part of the reply
+    value = line[match.end():].strip().strip('*_`').strip()
+    return TIMESTAMP_PATTERN.fullmatch(value) is not None
+
+@lru_cache(maxsize=None)
+def load_tokenizer(model_name: str = EMBEDDING_MODEL):
+    """The embedding model's own tokenizer, or None if it cannot be loaded"""
+    try:
+        from transformers import AutoTokenizer
+        
+        # sentence-transformers resolves bare model names the same way
+        name = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+        return AutoTokenizer.from_pretrained(name)
+    except Exception as e:
+        print(f"⚠️ Could not load the {model_name} tokenizer ({e}); chunking by characters")
+        return None
+
 class ClaudeChatLoader:
-    """Load and parse Claude Desktop chat exports"""
+    """Load and parse Claude Desktop chat exports
+    
+    Turns are split into chunks of at most EMBEDDING_MAX_TOKENS tokens as
+    counted by the model's tokenizer, so nothing is cut off by the model's
+    truncation and short turns stay whole.
+    """
     
-    def __init__(self, vault_path: str = "vault"):
+    def __init__(self, vault_path: str = str(VAULT_PATH)):
         self.vault_path = Path(vault_path)
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        self._splitter: Optional[RecursiveCharacterTextSplitter] = None
+        self.token_budget = 0
     
-    def load_all_conversations(self) -> List[Document]:
-        """Load all markdown files from vault directory"""
+    @property
+    def splitter(self) -> RecursiveCharacterTextSplitter:
+        """Built on first use, so parsing-only callers never load the tokenizer"""
+        if self._splitter is None:
+            tokenizer = load_tokenizer(EMBEDDING_MODEL)
+            if tokenizer is None:
+                self._splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=CHUNK_CHARS,
+                    chunk_overlap=CHUNK_OVERLAP_CHARS,
+                    separators=_SEPARATORS
+                )
+            else:
+                # The model adds [CLS] and [SEP] (or its own markers) to every input
+                self.token_budget = EMBEDDING_MAX_TOKENS - tokenizer.num_special_tokens_to_add()
+                self._splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=self.token_budget,
+                    chunk_overlap=CHUNK_OVERLAP_TOKENS,
+                    length_function=lambda text: len(
+                        tokenizer.encode(text, add_special_tokens=False, verbose=False)),
+                    separators=_SEPARATORS
+                )
+        return self._splitter
+    
+    def split(self, text: str) -> List[str]:
+        """Chunks of one turn"""
+        splitter = self.splitter
+        if len(text) <= self.token_budget and text.isascii():
+            # No ASCII character takes more than one token, so it fits as is
+            text = text.strip()
+            return [text] if text else []
+        return splitter.split_text(text)
+    
+    def list_files(self) -> List[Path]:
+        """List all markdown chats and account exports in the vault directory"""
         if not self.vault_path.exists():
             raise FileNotFoundError(f"Vault directory not found: {self.vault_path}")
         
-        documents = []
-        md_files = list(self.vault_path.glob("*.md"))
+        return sorted({path for pattern in VAULT_PATTERNS for path in self.vault_path.glob(pattern)})
+    
+    @staticmethod
+    def is_export(file_path: Path) -> bool:
+        """Account export (conversations.json) rather than a markdown chat
+        
+        Its text is JSON-escaped, so chunk offsets are relative to the message
+        and the turn index, which reads turns back from the file, skips it.
+        """
+        return file_path.suffix == '.json'
+    
+    def load_all_conversations(self) -> List[Document]:
+        """Load all markdown files from vault directory"""
+        md_files = self.list_files()
         
         if not md_files:
-            print("⚠️ No .md files found in vault directory!")
+            print("⚠️ No .md files or conversations.json exports found in vault directory!")
             print(f"💡 Add your Claude chat exports to: {self.vault_path.absolute()}")
-            return documents
+            return []
         
         print(f"📁 Found {len(md_files)} conversation files")
         
+        documents = []
+        for file_docs in self.load_files(md_files).values():
+            documents.extend(file_docs)
+        
+        print(f"✨ Loaded {len(documents)} conversation chunks")
+        return documents
+    
+    def load_files(self, md_files: List[Path]) -> Dict[Path, List[Document]]:
+        """Load a subset of vault files, keyed by path; files that fail are left out"""
+        loaded = {}
+        
         for md_file in tqdm(md_files, desc="Loading conversations"):
             try:
-                file_docs = self._load_single_file(md_file)
-                documents.extend(file_docs)
+                loaded[md_file] = self._load_single_file(md_file)
             except Exception as e:
                 print(f"⚠️ Error loading {md_file.name}: {e}")
         
-        print(f"✨ Loaded {len(documents)} conversation chunks")
-        return documents
+        return loaded
     
     def _load_single_file(self, file_path: Path) -> List[Document]:
         """Load and process a single conversation file"""
-        content = file_path.read_text(encoding='utf-8')
-        
-        # Split into conversation turns
-        turns = self._parse_conversation_turns(content)
+        return list(self.iter_file_documents(file_path))
+    
+    def iter_file_documents(self, file_path: Path, skip: Container[str] = (),
+                            versions: Optional[Dict[str, str]] = None) -> Iterator[Document]:
+        """Stream the chunks of one conversation file
         
-        # Create documents for each turn
-        documents = []
-        for i, turn in enumerate(turns):
-            # Split long turns into chunks
-            chunks = self.splitter.split_text(turn['content'])
-            
-            for j, chunk in enumerate(chunks):
-                metadata = {
-                    'source': str(file_path),
-                    'filename': file_path.name,
-                    'speaker': turn['speaker'],
-                    'conversation_turn': i,
-                    'chunk_id': j,
-                    'total_chunks': len(chunks)
-                }
+        Markdown is read line by line and each turn is split and yielded as
+        soon as it ends, so memory is bounded by the longest turn, not the file.
+        Account exports are read block by block and decoded one conversation
+        at a time; their turns are numbered within each conversation. For
+        exports, ``versions`` receives every conversation's version and the
+        conversations in ``skip`` are left out.
+        """
+        fallback_timestamp = file_path.stat().st_mtime
+        # One string object per file, shared by every chunk's metadata (and
+        # pickled once per batch on the way to the embedding workers)
+        source, filename = str(file_path), file_path.name
+        read, parse = Stopwatch(), Stopwatch()
+        with open(file_path, encoding='utf-8') as f:
+            if self.is_export(file_path):
+                blocks = read_blocks(f)
+                turns = iter_export_turns(read.wrap(blocks) if METRICS.enabled else blocks,
+                                          fallback_timestamp, versions, skip)
+            else:
+                lines = read.wrap(f) if METRICS.enabled else f
+                turns = self._iter_conversation_turns(lines, fallback_timestamp)
+            for i, turn in enumerate(parse.wrap(turns) if METRICS.enabled else turns):
+                # Split long turns into chunks
+                with METRICS.time('index_split'):
+                    chunks = self.split(turn['content'])
                 
-                documents.append(Document(
-                    page_content=chunk,
-                    metadata=metadata
-                ))
+                offset = 0
+                for j, chunk in enumerate(chunks):
+                    # Chunks are verbatim slices of the turn; overlap means the
+                    # next one starts at or after this one
+                    found = turn['content'].find(chunk, offset)
+                    if found >= 0:
+                        offset = found
+                    char_start = turn['start'] + offset
+                    metadata = {
+                        'source': source,
+                        'filename': filename,
+                        'conversation_id': turn.get('conversation_id', ''),
+                        'speaker': turn['speaker'],
+                        'conversation_turn': turn.get('turn', i),
+                        'chunk_id': j,
+                        'total_chunks': len(chunks),
+                        'timestamp': turn['timestamp'],
+                        'conversation_timestamp': turn['conversation_timestamp'],
+                        'char_start': char_start,
+                        'char_end': char_start + len(chunk)
+                    }
+                    
+                    yield Document(
+                        page_content=chunk,
+                        metadata=metadata
+                    )
         
-        return documents
+        # Parsing pulls lines through the reader, so its time includes the reads
+        METRICS.observe('index_read', read.elapsed)
+        METRICS.observe('index_parse', parse.elapsed - read.elapsed)
+        METRICS.inc('files_indexed')
     
-    def _parse_conversation_turns(self, content: str) -> List[Dict[str, Any]]:
+    def _parse_conversation_turns(self, content: str,
+                                  fallback_timestamp: float = 0.0) -> List[Dict[str, Any]]:
         """Parse markdown content into conversation turns"""
-        turns = []
+        return list(self._iter_conversation_turns(content.splitlines(keepends=True), fallback_timestamp))
+    
+    def _iter_conversation_turns(self, lines: Iterable[str],
+                                 fallback_timestamp: float = 0.0) -> Iterator[Dict[str, Any]]:
+        """Turn a stream of markdown lines into conversation turns
+        
+        A turn runs from one speaker line ("Human:", "Claude:", "## Assistant")
+        to the next, blank lines and all, so multi-paragraph replies stay
+        together and fenced code blocks are never cut or mistaken for speaker
+        lines. Text before the first speaker line is an 'unknown' turn; headings
+        there are titles and are dropped. Each turn carries the character
+        offsets of its content in the file.
         
-        # Split by double newlines to get sections
-        sections = content.split('\n\n')
+        The conversation timestamp comes from front matter or a "Date:" style
+        header paragraph; a timestamp in a heading applies to the turns below it.
+        Without either, the caller's fallback (file mtime) is used.
+        """
+        conversation_timestamp = None
+        current_timestamp = None
+        speaker = None
+        buffer: List[str] = []
+        turn_start = 0
+        position = 0
+        fence = None
+        front_matter = None
+        metadata = None
+        paragraph_start = True
+        seen_content = False
         
-        for section in sections:
-            section = section.strip()
-            if not section:
+        def note_timestamp(text: str):
+            nonlocal conversation_timestamp, current_timestamp
+            timestamp = parse_timestamp(text)
+            if timestamp is not None:
+                conversation_timestamp = conversation_timestamp or timestamp
+                current_timestamp = timestamp
+        
+        def flush() -> Optional[Dict[str, Any]]:
+            content = ''.join(buffer)
+            buffer.clear()
+            stripped = content.strip()
+            if not stripped:
+                return None
+            start = turn_start + len(content) - len(content.lstrip())
+            conversation = conversation_timestamp or fallback_timestamp
+            return {
+                'content': stripped,
+                'speaker': speaker or 'unknown',
+                'timestamp': current_timestamp or conversation,
+                'conversation_timestamp': conversation,
+                'start': start,
+                'end': start + len(stripped)
+            }
+        
+        for line in lines:
+            line_start = position
+            position += len(line)
+            
+            if fence is not None:
+                buffer.append(line)
+                match = _FENCE.match(line)
+                if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) \
+                        and not line[match.end():].strip():
+                    fence = None
+                continue
+            
+            if front_matter is not None:
+                if line.strip() == '---':
+                    note_timestamp(''.join(front_matter))
+                    front_matter = None
+                else:
+                    front_matter.append(line)
                 continue
             
-            # Detect speaker
-            speaker = 'unknown'
-            clean_content = section
+            if not line.strip():
+                # Export header paragraphs end at the first blank line
+                metadata = None
+                paragraph_start = True
+                if buffer:
+                    buffer.append(line)
+                continue
+            
+            if metadata is not None and not _SPEAKER_LINE.match(line):
+                note_timestamp(line)
+                continue
+            metadata = None
             
-            # Look for speaker patterns
-            if section.lower().startswith(('human:', 'user:')):
-                speaker = 'human'
-                clean_content = re.sub(r'^(human|user):\s*', '', section, flags=re.IGNORECASE)
-            elif section.lower().startswith(('claude:', 'assistant:')):
-                speaker = 'claude'
-                clean_content = re.sub(r'^(claude|assistant):\s*', '', section, flags=re.IGNORECASE)
-            elif section.startswith('#'):
-                # Skip headers
+            at_paragraph = paragraph_start
+            paragraph_start = False
+            
+            if not seen_content and line.strip() == '---':
+                front_matter = []
+                continue
+            
+            if at_paragraph and _is_metadata_line(line, in_turn=speaker is not None):
+                turn = flush()
+                if turn:
+                    yield turn
+                metadata = True
+                note_timestamp(line)
+                continue
+            
+            seen_content = True
+            match = _SPEAKER_LINE.match(line)
+            if match:
+                turn = flush()
+                if turn:
+                    yield turn
+                speaker = _SPEAKERS[match.group(2).lower()]
+                turn_start = line_start + match.end()
+                line = line[match.end():]
+            elif line.startswith('#'):
+                # A dated heading starts a new session; other headings are
+                # titles before the first turn and structure inside one
+                if parse_timestamp(line) is not None:
+                    turn = flush()
+                    if turn:
+                        yield turn
+                    note_timestamp(line)
+                    # A "Date:" header may follow without a blank line
+                    paragraph_start = True
+                    continue
+                if speaker is None:
+                    paragraph_start = True
+                    continue
+            
+            if not match and not buffer:
+                turn_start = line_start
+            buffer.append(line)
+            match = _FENCE.match(line)
+            if match:
+                fence = match.group(1)
+        
+        turn = flush()
+        if turn:
+            yield turn
+
+def document_id(doc: Document) -> str:
+    """Stable vector ID for a chunk, derived from where it sits in the vault"""
+    metadata = doc.metadata
+    return chunk_id(metadata['source'], metadata['conversation_turn'], metadata['chunk_id'],
+                    metadata.get('conversation_id') or '')
+
+def chunk_span(metadata: Dict[str, Any]):
+    """Where a chunk sits, as the turn index records it"""
+    return (metadata['conversation_turn'], metadata['char_start'], metadata['char_end'],
+            metadata['speaker'], metadata['timestamp'])
+
+def unchanged_conversations(manifest: IndexManifest, export: Path) -> Set[str]:
+    """Conversations of a changed account export that are as they were indexed
+    
+    Only decodes the file, which is cheap next to embedding what is left.
+    """
+    recorded = manifest.files.get(str(export), {}).get('conversations', {})
+    try:
+        with open(export, encoding='utf-8') as f:
+            versions = conversation_versions(read_blocks(f))
+    except (OSError, ValueError):
+        # Unreadable now: re-index it whole and let that report the error
+        return set()
+    return {conversation for conversation, version in versions.items()
+            if conversation in recorded and recorded[conversation][0] == version}
+
+def backfill_turn_index(turn_index: TurnIndex, loader: ClaudeChatLoader,
+                        manifest: IndexManifest, md_files: List[Path]):
+    """Record the turns of files indexed before the turn index existed
+    
+    Only parses the files: their chunks are already embedded and stored.
+    """
+    md_files = [md_file for md_file in md_files if not loader.is_export(md_file)]
+    print(f"🧭 Building the turn index for {len(md_files)} indexed files...")
+    for md_file in md_files:
+        try:
+            spans = [chunk_span(doc.metadata) for doc in loader.iter_file_documents(md_file)]
+        except Exception as e:
+            print(f"⚠️ Error loading {md_file.name}: {e}")
+            continue
+        turn_index.record(md_file, manifest.files[str(md_file)], spans)
+    turn_index.save()
+
+class CommitTracker:
+    """Stream vault files into the pipeline and record each one in the manifest
+    once all of its chunks have been written
+    
+    The pipeline sorts chunks by length before batching, so a file's chunks
+    can be written in any order: each file counts its chunks still in
+    flight and is recorded once that count reaches zero after its last
+    chunk was produced. Written batches are also added to the keyword
+    index. Everything is saved periodically, so an interrupted run keeps the
+    files it already finished.
+    
+    With a ``dedup`` index, chunks that nearly duplicate an already stored
+    one are recorded as copies of it and never reach the pipeline. The turn
+    index gets the position of every chunk, duplicates included.
+    """
+    
+    def __init__(self, manifest: IndexManifest, keyword_index: KeywordIndex, store,
+                 dedup: Optional[NearDuplicateIndex] = None,
+                 turn_index: Optional[TurnIndex] = None,
+                 save_interval: float = 30.0):
+        self.manifest = manifest
+        self.keyword_index = keyword_index
+        self.turn_index = turn_index
+        self.store = store
+        self.dedup = dedup
+        self.save_interval = save_interval
+        self.written = 0
+        self.files_done = 0
+        # Chunks produced minus chunks written, per source; a file's writes
+        # can land before its own stream has finished counting them
+        self.in_flight: Dict[str, int] = {}
+        self.pending: List[tuple] = []
+        self.lock = threading.Lock()
+        self.last_save = time.monotonic()
+        self.progress = tqdm(desc="Committing chunks", unit="chunk")
+    
+    def stream(self, loader: ClaudeChatLoader, md_files: List[Path],
+               keep: Optional[Dict[str, Set[str]]] = None) -> Iterator[Document]:
+        """Chunks of the files, minus duplicates and the export conversations in ``keep``"""
+        for md_file in md_files:
+            fingerprint = self.manifest.fingerprint(md_file)
+            export = loader.is_export(md_file)
+            kept = (keep or {}).get(str(md_file), set())
+            turn_chunks: List[int] = []
+            conversations: Dict[str, List[int]] = {}
+            versions: Dict[str, str] = {}
+            # Account exports have no byte offsets to record
+            spans = None if self.turn_index is None or export else []
+            produced = 0
+            try:
+                for doc in loader.iter_file_documents(md_file, kept, versions):
+                    turn = doc.metadata['conversation_turn']
+                    counts = conversations.setdefault(doc.metadata['conversation_id'], []) \
+                        if export else turn_chunks
+                    counts.extend([0] * (turn + 1 - len(counts)))
+                    counts[turn] += 1
+                    if spans is not None:
+                        spans.append(chunk_span(doc.metadata))
+                    if self.dedup is not None and self._duplicate(doc):
+                        continue
+                    produced += 1
+                    yield doc
+            except Exception as e:
+                print(f"⚠️ Error loading {md_file.name}: {e}")
                 continue
             
-            if clean_content.strip():
-                turns.append({
-                    'content': clean_content.strip(),
-                    'speaker': speaker
-                })
+            record = None
+            if export:
+                # Kept conversations are still stored under their recorded IDs
+                previous = self.manifest.files.get(str(md_file), {}).get('conversations', {})
+                record = {conversation: previous[conversation] if conversation in kept
+                          else [version, conversations.get(conversation, [])]
+                          for conversation, version in versions.items()}
+            
+            with self.lock:
+                if spans is not None:
+                    with METRICS.time('index_turns'):
+                        self.turn_index.record(md_file, fingerprint, spans)
+                source = str(md_file)
+                self.in_flight[source] = self.in_flight.get(source, 0) + produced
+                self.pending.append((md_file, fingerprint, turn_chunks, record))
+                self._settle()
+    
+    def _duplicate(self, doc: Document) -> bool:
+        with self.lock, METRICS.time('index_dedup'):
+            original = self.dedup.check(document_id(doc), doc.page_content, doc.metadata)
+        if original is not None:
+            METRICS.inc('chunks_deduplicated')
+            return True
+        return False
+    
+    def committed(self, documents: List[Document]):
+        """Called by the pipeline writer after each stored batch"""
+        with self.lock, METRICS.time('index_write_keywords'):
+            self.keyword_index.add(
+                [document_id(doc) for doc in documents],
+                [doc.page_content for doc in documents],
+                [doc.metadata for doc in documents]
+            )
+            for doc in documents:
+                source = doc.metadata['source']
+                self.in_flight[source] = self.in_flight.get(source, 0) - 1
+            self.written += len(documents)
+            self.progress.update(len(documents))
+            self._settle()
+    
+    def _settle(self):
+        waiting = []
+        for md_file, fingerprint, turn_chunks, conversations in self.pending:
+            if self.in_flight.get(str(md_file), 0) > 0:
+                waiting.append((md_file, fingerprint, turn_chunks, conversations))
+                continue
+            self.in_flight.pop(str(md_file), None)
+            self.manifest.record(md_file, fingerprint, turn_chunks, conversations)
+            self.files_done += 1
+            self.progress.set_postfix(files=self.files_done)
+        self.pending = waiting
         
-        return turns
+        if time.monotonic() - self.last_save > self.save_interval:
+            self.save()
+    
+    def save(self):
+        # Indexes first: the manifest must never claim more than is stored
+        with METRICS.time('index_save'):
+            self.store.save()
+            self.keyword_index.save()
+            if self.dedup is not None:
+                self.dedup.save()
+            if self.turn_index is not None:
+                self.turn_index.save()
+            self.manifest.save()
+        self.last_save = time.monotonic()
+    
+    def close(self):
+        self.progress.close()
+        with self.lock:
+            if self.keyword_index.needs_compaction():
+                print("🗜️ Compacting keyword index...")
+                self.keyword_index.compact()
+            self.save()
+        self.keyword_index.close()
+
+def write_batch(store, documents: List[Document], embeddings: List[List[float]]):
+    """Store pre-computed embeddings under deterministic IDs"""
+    with METRICS.time('index_write_vectors'):
+        store.add(
+            [document_id(doc) for doc in documents],
+            embeddings,
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents]
+        )
 
-def create_vector_database(documents: List[Document]) -> Chroma:
-    """Create and populate ChromaDB vector database"""
+def create_vector_database(documents: Iterable[Document],
+                           store=None,
+                           stale_ids: Optional[List[str]] = None,
+                           embedder: Optional[HuggingFaceEmbeddings] = None,
+                           batch_size: int = DEFAULT_BATCH_SIZE,
+                           workers: int = 1,
+                           threads: Optional[int] = None,
+                           use_cache: bool = True,
+                           max_memory_mb: Optional[float] = None,
+                           on_commit: Optional[Callable[[List[Document]], None]] = None,
+                           backend: str = VECTOR_BACKEND,
+                           require_chunks: bool = True):
+    """Create or update the vector store (Chroma or flat, see vector_store.py)
+    
+    Chunks are written under deterministic IDs, so re-indexing a file replaces
+    its vectors instead of duplicating them. ``stale_ids`` are deleted first.
+    With ``workers`` > 1 batches are embedded in parallel worker processes.
+    Chunks already in the embedding cache are not embedded again.
+    ``documents`` may be a generator; ``on_commit`` is called after every
+    stored batch. Unless ``require_chunks`` is off, a run that stores and
+    deletes nothing is an error.
+    """
+    
+    if embedder is None and workers <= 1:
+        print("🧠 Initializing embedding model...")
+        embedder = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    
+    if store is None:
+        store = open_vector_store(backend, embedder, writable=True)
+    
+    if stale_ids:
+        print(f"🧹 Removing {len(stale_ids)} stale chunks...")
+        store.delete(stale_ids)
+    
+    def write(batch: List[Document], vectors: List[List[float]]):
+        write_batch(store, batch, vectors)
+        if on_commit is not None:
+            on_commit(batch)
+    
+    cache = EmbeddingCache(EMBEDDING_MODEL) if use_cache else None
+    if cache is not None and not cache.writable and cache.records is not None:
+        print("⚠️ Embedding cache is locked by another indexer - using it read-only")
+    
+    print(f"🔄 Embedding new or changed chunks (batch {batch_size}, {workers} workers)...")
+    try:
+        report = run_pipeline(
+            documents,
+            write=write,
+            model_name=EMBEDDING_MODEL,
+            embed=embedder.embed_documents if embedder is not None and workers <= 1 else None,
+            cache=cache,
+            batch_size=batch_size,
+            workers=workers,
+            threads=threads,
+            max_memory_mb=max_memory_mb
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+    report.print()
     
-    if not documents:
+    if require_chunks and not report.chunks and not stale_ids:
         raise ValueError("No documents to index!")
     
-    print("🧠 Initializing embedding model...")
-    embedder = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+    store.save()
+    print(f"✅ Vector database updated at: {store.path.absolute()}")
+    return store
+
+def report_quantization(store):
+    """Print recall@5 of a quantized flat store against exact search"""
+    if getattr(store, 'quantization', 'none') == 'none':
+        return
+    footprint = store.footprint()
+    recall = store.measure_recall(k=5)
+    print(f"📐 {store.quantization} codes: scan {footprint['scan_mb']:.1f} MB "
+          f"instead of {footprint['full_mb']:.1f} MB, recall@5 vs exact {recall:.1%}")
+    if recall < 0.99:
+        print("⚠️ Recall is below 99% - consider --quantization int8")
+
+def export_index(path: Path):
+    """Write the current index to one snapshot file for search.py --snapshot"""
+    info = read_index_info()
+    store = open_vector_store()
+    if store is None:
+        print("❌ Nothing to export - the index has not been built yet")
+        return
+    try:
+        print(f"📦 Exporting snapshot to {path}...")
+        start = time.monotonic()
+        table = export_snapshot(store, path, model=info.get('model', EMBEDDING_MODEL))
+        size_mb = Path(path).stat().st_size / 2 ** 20
+        print(f"✅ Snapshot of {table['count']} chunks ({size_mb:.1f} MB) written "
+              f"in {time.monotonic() - start:.1f}s")
+    except Exception as e:
+        print(f"❌ Snapshot export failed: {e}")
+    finally:
+        store.close()
+
+def reset_index():
+    """Drop the vector stores, keyword and turn indexes and manifest so the next run starts clean"""
+    for path in (*chroma_generations(DB_PATH).values(), FLAT_DB_PATH, SHARDS_PATH,
+                 KEYWORD_INDEX_PATH, DEDUP_INDEX_PATH):
+        if path.exists():
+            shutil.rmtree(path)
+    for path in (MANIFEST_PATH, INDEX_INFO_PATH, TURN_INDEX_PATH):
+        if path.exists():
+            path.unlink()
+
+def rebuild_shards(rebuild: List[int], shards: int, manifest: IndexManifest,
+                   keyword_index: KeywordIndex):
+    """Drop the given shards and forget their files, so this run indexes them again
     
-    # Create database directory
-    db_path = Path("data/chroma_db")
-    db_path.parent.mkdir(parents=True, exist_ok=True)
+    The other shards are untouched; the manifest diff then sees the dropped
+    files as new.
+    """
+    if shards <= 1:
+        raise ValueError("--rebuild-shard needs a sharded index (--shards N)")
+    for shard in rebuild:
+        if not 0 <= shard < shards:
+            raise ValueError(f"--rebuild-shard {shard}: the index has shards 0-{shards - 1}")
+        print(f"♻️ Rebuilding shard {shard:02d}...")
+        if shard_path(shard).exists():
+            shutil.rmtree(shard_path(shard))
     
-    print(f"🔄 Creating vector database with {len(documents)} documents...")
+    keys = [key for key in manifest.files if shard_of(key, shards) in rebuild]
+    keyword_index.remove(manifest.chunk_ids_for(keys))
+    for key in keys:
+        manifest.forget(key)
+    print(f"📂 {len(keys)} files to re-index")
+
+def disk_usage(paths: Iterable[Path]) -> int:
+    """Bytes of the given files and everything under the given directories"""
+    total = 0
+    for path in paths:
+        if path.is_file():
+            total += path.stat().st_size
+        elif path.is_dir():
+            total += sum(item.stat().st_size for item in path.rglob('*') if item.is_file())
+    return total
+
+def compact_index():
+    """Reconcile the index with the vault and rewrite it without dead rows
     
-    # Create ChromaDB from documents
-    vectordb = Chroma.from_documents(
-        documents=documents,
-        embedding=embedder,
-        persist_directory=str(db_path)
-    )
+    Files gone from the vault are dropped, chunk IDs no indexed file accounts
+    for are deleted, and the vector store, keyword and turn indexes are
+    rewritten from their live rows. Nothing is embedded: new and edited files
+    are left to the next indexing run. Searches keep the generation they have
+    open until the compacted one is published.
+    """
+    print("🗜️ Claude RAG Memory Search - Index Compaction")
+    print("=" * 50)
+    
+    info = read_index_info()
+    manifest = IndexManifest.load(MANIFEST_PATH)
+    if not info or not manifest.exists():
+        print("❌ Nothing to compact - the index has not been built yet")
+        return
+    backend = info.get('backend', VECTOR_BACKEND)
+    shards = info.get('shards', SHARDS)
+    
+    def parts() -> List[Path]:
+        if shards > 1:
+            stores = [SHARDS_PATH]
+        elif backend == "chroma":
+            stores = list(chroma_generations(DB_PATH).values())
+        else:
+            stores = [FLAT_DB_PATH]
+        return stores + [KEYWORD_INDEX_PATH, TURN_INDEX_PATH, DEDUP_INDEX_PATH]
+    
+    bytes_before = disk_usage(parts())
+    start = time.monotonic()
+    
+    # Files deleted from the vault since the last run
+    changes = manifest.diff(ClaudeChatLoader().list_files())
+    for key in changes.removed:
+        manifest.forget(key)
+    indexed = set(manifest.files)
+    if changes.removed:
+        print(f"🗑️ Dropping {len(changes.removed)} files no longer in the vault")
+    if changes.added or changes.changed:
+        print(f"💡 {len(changes.added)} new and {len(changes.changed)} changed files are left "
+              f"for the next indexing run")
+    
+    dedup = NearDuplicateIndex.load(DEDUP_INDEX_PATH)
+    orphaned = dedup.forget(set(changes.removed) | {
+        source for _, source in dedup.fingerprints.values() if source not in indexed
+    })
+    for source in orphaned & indexed:
+        # Held copies of chunks that are gone; a size no file has makes the
+        # next run see it as changed and embed it again
+        manifest.files[source]['size'] = -1
+    if orphaned:
+        print(f"🔗 {len(orphaned)} files held copies of dropped chunks and will be re-indexed next run")
+    
+    turn_index = TurnIndex.load(TURN_INDEX_PATH, writable=True)
+    for source in [source for source in turn_index.files if source not in indexed]:
+        turn_index.forget(source)
+    
+    # Anything stored that the manifest does not account for is an orphan:
+    # chunks of removed files, or of runs interrupted before their manifest save
+    expected = set(manifest.chunk_ids_for(indexed))
+    store = open_vector_store(backend, writable=True, shards=shards)
+    try:
+        orphans = [doc_id for doc_id in store.live_ids() if doc_id not in expected]
+        store.delete(orphans)
+        print(f"🧹 Removed {len(orphans)} orphaned chunks from the vector store")
+        print("🏗️ Rewriting the vector store from its live rows...")
+        counts = store.compact()
+    finally:
+        store.close()
     
-    print(f"✅ Vector database created at: {db_path.absolute()}")
-    return vectordb
+    keyword_index = KeywordIndex.load(KEYWORD_INDEX_PATH)
+    keyword_index.remove([doc_id for doc_id in keyword_index.id_to_doc if doc_id not in expected])
+    keyword_dead = keyword_index.dead_count
+    if keyword_dead:
+        keyword_index.compact()
+    keyword_index.close()
+    
+    turn_index.compact()
+    # Indexes first: the manifest must never claim more than is stored
+    turn_index.save()
+    dedup.save()
+    manifest.save()
+    publish_index(store, **info)
+    
+    reclaimed = bytes_before - disk_usage(parts())
+    print(f"✅ Compacted in {time.monotonic() - start:.1f}s: vector rows "
+          f"{counts.get('rows_before', 0)} → {counts.get('rows_after', 0)}, "
+          f"{keyword_dead} keyword entries dropped, {reclaimed / 2 ** 20:.1f} MB reclaimed")
 
 def main():
     """Main indexing workflow"""
+    parser = argparse.ArgumentParser(description="Index Claude conversations for search")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the manifest and rebuild the whole index"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Chunks per embedding batch (default: {DEFAULT_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=default_workers(),
+        help="Embedding worker processes, each with its own model copy (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Torch threads per worker (default: cores / workers)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the on-disk embedding cache"
+    )
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        default=None,
+        help="Pause reading new chunks while the indexer uses more than this much memory"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=None,
+        help="Vector store: chroma (HNSW) or flat (exact, memory-mapped NumPy); "
+             "defaults to the backend of the existing index"
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=QUANTIZATIONS,
+        default=None,
+        help="Flat backend only: scan int8 or binary codes and rescore the best "
+             "candidates at full precision; defaults to the existing store's setting"
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        help="Split the vector store into N shards by file, written and searched in "
+             "parallel; defaults to the existing index's count"
+    )
+    parser.add_argument(
+        "--rebuild-shard",
+        type=int,
+        action="append",
+        metavar="N",
+        help="Drop shard N and re-index just the files it holds (repeatable)"
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Instead of indexing: drop files deleted from the vault and orphaned chunks, "
+             "then rewrite the stores without dead rows (safe to run on a schedule)"
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Embed and store near-duplicate chunks instead of folding them into one vector"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running: index vault changes in the background as they appear"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=POLL_INTERVAL,
+        help=f"Watch mode: seconds between vault scans (default: {POLL_INTERVAL:g})"
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEBOUNCE_SECONDS,
+        help=f"Watch mode: seconds a change must settle before indexing (default: {DEBOUNCE_SECONDS:g})"
+    )
+    parser.add_argument(
+        "--export-snapshot",
+        nargs="?",
+        const=str(SNAPSHOT_PATH),
+        metavar="PATH",
+        help=f"After indexing, write the index to one memory-mappable file for "
+             f"search.py --snapshot (default: {SNAPSHOT_PATH})"
+    )
+    parser.add_argument(
+        "--metrics-out",
+        metavar="PATH",
+        help="Record per-stage timings and write them to PATH (.prom for Prometheus text, else JSON)"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="Run under cProfile and print the hottest functions; optionally save the stats to PATH"
+    )
+    args = parser.parse_args()
+    
+    if args.metrics_out:
+        METRICS.enable()
+    
+    if args.watch:
+        watch_vault(args)
+    elif args.compact:
+        with index_writer_lock():
+            compact_index()
+    elif args.profile is not None:
+        with profiled(args.profile or None), index_writer_lock():
+            index_vault(args)
+    else:
+        with index_writer_lock():
+            index_vault(args)
+    if args.export_snapshot and not args.watch:
+        export_index(Path(args.export_snapshot))
+    
+    if args.metrics_out:
+        METRICS.print()
+        METRICS.dump(args.metrics_out)
+        print(f"📈 Metrics written to {args.metrics_out}")
+
+def watch_vault(args: argparse.Namespace):
+    """Index once, then index every vault change as it settles
+    
+    Passes run on a background thread with one warm model; each one ends by
+    publishing a new index generation, which running searches pick up
+    without a restart.
+    """
+    print("👀 Watch mode: loading the embedding model once...")
+    embedder = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    # Passes are small, so embedding in-process with the warm model beats
+    # starting worker processes that each load their own copy
+    args.workers = 1
+    
+    def run_pass(paths: List[str]):
+        if paths:
+            names = ', '.join(Path(path).name for path in paths[:3])
+            more = f" (+{len(paths) - 3} more)" if len(paths) > 3 else ""
+            print(f"\n🔔 {len(paths)} vault files changed: {names}{more}")
+        start = time.monotonic()
+        with index_writer_lock():
+            index_vault(args, embedder)
+        if args.export_snapshot:
+            export_index(Path(args.export_snapshot))
+        print(f"⏱️ Pass finished in {time.monotonic() - start:.1f}s")
+        # --full and --rebuild-shard only apply to the first pass
+        args.full = False
+        args.rebuild_shard = None
+    
+    indexer = BackgroundIndexer(run_pass)
+    indexer.start()
+    indexer.submit([])
+    
+    stop = threading.Event()
+    watcher = VaultWatcher(VAULT_PATH, args.poll_interval, args.debounce)
+    print(f"👀 Watching {VAULT_PATH}/ (scan every {args.poll_interval:g}s, "
+          f"debounce {args.debounce:g}s) - Ctrl-C to stop")
+    try:
+        for paths in watcher.changes(stop):
+            indexer.submit(paths)
+    except KeyboardInterrupt:
+        print("\n👋 Stopping; letting the current pass finish...")
+    finally:
+        stop.set()
+        indexer.stop()
+
+def index_vault(args: argparse.Namespace, embedder: Optional[HuggingFaceEmbeddings] = None):
+    """Bring the index in line with the vault, as configured on the command line
+    
+    Pass an already loaded ``embedder`` to skip loading the model (watch mode).
+    """
     print("🧠 Claude RAG Memory Search - Conversation Indexer")
     print("=" * 50)
     
     try:
-        # Load conversations
+        manifest = IndexManifest.load(MANIFEST_PATH)
+        
+        keyword_index = KeywordIndex.load(KEYWORD_INDEX_PATH)
+        info = read_index_info()
+        backend = args.backend or info.get('backend', VECTOR_BACKEND)
+        if args.quantization and backend != "flat":
+            print("⚠️ --quantization only applies to the flat backend; ignoring it")
+            args.quantization = None
+        
+        shards = args.shards or info.get('shards', SHARDS)
+        
+        # Databases built before the manifest existed hold random IDs we cannot
+        # reconcile, and ones built before the keyword index lack its postings
+        legacy = (chroma_generations(DB_PATH) or FLAT_DB_PATH.exists() or SHARDS_PATH.exists()) and (
+            not manifest.exists()
+            or not keyword_index.exists()
+            or manifest.parser_version != PARSER_VERSION
+        )
+        switched = manifest.exists() and info.get('backend', 'chroma') != backend
+        if switched:
+            print(f"🔀 Switching vector backend to {backend}")
+        if manifest.exists() and info.get('shards', SHARDS) != shards:
+            print(f"🔀 Resharding the vector store into {shards} shards")
+            switched = True
+        if args.full or legacy or switched:
+            print("♻️ Rebuilding index from scratch...")
+            reset_index()
+            manifest = IndexManifest.load(MANIFEST_PATH)
+            keyword_index = KeywordIndex.load(KEYWORD_INDEX_PATH)
+        manifest.parser_version = PARSER_VERSION
+        turn_index = TurnIndex.load(TURN_INDEX_PATH, writable=True)
+        
+        if args.rebuild_shard and not (args.full or legacy or switched):
+            rebuild_shards(args.rebuild_shard, shards, manifest, keyword_index)
+        
+        # Work out what changed since the last run
         loader = ClaudeChatLoader()
-        documents = loader.load_all_conversations()
+        md_files = loader.list_files()
         
-        if not documents:
+        if not md_files and not manifest.files:
+            print("⚠️ No .md files or conversations.json exports found in vault directory!")
+            print(f"💡 Add your Claude chat exports to: {loader.vault_path.absolute()}")
             print("❌ No conversations to index.")
             return
         
-        # Create vector database
-        vectordb = create_vector_database(documents)
+        changes = manifest.diff(md_files)
+        print(f"📁 {len(md_files)} files: {len(changes.added)} new, "
+              f"{len(changes.changed)} changed, {len(changes.removed)} removed, "
+              f"{len(changes.unchanged)} unchanged")
+        
+        if changes.unchanged and not turn_index.exists():
+            backfill_turn_index(turn_index, loader, manifest, changes.unchanged)
+        elif turn_index.sync({str(path): manifest.files[str(path)] for path in changes.unchanged}):
+            # Touched but identical: same offsets, new mtime
+            turn_index.save()
+        
+        if not changes.has_changes:
+            manifest.save()
+            if backend == "flat" and args.quantization:
+                # Re-encode from the stored vectors, no re-embedding needed
+                store = open_vector_store(backend, writable=True, quantization=args.quantization,
+                                          shards=shards)
+                store.save()
+                report_quantization(store)
+                write_index_info(**dict(info, quantization=store.quantization))
+            print("\n✅ Index is already up to date.")
+            return
+        
+        # A re-downloaded account export mostly repeats conversations that
+        # are indexed already; those keep their chunks and are not re-embedded
+        keep = {}
+        for path in changes.changed:
+            if loader.is_export(path):
+                kept = unchanged_conversations(manifest, path)
+                if kept:
+                    keep[str(path)] = kept
+                    print(f"📦 {path.name}: keeping {len(kept)} unchanged conversations")
+        
+        # Copies folded into chunks of changed or removed files were never
+        # stored, so the files holding them have to be indexed again as well
+        dedup = NearDuplicateIndex.load(DEDUP_INDEX_PATH)
+        unchanged = {str(path): path for path in changes.unchanged}
+        orphaned = dedup.forget([str(path) for path in changes.to_index if str(path) not in keep]
+                                + changes.removed, manifest.chunk_ids_for(keep, keep))
+        while orphaned:
+            moved = [unchanged.pop(key) for key in sorted(orphaned) if key in unchanged]
+            # Kept conversations may hold such copies too: index the export whole
+            widened = [key for key in sorted(orphaned) if keep.pop(key, None) is not None]
+            changes.changed.extend(moved)
+            if moved:
+                print(f"🔗 Re-indexing {len(moved)} unchanged files that held copies of changed chunks")
+            orphaned = dedup.forget([str(path) for path in moved] + widened)
+        changes.unchanged = list(unchanged.values())
+        
+        # Vectors of changed and removed files are replaced wholesale, except
+        # for the kept conversations of exports
+        stale_ids = manifest.chunk_ids_for(
+            [str(path) for path in changes.changed] + changes.removed, keep
+        )
+        
+        # Stream new or changed conversations straight into the pipeline
+        embedder = embedder or HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        store = open_vector_store(backend, embedder, writable=True, quantization=args.quantization,
+                                  shards=shards)
+        
+        # Only forget removed files once their vectors are gone: if opening the
+        # store fails the manifest still lists the chunks for the next run
+        if stale_ids:
+            print(f"🧹 Removing {len(stale_ids)} stale chunks...")
+            store.delete(stale_ids)
+        for key in changes.removed:
+            manifest.forget(key)
+            turn_index.forget(key)
+        keyword_index.remove(stale_ids)
+        
+        tracker = CommitTracker(manifest, keyword_index, store,
+                                dedup=None if args.no_dedup else dedup, turn_index=turn_index)
+        try:
+            create_vector_database(
+                tracker.stream(loader, changes.to_index, keep),
+                store=store,
+                embedder=embedder,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                threads=args.threads,
+                use_cache=not args.no_cache,
+                max_memory_mb=args.max_memory_mb,
+                on_commit=tracker.committed,
+                # A re-exported file can consist of nothing but duplicates,
+                # and a run may only delete
+                require_chunks=args.no_dedup and not stale_ids
+            )
+        finally:
+            if args.no_dedup:
+                # Still record what forget() dropped for the re-indexed files
+                dedup.save()
+            tracker.close()
+        print(f"✨ Indexed {tracker.written} conversation chunks from {tracker.files_done} files")
+        if dedup.saved_embeddings:
+            print(f"🧬 Folded {dedup.saved_embeddings} near-duplicate chunks into existing vectors "
+                  f"({dedup.saved_embeddings} embeddings saved, {dedup.copies()} copies in the index)")
         
         # Test search
         print("\n🧪 Testing search functionality...")
-        test_results = vectordb.similarity_search("hello", k=1)
+        test_vector = embedder.embed_query("hello")
+        test_results = store.search(test_vector, k=1)
+        report_quantization(store)
+        store.close()
+        publish_index(store, backend=backend, model=EMBEDDING_MODEL, dim=len(test_vector),
+                      quantization=getattr(store, 'quantization', 'none'), shards=shards)
         
         if test_results:
             print("✅ Search test successful!")
@@ -169,7 +1155,7 @@ def main():
         print("\n🎉 Indexing complete!")
         print("\n💡 Next steps:")
         print("  • Search: python src/search.py 'your query'")
-        print("  • Web UI: streamlit run src/app.py")
+        print("  • Web UI: streamlit run src/app_modern.py")
         
     except Exception as e:
         print(f"\n❌ Error during indexing: {e}")
@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Keyword Index
+BM25 inverted index with a code-aware tokenizer, for keyword and hybrid search,
+plus a memory-mapped substring view for exact-match queries
+"""
+
+import os
+import re
+import json
+import math
+import heapq
+import mmap
+import pickle
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from config import KEYWORD_INDEX_PATH
+from chunk_metadata import MetadataColumns
+from search_filters import SearchFilters
+
+INDEX_VERSION = 5
+
+# BM25 parameters (Robertson/Lucene defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Rebuild posting lists once this share of documents has been deleted
+COMPACT_DEAD_FRACTION = 0.25
+
+# Identifiers, dotted paths and hyphenated words stay whole: os.path.join, ValueError, utf-8
+_WORD = re.compile(r"[A-Za-z0-9_]+(?:[.\-/:][A-Za-z0-9_]+)*")
+_SEPARATORS = re.compile(r"[._\-/:]+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens, plus the sub-words of compound identifiers
+
+    ``parseHTTPResponse`` yields parsehttpresponse, parse, http, response and
+    ``os.path.join`` yields os.path.join, os, path, join, so both the exact
+    identifier and its parts can be matched.
+    """
+    tokens = []
+    for match in _WORD.finditer(text):
+        word = match.group()
+        lower = word.lower()
+        tokens.append(lower)
+        for part in _SEPARATORS.split(word):
+            pieces = _CAMEL.findall(part)
+            if len(pieces) > 1:
+                tokens.extend(piece.lower() for piece in pieces)
+            if part and len(part) < len(word):
+                tokens.append(part.lower())
+    return tokens
+
+
+def _encode_varint(value: int, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _iter_postings(data: bytes) -> Iterator[Tuple[int, int]]:
+    """Decode (doc number, term frequency) pairs from a delta+varint posting list"""
+    doc = 0
+    value = shift = 0
+    expecting_doc = True
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        if expecting_doc:
+            doc += value
+        else:
+            yield doc, value
+        expecting_doc = not expecting_doc
+        value = shift = 0
+
+
+_STATE_KEYS = (
+    'doc_ids', 'doc_lens', 'doc_offsets', 'fold_offsets', 'alive', 'meta', 'postings', 'last_doc',
+    'doc_freq', 'live_count', 'live_length',
+)
+
+# Lowercased chunk texts are appended to fold.bin, each ended by this byte so
+# a match can never span two chunks
+FOLD_SEPARATOR = b'\x00'
+
+# columns.bin: a (doc count, fold.bin length) header, then these arrays back
+# to back, then the metadata columns
+_COLUMNS = (
+    ('fold_offsets', 'Q'), ('doc_offsets', 'Q'), ('alive', 'B'),
+)
+_HEADER = array('Q', [0, 0]).itemsize * 2
+
+# docs.jsonl, fold.2.bin, ... - group 1 is the generation, absent for 0
+_DATA_FILE = re.compile(r'^(?:docs|fold|columns|index)(?:\.(\d+))?\.(?:jsonl|bin|pkl)$')
+
+
+def generation_file(path: Path, stem: str, suffix: str, generation: int) -> Path:
+    """Data file of a generation; generation 0 keeps the original names"""
+    return path / (f"{stem}.{generation}{suffix}" if generation else f"{stem}{suffix}")
+
+
+def read_tables(path: Path) -> Dict[str, Any]:
+    """tables.json: format version, metadata code tables and the current generation"""
+    return json.loads((path / "tables.json").read_text(encoding='utf-8'))
+
+
+def map_snapshot(path: Path) -> Optional[mmap.mmap]:
+    """Read-only map of a file as it is now, or None if it is missing or empty
+
+    The map keeps the current inode alive, so an indexer that later replaces
+    the file (compaction) cannot shift records under a reader.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_record(mapped: mmap.mmap, offset: int) -> Dict[str, Any]:
+    """One JSON line from a mapped JSON-lines file"""
+    end = mapped.find(b'\n', offset)
+    return json.loads(mapped[offset:end if end != -1 else len(mapped)])
+
+
+class KeywordIndex:
+    """Append-only BM25 index over chunk text
+
+    Postings are stored per term as varint-encoded (doc delta, tf) pairs.
+    Chunk text lives in a JSON-lines side file and is read by offset only for
+    the hits being returned. Metadata is kept as columns, so filters become a
+    mask checked while scoring. Deleted chunks are tombstoned and dropped by
+    compact(), which writes a new generation of data files (docs.1.jsonl,
+    ...) that tables.json then names.
+    """
+
+    def __init__(self, path: Path = KEYWORD_INDEX_PATH):
+        self.path = Path(path)
+        self.doc_ids: List[str] = []
+        self.doc_lens = array('I')
+        self.doc_offsets = array('Q')
+        self.fold_offsets = array('Q')
+        self.alive = bytearray()
+        self.meta = MetadataColumns()
+        self.postings: Dict[str, bytearray] = {}
+        self.last_doc: Dict[str, int] = {}
+        self.doc_freq: Dict[str, int] = {}
+        self.id_to_doc: Dict[str, int] = {}
+        self.live_count = 0
+        self.live_length = 0
+        self.stale = False
+        # Bumped by compact(), which writes a fresh set of data files
+        self.generation = 0
+        self._docs_file = None
+        self._fold_file = None
+        # docs.jsonl as of load(), read by fetch() until this process writes
+        self._snapshot: Optional[mmap.mmap] = None
+
+    # Persistence
+
+    def _file(self, stem: str, suffix: str, generation: Optional[int] = None) -> Path:
+        return generation_file(self.path, stem, suffix,
+                               self.generation if generation is None else generation)
+
+    @property
+    def index_file(self) -> Path:
+        return self._file("index", ".pkl")
+
+    @property
+    def docs_file(self) -> Path:
+        return self._file("docs", ".jsonl")
+
+    @property
+    def fold_file(self) -> Path:
+        return self._file("fold", ".bin")
+
+    @property
+    def columns_file(self) -> Path:
+        return self._file("columns", ".bin")
+
+    def exists(self) -> bool:
+        """True if an index in the current format is on disk"""
+        return self.index_file.exists() and not self.stale
+
+    @classmethod
+    def load(cls, path: Path = KEYWORD_INDEX_PATH) -> "KeywordIndex":
+        index = cls(path)
+        try:
+            return index._load()
+        except FileNotFoundError:
+            # A compaction replaced the generation between reading tables.json
+            # and opening its files; the new one is complete, so read that
+            return cls(path)._load()
+
+    def _load(self) -> "KeywordIndex":
+        try:
+            self.generation = read_tables(self.path).get('generation', 0)
+        except FileNotFoundError:
+            pass
+        if not self.exists():
+            return self
+
+        with open(self.index_file, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') != INDEX_VERSION:
+            self.stale = True
+            return self
+
+        for key in _STATE_KEYS:
+            setattr(self, key, state[key])
+        self.id_to_doc = {
+            doc_id: doc for doc, doc_id in enumerate(self.doc_ids) if self.alive[doc]
+        }
+        self._snapshot = map_snapshot(self.docs_file)
+        if self._snapshot is None and self.doc_ids:
+            raise FileNotFoundError(f"Missing {self.docs_file}")
+        return self
+
+    def save(self):
+        """Flush chunk text, then atomically replace the postings and column files"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        for handle in (self._docs_file, self._fold_file):
+            if handle is not None:
+                handle.flush()
+                os.fsync(handle.fileno())
+        # Code tables only grow, so a reader holding older columns can use them
+        tables, staged = self._stage()
+        self._publish([tables] + staged)
+
+    def _stage(self, fold_end: Optional[int] = None) -> Tuple[Tuple[Path, Path], List[Tuple[Path, Path]]]:
+        """Write tables.json and the postings and column files to temporary paths
+
+        Returns (temporary, final) pairs: the one for tables.json, then the others.
+        """
+        tables = self.path / "tables.json"
+        tmp_tables = tables.with_suffix('.tmp')
+        tmp_tables.write_text(json.dumps(dict(self.meta.tables(), version=INDEX_VERSION,
+                                              generation=self.generation)), encoding='utf-8')
+
+        # The flat files SubstringIndex maps, so it never unpickles the postings
+        if fold_end is None:
+            fold_end = self.fold_file.stat().st_size if self.fold_file.exists() else 0
+        tmp_columns = self.path / "columns.tmp"
+        with open(tmp_columns, 'wb') as f:
+            array('Q', [len(self.doc_ids), fold_end]).tofile(f)
+            for name, typecode in _COLUMNS:
+                column = getattr(self, name)
+                f.write(column if isinstance(column, bytearray) else column.tobytes())
+            self.meta.write_columns(f)
+
+        state = {key: getattr(self, key) for key in _STATE_KEYS}
+        state['version'] = INDEX_VERSION
+        tmp_index = self.index_file.with_suffix('.tmp')
+        with open(tmp_index, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        return (tmp_tables, tables), [(tmp_columns, self.columns_file), (tmp_index, self.index_file)]
+
+    @staticmethod
+    def _publish(staged: List[Tuple[Path, Path]]):
+        for tmp_path, path in staged:
+            os.replace(tmp_path, path)
+
+    def close(self):
+        for name in ('_docs_file', '_fold_file'):
+            handle = getattr(self, name)
+            if handle is not None:
+                handle.close()
+                setattr(self, name, None)
+
+    # Updates
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        """Index a batch of chunks; an ID that is already present is replaced"""
+        self.remove([doc_id for doc_id in ids if doc_id in self.id_to_doc])
+
+        if self._docs_file is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._docs_file = open(self.docs_file, 'ab')
+            self._fold_file = open(self.fold_file, 'ab')
+
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            doc = len(self.doc_ids)
+            tokens = tokenize(text)
+
+            offset = self._docs_file.tell()
+            line = json.dumps({'id': doc_id, 'text': text}, ensure_ascii=False)
+            self._docs_file.write(line.encode('utf-8') + b'\n')
+
+            self.fold_offsets.append(self._fold_file.tell())
+            self._fold_file.write(text.lower().encode('utf-8') + FOLD_SEPARATOR)
+
+            self.doc_ids.append(doc_id)
+            self.doc_lens.append(len(tokens))
+            self.doc_offsets.append(offset)
+            self.alive.append(1)
+            self.meta.append(metadata)
+            self.id_to_doc[doc_id] = doc
+            self.live_count += 1
+            self.live_length += len(tokens)
+
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, tf in counts.items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = bytearray()
+                _encode_varint(doc - self.last_doc.get(term, 0), posting)
+                _encode_varint(tf, posting)
+                self.last_doc[term] = doc
+                self.doc_freq[term] = self.doc_freq.get(term, 0) + 1
+
+    def remove(self, ids: Iterable[str]):
+        """Tombstone chunks; their postings are dropped on the next compact()"""
+        dead = []
+        for doc_id in ids:
+            doc = self.id_to_doc.pop(doc_id, None)
+            if doc is None:
+                continue
+            self.alive[doc] = 0
+            self.live_count -= 1
+            self.live_length -= self.doc_lens[doc]
+            dead.append(doc)
+
+        # Keep IDF to live chunks; the stored text gives the terms to take back
+        for record in self.fetch(dead) if dead else ():
+            for term in set(tokenize(record['text'])):
+                self.doc_freq[term] -= 1
+
+    @property
+    def dead_count(self) -> int:
+        return len(self.doc_ids) - self.live_count
+
+    def needs_compaction(self) -> bool:
+        return bool(self.doc_ids) and self.dead_count / len(self.doc_ids) > COMPACT_DEAD_FRACTION
+
+    def compact(self):
+        """Renumber live chunks and rewrite postings and chunk text without tombstones
+
+        Everything is written as a new generation of data files, and
+        tables.json, which names the generation readers open, is replaced
+        last; so chunk text, columns and postings a reader opens always come
+        from the same pass. Older generations are deleted afterwards; on
+        Windows, files still mapped by a reader stay until the next compaction.
+        """
+        self.close()
+        self._snapshot = None
+        remap = array('i', [-1]) * len(self.doc_ids)
+        doc_ids, doc_lens, doc_offsets, fold_offsets = [], array('I'), array('Q'), array('Q')
+        live = []
+        generation = self.generation + 1
+        new_docs = self._file("docs", ".jsonl", generation)
+        new_fold = self._file("fold", ".bin", generation)
+
+        with open(self.docs_file, 'rb') as old, open(new_docs, 'wb') as new, \
+                open(new_fold, 'wb') as fold:
+            for doc, alive in enumerate(self.alive):
+                if not alive:
+                    continue
+                old.seek(self.doc_offsets[doc])
+                line = old.readline()
+                fold_offsets.append(fold.tell())
+                fold.write(json.loads(line)['text'].lower().encode('utf-8') + FOLD_SEPARATOR)
+                remap[doc] = len(doc_ids)
+                doc_ids.append(self.doc_ids[doc])
+                doc_lens.append(self.doc_lens[doc])
+                live.append(doc)
+                doc_offsets.append(new.tell())
+                new.write(line)
+            for handle in (new, fold):
+                handle.flush()
+                os.fsync(handle.fileno())
+
+        postings, last_doc, doc_freq = {}, {}, {}
+        for term, data in self.postings.items():
+            encoded = bytearray()
+            previous = 0
+            count = 0
+            for doc, tf in _iter_postings(data):
+                new_doc = remap[doc]
+                if new_doc < 0:
+                    continue
+                _encode_varint(new_doc - previous, encoded)
+                _encode_varint(tf, encoded)
+                previous = new_doc
+                count += 1
+            if count:
+                postings[term] = encoded
+                last_doc[term] = previous
+                doc_freq[term] = count
+
+        self.doc_ids, self.doc_lens, self.doc_offsets = doc_ids, doc_lens, doc_offsets
+        self.fold_offsets = fold_offsets
+        self.meta = self.meta.take(live)
+        self.alive = bytearray([1]) * len(doc_ids)
+        self.postings, self.last_doc, self.doc_freq = postings, last_doc, doc_freq
+        self.id_to_doc = {doc_id: doc for doc, doc_id in enumerate(doc_ids)}
+        self.generation = generation
+
+        tables, staged = self._stage(fold_end=new_fold.stat().st_size)
+        self._publish(staged + [tables])
+        self._remove_stale_generations()
+
+    def _remove_stale_generations(self):
+        """Delete data files of every generation but the current one"""
+        for path in self.path.iterdir():
+            match = _DATA_FILE.match(path.name)
+            if match and int(match.group(1) or 0) != self.generation:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    # Queries
+
+    def _allowed(self, filters: Optional[SearchFilters]):
+        """NumPy mask of live documents that pass the filters, or None when nothing is filtered"""
+        mask = self.meta.mask(filters, len(self.doc_ids))
+        if mask is None or not len(mask):
+            return mask
+        import numpy as np
+
+        return mask & np.frombuffer(self.alive, dtype=bool)
+
+    def search(self, query: str, k: int = 5,
+               filters: Optional[SearchFilters] = None,
+               ids: Optional[Iterable[str]] = None) -> List[Tuple[int, float]]:
+        """Top-k (doc number, BM25 score) pairs for a query, within the filters (or ``ids``)"""
+        if not self.live_count:
+            return []
+
+        if ids is not None:
+            allowed = bytearray(len(self.doc_ids))
+            for doc_id in ids:
+                doc = self.id_to_doc.get(doc_id)
+                if doc is not None:
+                    allowed[doc] = 1
+        else:
+            allowed = self._allowed(filters)
+            # One byte per document either way, so the loop does a single lookup
+            allowed = self.alive if allowed is None else allowed.tobytes()
+        avg_len = self.live_length / self.live_count
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            data = self.postings.get(term)
+            if data is None:
+                continue
+            df = self.doc_freq[term]
+            idf = math.log(1.0 + (self.live_count - df + 0.5) / (df + 0.5))
+            for doc, tf in _iter_postings(data):
+                if not allowed[doc]:
+                    continue
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lens[doc] / avg_len)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def browse(self, filters: Optional[SearchFilters] = None,
+               k: int = 20) -> List[Tuple[int, float]]:
+        """Newest k (doc number, timestamp) pairs within the filters, no query needed"""
+        import numpy as np
+
+        n = len(self.doc_ids)
+        if not n:
+            return []
+        allowed = self._allowed(filters)
+        if allowed is None:
+            allowed = np.frombuffer(self.alive, dtype=bool)
+        docs = np.flatnonzero(allowed)
+        times = np.frombuffer(self.meta.timestamp, dtype='d', count=n)[docs]
+        if len(docs) > k:
+            top = np.argpartition(-times, k - 1)[:k]
+            docs, times = docs[top], times[top]
+        order = np.argsort(-times, kind='stable')
+        return [(int(docs[i]), float(times[i])) for i in order]
+
+    def fetch(self, docs: Sequence[int]) -> List[Dict[str, Any]]:
+        """Read stored chunks ({'id', 'text', 'metadata'}) by doc number"""
+        if self._docs_file is None and self._snapshot is not None:
+            records = [read_record(self._snapshot, self.doc_offsets[doc]) for doc in docs]
+        else:
+            if self._docs_file is not None:
+                self._docs_file.flush()
+            records = []
+            with open(self.docs_file, 'rb') as f:
+                for doc in docs:
+                    f.seek(self.doc_offsets[doc])
+                    records.append(json.loads(f.readline()))
+        for record, doc in zip(records, docs):
+            record['metadata'] = self.meta.row(doc)
+        return records
+
+
+class SubstringIndex:
+    """Read-only, memory-mapped view of a KeywordIndex for exact-match queries
+
+    Opening it reads two small files and maps the rest, without unpickling the
+    postings, so a one-off CLI query costs milliseconds. A query is a
+    case-insensitive substring scan of fold.bin (memchr speed), and only the
+    matching chunks' columns and text are ever touched.
+    """
+
+    def __init__(self, path: Path = KEYWORD_INDEX_PATH):
+        self.path = Path(path)
+        self.count = 0
+        self.fold_end = 0
+        self.meta = MetadataColumns()
+        self.columns: Dict[str, memoryview] = {}
+        self.fold: Optional[mmap.mmap] = None
+        self.docs: Optional[mmap.mmap] = None
+        self._views: List[memoryview] = []
+        self._maps: List[mmap.mmap] = []
+
+    @classmethod
+    def open(cls, path: Path = KEYWORD_INDEX_PATH) -> Optional["SubstringIndex"]:
+        """Map the index files, or None if there is no index in the current format"""
+        index = cls(path)
+        try:
+            return index._open()
+        except FileNotFoundError:
+            # A compaction replaced the generation while the files were opened
+            index.close()
+            try:
+                return cls(path)._open()
+            except FileNotFoundError:
+                return None
+
+    def _open(self) -> Optional["SubstringIndex"]:
+        try:
+            tables = read_tables(self.path)
+        except ValueError:
+            return None
+        if tables.get('version') != INDEX_VERSION:
+            return None
+        generation = tables.get('generation', 0)
+        try:
+            columns = memoryview(self._map(generation_file(self.path, "columns", ".bin", generation)))
+        except ValueError:
+            return None
+        self._views.append(columns)
+
+        self.count, self.fold_end = columns[:_HEADER].cast('Q')
+        position = _HEADER
+        for name, typecode in _COLUMNS:
+            size = array(typecode).itemsize * self.count
+            view = columns[position:position + size]
+            self.columns[name] = view.cast(typecode)
+            self._views += [view, self.columns[name]]
+            position += size
+        self.meta, _ = MetadataColumns.map_columns(columns, position, self.count, tables)
+        if self.fold_end:
+            self.fold = self._map(generation_file(self.path, "fold", ".bin", generation))
+        self.docs = map_snapshot(generation_file(self.path, "docs", ".jsonl", generation))
+        if self.docs is None and self.count:
+            raise FileNotFoundError(f"Missing docs.jsonl of generation {generation}")
+        if self.docs is not None:
+            self._maps.append(self.docs)
+        return self
+
+    def _map(self, path: Path) -> mmap.mmap:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+    def search(self, query: str, k: int = 5,
+               filters: Optional[SearchFilters] = None,
+               ids: Optional[Iterable[str]] = None) -> List[Tuple[int, float]]:
+        """Top-k (doc number, occurrence count) for chunks containing the query text"""
+        needle = query.strip().lower().encode('utf-8')
+        if not needle or self.fold is None:
+            return []
+
+        # Only matching chunks are checked, so a per-row predicate beats a full
+        # mask here and exact mode never imports NumPy
+        accept = self.meta.accept(filters)
+        if ids is not None:
+            wanted, offsets = set(ids), self.columns['doc_offsets']
+
+            def accept(doc: int) -> bool:
+                return read_record(self.docs, offsets[doc])['id'] in wanted
+        starts, alive, times = self.columns['fold_offsets'], self.columns['alive'], self.meta.timestamp
+        fold = self.fold
+        hits: List[Tuple[float, float, int]] = []
+        position = fold.find(needle, 0, self.fold_end)
+        while position != -1:
+            doc = bisect_right(starts, position) - 1
+            end = starts[doc + 1] if doc + 1 < self.count else self.fold_end
+            if alive[doc] and (accept is None or accept(doc)):
+                # Count every occurrence in this chunk at once, then skip past it
+                occurrences = fold[position:end].count(needle)
+                hits.append((float(occurrences), times[doc], doc))
+            position = fold.find(needle, end, self.fold_end)
+
+        # Most occurrences first, newest first among ties
+        best = heapq.nlargest(k, hits)
+        return [(doc, occurrences) for occurrences, _, doc in best]
+
+    def fetch(self, docs: Sequence[int]) -> List[Dict[str, Any]]:
+        """Read stored chunks ({'id', 'text', 'metadata'}) by doc number"""
+        offsets = self.columns['doc_offsets']
+        records = [read_record(self.docs, offsets[doc]) for doc in docs]
+        for record, doc in zip(records, docs):
+            record['metadata'] = self.meta.row(doc)
+        return records
+
+    def close(self):
+        # Views must be released, innermost first, before their map can close
+        self.meta.release()
+        self.meta = MetadataColumns()
+        for view in reversed(self._views):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self.columns, self.fold, self.docs, self._views, self._maps = {}, None, None, [], []
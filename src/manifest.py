@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Index Manifest
+Track which vault files are indexed so re-runs only touch what changed
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+MANIFEST_VERSION = 2
+
+
+def hash_file(file_path: Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in blocks so large exports stay cheap"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source: str, turn: int, chunk: int, conversation: str = '') -> str:
+    """Deterministic vector ID for one chunk of one conversation turn
+
+    Turns of an account export are numbered within their ``conversation``,
+    so its chunks keep their IDs when other conversations come and go.
+    """
+    key = f"{source}#{conversation}" if conversation else source
+    return hashlib.sha1(f"{key}:{turn}:{chunk}".encode('utf-8')).hexdigest()
+
+
+class ManifestDiff:
+    """Result of comparing the vault against the manifest"""
+
+    def __init__(self):
+        self.added: List[Path] = []
+        self.changed: List[Path] = []
+        self.unchanged: List[Path] = []
+        self.removed: List[str] = []
+
+    @property
+    def to_index(self) -> List[Path]:
+        return self.added + self.changed
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+class IndexManifest:
+    """Per-file record of size, mtime, content hash and the chunks it produced
+
+    Chunk IDs are not stored; each file keeps its chunk count per turn and
+    the IDs are regenerated with chunk_id(), which keeps the manifest small
+    for vaults with millions of chunks. Account exports keep
+    ``conversations`` instead: ID -> [version, chunk count per turn].
+    """
+
+    def __init__(self, path: Path, files: Dict[str, Dict[str, Any]] = None,
+                 parser_version: int = 0):
+        self.path = Path(path)
+        self.files = files or {}
+        # Version of the loader that produced the indexed chunks
+        self.parser_version = parser_version
+
+    @classmethod
+    def load(cls, path: Path) -> "IndexManifest":
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        data = json.loads(path.read_text(encoding='utf-8'))
+        if data.get('version') != MANIFEST_VERSION:
+            # Unknown layout - start over rather than trust stale IDs
+            return cls(path)
+        return cls(path, data.get('files', {}), data.get('parser_version', 0))
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def save(self):
+        """Write atomically so an interrupted run never leaves a torn manifest"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        tmp_path.write_text(
+            json.dumps({
+                'version': MANIFEST_VERSION,
+                'parser_version': self.parser_version,
+                'files': self.files
+            }, separators=(',', ':')),
+            encoding='utf-8'
+        )
+        os.replace(tmp_path, self.path)
+
+    def diff(self, file_paths: Iterable[Path]) -> ManifestDiff:
+        """Classify vault files as added, changed, unchanged or removed
+
+        Size and mtime are checked first; the content hash is only computed
+        when they differ, so an untouched vault costs one stat per file.
+        """
+        result = ManifestDiff()
+        seen = set()
+
+        for file_path in file_paths:
+            key = str(file_path)
+            seen.add(key)
+            entry = self.files.get(key)
+            if entry is None:
+                result.added.append(file_path)
+                continue
+
+            stat = file_path.stat()
+            if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+                result.unchanged.append(file_path)
+                continue
+
+            if stat.st_size == entry['size'] and hash_file(file_path) == entry['sha256']:
+                # Touched but not edited - refresh the stat so we skip the hash next time
+                entry['mtime_ns'] = stat.st_mtime_ns
+                result.unchanged.append(file_path)
+                continue
+
+            result.changed.append(file_path)
+
+        result.removed = [key for key in self.files if key not in seen]
+        return result
+
+    def chunk_ids_for(self, keys: Iterable[str],
+                      keep: Optional[Dict[str, Set[str]]] = None) -> List[str]:
+        """All chunk IDs previously stored for the given files
+
+        Conversations listed in ``keep`` for an export are left out.
+        """
+        ids = []
+        for key in keys:
+            entry = self.files.get(key, {})
+            for turn, count in enumerate(entry.get('turn_chunks', [])):
+                ids.extend(chunk_id(key, turn, chunk) for chunk in range(count))
+            kept = (keep or {}).get(key, ())
+            for conversation, (_, turn_chunks) in entry.get('conversations', {}).items():
+                if conversation in kept:
+                    continue
+                for turn, count in enumerate(turn_chunks):
+                    ids.extend(chunk_id(key, turn, chunk, conversation) for chunk in range(count))
+        return ids
+
+    @staticmethod
+    def fingerprint(file_path: Path) -> Dict[str, Any]:
+        """Size, mtime and hash of a file, taken before it is read for indexing"""
+        stat = file_path.stat()
+        return {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': hash_file(file_path)
+        }
+
+    def record(self, file_path: Path, fingerprint: Dict[str, Any], turn_chunks: List[int],
+               conversations: Optional[Dict[str, list]] = None):
+        """Remember the state a file was in when it was indexed"""
+        if conversations is not None:
+            self.files[str(file_path)] = dict(fingerprint, conversations=conversations)
+        else:
+            self.files[str(file_path)] = dict(fingerprint, turn_chunks=turn_chunks)
+
+    def forget(self, key: str):
+        self.files.pop(key, None)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Metrics
+Optional per-stage timings and counters, exported as JSON or Prometheus text
+"""
+
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Upper bounds (seconds) of the histogram buckets, Prometheus style
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Recent observations kept per stage for percentiles in the JSON export
+RESERVOIR_SIZE = 2048
+
+PROMETHEUS_PREFIX = "rag"
+
+# Set to 1 to collect metrics without passing --metrics-out
+ENV_FLAG = "RAG_METRICS"
+
+
+class Histogram:
+    """Bucketed durations plus a ring of recent samples"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent: List[float] = []
+        self._next = 0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        if len(self.recent) < RESERVOIR_SIZE:
+            self.recent.append(seconds)
+        else:
+            self.recent[self._next] = seconds
+            self._next = (self._next + 1) % RESERVOIR_SIZE
+
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum_seconds': self.sum,
+            'mean_ms': self.sum / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class Stopwatch:
+    """Accumulates the time spent pulling items from an iterator"""
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    def wrap(self, iterable: Iterable) -> Iterator:
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.elapsed += time.perf_counter() - start
+                return
+            self.elapsed += time.perf_counter() - start
+            yield item
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """In-process stage histograms and counters
+
+    Disabled by default: timers are a shared no-op and observe/inc return
+    immediately, so the instrumented code paths cost nothing in normal runs.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def observe(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, counter: str, amount: float = 1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def time(self, stage: str):
+        """Context manager recording the duration of its block under stage"""
+        return _Timer(self, stage) if self.enabled else _NULL_TIMER
+
+    # Export
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'stages': {name: hist.as_dict() for name, hist in sorted(self.stages.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        name = f"{PROMETHEUS_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Time spent in each indexing and search stage",
+                 f"# TYPE {name} histogram"]
+        with self.lock:
+            for stage, hist in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float('inf'),), hist.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {hist.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+
+            for counter, value in sorted(self.counters.items()):
+                metric = f"{PROMETHEUS_PREFIX}_{counter}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path: Path):
+        """Write to path: Prometheus text for .prom/.txt, JSON otherwise"""
+        path = Path(path)
+        text = self.to_prometheus() if path.suffix in ('.prom', '.txt') else self.to_json()
+        path.write_text(text, encoding='utf-8')
+
+    def print(self):
+        """Per-stage summary for the terminal"""
+        data = self.as_dict()
+        if not data['stages'] and not data['counters']:
+            return
+        print("\n📈 Stage timings:")
+        for stage, stats in data['stages'].items():
+            print(f"   {stage:24} n={stats['count']:<7} total {stats['sum_seconds']:8.3f}s  "
+                  f"p50 {stats['p50_ms']:8.2f}ms  p99 {stats['p99_ms']:8.2f}ms")
+        for counter, value in data['counters'].items():
+            print(f"   {counter:24} {value:g}")
+
+
+# Shared by every module in the process
+METRICS = Metrics(enabled=os.environ.get(ENV_FLAG) == "1")
+
+
+@contextmanager
+def profiled(output: Optional[str] = None, top: int = 25):
+    """Run the block under cProfile; print the top functions, optionally save the stats"""
+    # Imported here: pstats drags in inspect/dataclasses, ~15 ms of CLI start-up
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if output:
+            profiler.dump_stats(output)
+            print(f"\n🔬 Profile written to {output} (open with: python -m pstats {output})")
+        print(f"\n🔬 Top {top} functions by cumulative time:")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
@@ -5,72 +5,515 @@ Search your Claude conversations from the command line
 """
 
 import sys
+import json
 import argparse
 from pathlib import Path
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-
-def search_conversations(query: str, top_k: int = 5, similarity_threshold: float = 0.0):
-    """Search Claude conversations using semantic similarity"""
-    
-    # Initialize embeddings
-    print("🧠 Loading embedding model...")
-    embedder = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    
-    # Load vector database
-    db_path = Path("data/chroma_db")
-    if not db_path.exists():
-        print("❌ No conversation database found!")
-        print("💡 Run 'python src/index_conversations.py' first to index your chats.")
-        return
-    
-    print("🔍 Loading conversation database...")
-    vectordb = Chroma(
-        persist_directory=str(db_path),
-        embedding_function=embedder
-    )
-    
-    # Perform search
-    print(f"🔎 Searching for: '{query}'")
-    results = vectordb.similarity_search_with_relevance_scores(
-        query, 
-        k=top_k
-    )
-    
+from contextlib import redirect_stdout
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+from config import (EMBEDDING_MODEL, QUERY_CACHE_MAX_MB, KEYWORD_INDEX_PATH, DEDUP_INDEX_PATH,
+                    TURN_INDEX_PATH, SNAPSHOT_PATH)
+from search_daemon import query_daemon, query_daemon_batch
+from search_filters import SearchFilters, parse_time_bound, parse_until
+from metrics import METRICS, profiled
+
+SEARCH_MODES = ("semantic", "keyword", "hybrid", "exact")
+
+# Reciprocal rank fusion constant (Cormack et al.) and candidate depth for hybrid
+RRF_K = 60
+HYBRID_CANDIDATES = 50
+
+# Queries embedded per forward pass (and sent per daemon request) in batch mode
+QUERY_BATCH_SIZE = 512
+
+# langchain pulls in torch at import time, so it is only imported when the
+# search actually runs in-process (i.e. no warm daemon is available) and
+# needs the model; keyword and exact mode never import it
+
+def load_embedder(use_cache: bool = True):
+    """Load the sentence-transformers embedding model
+
+    Query vectors are cached on disk, so repeated searches skip the forward
+    pass; with the cache, the model itself is only loaded on the first miss.
+    """
+    def load():
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+    if not use_cache:
+        return load()
+
+    from embedding_cache import EmbeddingCache, CachedEmbeddings
+    return CachedEmbeddings(load, EmbeddingCache(EMBEDDING_MODEL, namespace="queries", max_mb=QUERY_CACHE_MAX_MB))
+
+def load_vector_store(embedder=None, backend: Optional[str] = None, snapshot: Optional[str] = None):
+    """Open the persisted vector store, or return None if nothing is indexed yet
+
+    The backend defaults to whichever one the indexer last built. A
+    ``snapshot`` path maps that exported file instead of the data directory.
+    """
+    if snapshot is not None:
+        from snapshot import SnapshotStore
+
+        return SnapshotStore.open(Path(snapshot)) if Path(snapshot).is_file() else None
+
+    from vector_store import open_vector_store
+
+    return open_vector_store(backend, embedder)
+
+def load_keyword_index():
+    """Open the BM25 keyword index, or return None if it has not been built"""
+    from keyword_index import KeywordIndex
+
+    index = KeywordIndex.load(KEYWORD_INDEX_PATH)
+    return index if index.exists() else None
+
+def load_substring_index():
+    """Map the exact-match view of the keyword index, or return None if it has not been built"""
+    from keyword_index import SubstringIndex
+
+    return SubstringIndex.open(KEYWORD_INDEX_PATH)
+
+def load_duplicates() -> Dict[str, List[Dict[str, Any]]]:
+    """Locations of the near-duplicate copies folded into each stored chunk"""
+    # Read directly: dedup.py pulls in NumPy, which exact mode avoids
+    path = DEDUP_INDEX_PATH / "duplicates.json"
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding='utf-8'))
+
+def load_turn_index():
+    """Map the positional turn index, or return None if it has not been built"""
+    from turn_index import TurnIndex
+
+    index = TurnIndex.load(TURN_INDEX_PATH)
+    return index if index.files else None
+
+def attach_context(results: List[Dict[str, Any]], turns: int,
+                   turn_index=None) -> List[Dict[str, Any]]:
+    """Add the ``turns`` turns around each result (whole conversation if < 0) as 'context'"""
+    from turn_index import attach_context as attach
+
+    owned = turn_index is None
+    if owned:
+        turn_index = load_turn_index()
+    try:
+        return attach(results, turn_index, turns)
+    finally:
+        if owned and turn_index is not None:
+            turn_index.close()
+
+def attach_duplicates(results: List[Dict[str, Any]],
+                      duplicates: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Add a 'duplicates' list to results whose chunk also appears elsewhere"""
+    for result in results:
+        copies = duplicates.get(result['id'])
+        if copies:
+            result['duplicates'] = copies
+    return results
+
+def folded_copies(duplicates: Optional[Dict[str, List[Dict[str, Any]]]],
+                  filters: Optional[SearchFilters]) -> Dict[str, Dict[str, Any]]:
+    """Stored chunks with a folded copy that passes the filters, mapped to that copy
+
+    Copies are never stored, so no index can filter on them; their recorded
+    locations are checked here instead.
+    """
+    if not duplicates or not filters:
+        return {}
+    copies = {}
+    for original, locations in duplicates.items():
+        for location in locations:
+            if filters.matches(location.get('timestamp') or 0.0, location.get('speaker'),
+                               location.get('filename')):
+                copies[original] = location
+                break
+    return copies
+
+def _with_copies(hits: List[tuple], copy_hits: List[tuple], copies: Dict[str, Dict[str, Any]],
+                 filters: SearchFilters, k: int) -> List[tuple]:
+    """Merge (id, text, metadata, score) hits of the originals of ``copies`` in, as the copies
+
+    Originals that pass the filters themselves were already up for the
+    filtered query, so only the rest are shown, at the place of their copy.
+    """
+    extra = [
+        (copies[doc_id]['id'], text, copies[doc_id], score)
+        for doc_id, text, metadata, score in copy_hits
+        if not filters.matches(metadata.get('timestamp') or 0.0, metadata.get('speaker'),
+                               metadata.get('filename'))
+    ]
+    if not extra:
+        return hits
+    return sorted(hits + extra, key=lambda hit: hit[3], reverse=True)[:k]
+
+def _result(doc_id: str, content: str, metadata: Dict[str, Any], score: float) -> Dict[str, Any]:
+    return {
+        'id': doc_id,
+        'content': content,
+        'source': metadata.get('source', 'Unknown'),
+        'filename': metadata.get('filename', 'Unknown'),
+        'conversation_id': metadata.get('conversation_id') or None,
+        'speaker': metadata.get('speaker', 'Unknown'),
+        'conversation_turn': metadata.get('conversation_turn', 'N/A'),
+        'timestamp': metadata.get('timestamp'),
+        'char_start': metadata.get('char_start'),
+        'char_end': metadata.get('char_end'),
+        'score': float(score)
+    }
+
+def vector_search(store, embedder, query: str, k: int,
+                  filters: Optional[SearchFilters] = None,
+                  vector: Optional[List[float]] = None,
+                  copies: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Nearest chunks by embedding similarity, filtered inside the vector query
+
+    Pass ``vector`` when the query has already been embedded (e.g. as part
+    of a batch) to skip the model. ``copies`` (see folded_copies) are ranked
+    too and returned as the copy that matched the filters.
+    """
+    if vector is None:
+        with METRICS.time('search_embed_query'):
+            vector = embedder.embed_query(query)
+    with METRICS.time('search_vector'):
+        hits = store.search(vector, k, filters)
+        if copies:
+            hits = _with_copies(hits, store.search(vector, k, ids=list(copies)), copies, filters, k)
+    with METRICS.time('search_format'):
+        return [_result(doc_id, text, metadata, score) for doc_id, text, metadata, score in hits]
+
+def keyword_search(keyword_index, query: str, k: int,
+                   filters: Optional[SearchFilters] = None,
+                   copies: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Best chunks by BM25 score, or by occurrences for a SubstringIndex - no model needed"""
+    def lookup(**restriction) -> List[tuple]:
+        hits = keyword_index.search(query, k, **restriction)
+        records = keyword_index.fetch([doc for doc, _ in hits])
+        return [(record['id'], record['text'], record['metadata'], score)
+                for record, (_, score) in zip(records, hits)]
+
+    with METRICS.time('search_keyword'):
+        hits = lookup(filters=filters)
+        if copies:
+            hits = _with_copies(hits, lookup(ids=list(copies)), copies, filters, k)
+    with METRICS.time('search_format'):
+        return [_result(*hit) for hit in hits]
+
+def fuse_rankings(rankings: List[List[Dict[str, Any]]], k: int) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion: score = sum of 1 / (RRF_K + rank) across rankings"""
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, 1):
+            fused.setdefault(result['id'], result)
+            scores[result['id']] = scores.get(result['id'], 0.0) + 1.0 / (RRF_K + rank)
+
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [dict(fused[doc_id], score=scores[doc_id]) for doc_id in best]
+
+def run_search(store, query: str, top_k: int = 5,
+               similarity_threshold: float = 0.0,
+               mode: str = "semantic",
+               keyword_index=None,
+               filters: Optional[SearchFilters] = None,
+               embedder=None,
+               query_vector: Optional[List[float]] = None,
+               duplicates: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+    """Query the open indexes and return plain, JSON-friendly results
+
+    ``semantic`` ranks by embedding similarity, ``keyword`` by BM25 and
+    ``hybrid`` fuses both rankings. ``exact`` returns chunks containing the
+    query text (case-insensitive); for it, ``keyword_index`` is a
+    SubstringIndex. The similarity threshold only applies to semantic
+    scores. ``filters`` are applied by each index during the query, so
+    top_k is always filled from matching chunks; with ``duplicates`` they
+    also match folded copies. ``query_vector`` is the query's embedding, if
+    the caller already has it.
+    """
+    METRICS.inc(f'search_queries_{mode}')
+    copies = folded_copies(duplicates, filters)
+    if mode in ("keyword", "exact"):
+        return keyword_search(keyword_index, query, top_k, filters, copies) if keyword_index else []
+
+    if mode == "hybrid" and keyword_index is not None:
+        depth = max(top_k, HYBRID_CANDIDATES)
+        semantic = [
+            result for result in vector_search(store, embedder, query, depth, filters, query_vector, copies)
+            if result['score'] >= similarity_threshold
+        ]
+        lexical = keyword_search(keyword_index, query, depth, filters, copies)
+        with METRICS.time('search_fuse'):
+            return fuse_rankings([semantic, lexical], top_k)
+
     # Filter by similarity threshold
-    filtered_results = [
-        (doc, score) for doc, score in results 
-        if score >= similarity_threshold
+    return [
+        result for result in vector_search(store, embedder, query, top_k, filters, query_vector, copies)
+        if result['score'] >= similarity_threshold
     ]
-    
-    if not filtered_results:
+
+def run_batch_search(store, queries: List[str], top_k: int = 5,
+                     similarity_threshold: float = 0.0,
+                     mode: str = "semantic",
+                     keyword_index=None,
+                     filters: Optional[SearchFilters] = None,
+                     embedder=None,
+                     workers: int = 4,
+                     duplicates: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[List[Dict[str, Any]]]:
+    """run_search for many queries: one embedding call, one multi-query vector search
+
+    Keyword lookups run on a thread pool. Results come back in query order.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    METRICS.inc(f'search_queries_{mode}', len(queries))
+    copies = folded_copies(duplicates, filters)
+    lexical_mode = mode in ("keyword", "exact")
+    fused = mode == "hybrid" and keyword_index is not None
+    depth = max(top_k, HYBRID_CANDIDATES) if fused else top_k
+
+    semantic: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    if not lexical_mode:
+        with METRICS.time('search_embed_query'):
+            vectors = embedder.embed_documents(queries)
+        with METRICS.time('search_vector'):
+            hits = store.search_many(vectors, depth, filters, workers)
+            if copies:
+                copy_hits = store.search_many(vectors, depth, workers=workers, ids=list(copies))
+                hits = [_with_copies(query_hits, query_copy_hits, copies, filters, depth)
+                        for query_hits, query_copy_hits in zip(hits, copy_hits)]
+        with METRICS.time('search_format'):
+            semantic = [
+                [result for result in (_result(*hit) for hit in query_hits)
+                 if result['score'] >= similarity_threshold]
+                for query_hits in hits
+            ]
+
+    lexical: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    if mode != "semantic" and keyword_index is not None:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            lexical = list(pool.map(lambda query: keyword_search(keyword_index, query, depth, filters, copies),
+                                    queries))
+
+    if lexical_mode:
+        return lexical
+    if fused:
+        with METRICS.time('search_fuse'):
+            return [fuse_rankings([a, b], top_k) for a, b in zip(semantic, lexical)]
+    return semantic
+
+def print_results(results: List[Dict[str, Any]]):
+    """Pretty-print search results for the terminal"""
+    if not results:
         print("😕 No relevant conversations found.")
         print("💡 Try a different query or lower the similarity threshold.")
         return
-    
+
     # Display results
-    print(f"\n✨ Found {len(filtered_results)} relevant conversations:")
+    print(f"\n✨ Found {len(results)} relevant conversations:")
     print("=" * 60)
-    
-    for i, (doc, score) in enumerate(filtered_results, 1):
-        metadata = doc.metadata
-        
-        print(f"\n📄 Result {i} (Relevance: {score:.2f})")
-        print(f"📁 Source: {metadata.get('filename', 'Unknown')}")
-        print(f"🗣️ Speaker: {metadata.get('speaker', 'Unknown')}")
-        print(f"🔢 Turn: {metadata.get('conversation_turn', 'N/A')}")
+
+    for i, result in enumerate(results, 1):
+        print(f"\n📄 Result {i} (Relevance: {result['score']:.2f})")
+        print(f"📁 Source: {result.get('filename', 'Unknown')}")
+        if result.get('conversation_id'):
+            print(f"🆔 Conversation: {result['conversation_id']}")
+        print(f"🗣️ Speaker: {result.get('speaker', 'Unknown')}")
+        print(f"🔢 Turn: {result.get('conversation_turn', 'N/A')}")
+        copies = result.get('duplicates')
+        if copies:
+            names = sorted({copy['filename'] for copy in copies})
+            more = f" (+{len(names) - 3} more)" if len(names) > 3 else ""
+            print(f"📑 Also in: {', '.join(names[:3])}{more} - {len(copies)} copies")
         print("\n💬 Content:")
         print("-" * 40)
-        
+
         # Show content preview
-        content = doc.page_content
+        content = result['content']
         if len(content) > 300:
             content = content[:300] + "..."
         print(content)
-        
-        if i < len(filtered_results):
+
+        context = result.get('context')
+        if context:
+            print(f"\n🧵 Context (turns {context[0]['turn']}-{context[-1]['turn']}):")
+            print("-" * 40)
+            for turn in context:
+                marker = "▶" if turn['turn'] == result.get('conversation_turn') else " "
+                print(f"{marker} [{turn['turn']}] {turn['speaker']}: {turn['content']}")
+
+        if i < len(results):
             print("\n" + "=" * 60)
 
+def search_in_process(query: str, top_k: int = 5,
+                      similarity_threshold: float = 0.0,
+                      mode: str = "semantic",
+                      filters: Optional[SearchFilters] = None,
+                      backend: Optional[str] = None,
+                      snapshot: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """Load the indexes in this process and run one search"""
+    indexes = open_indexes(mode, backend, snapshot)
+    if indexes is None:
+        return None
+    store, keyword_index, embedder = indexes
+    try:
+        duplicates = load_duplicates()
+        results = run_search(store, query, top_k, similarity_threshold, mode, keyword_index, filters,
+                             embedder, duplicates=duplicates)
+        return attach_duplicates(results, duplicates)
+    finally:
+        if mode == "exact":
+            keyword_index.close()
+
+def open_indexes(mode: str, backend: Optional[str] = None,
+                 snapshot: Optional[str] = None) -> Optional[Tuple[Any, Any, Any]]:
+    """(vector store, keyword index, embedder) needed by a search mode; None if missing
+
+    Exact mode gets a SubstringIndex in the keyword index slot.
+    """
+    if mode == "exact":
+        substring_index = load_substring_index()
+        if substring_index is None:
+            print("❌ No keyword index found!")
+            print("💡 Run 'python src/index_conversations.py' to build it.")
+            return None
+        return None, substring_index, None
+
+    keyword_index = None
+    if mode != "semantic":
+        keyword_index = load_keyword_index()
+        if keyword_index is None:
+            print("❌ No keyword index found!")
+            print("💡 Run 'python src/index_conversations.py' to build it.")
+            return None
+
+    store = embedder = None
+    if mode != "keyword":
+        # Initialize embeddings
+        print("🧠 Loading embedding model...")
+        embedder = load_embedder()
+
+        # Load vector database
+        print("🔍 Loading conversation database...")
+        store = load_vector_store(embedder, backend, snapshot)
+        if store is None:
+            if snapshot is not None:
+                print(f"❌ No snapshot at {snapshot}!")
+                print("💡 Export one with 'python src/index_conversations.py --export-snapshot'.")
+                return None
+            print("❌ No conversation database found!")
+            print("💡 Run 'python src/index_conversations.py' first to index your chats.")
+            return None
+
+    return store, keyword_index, embedder
+
+def search_conversations(query: str, top_k: int = 5, similarity_threshold: float = 0.0,
+                         use_daemon: bool = True, mode: str = "semantic",
+                         filters: Optional[SearchFilters] = None,
+                         backend: Optional[str] = None,
+                         context: int = 0,
+                         snapshot: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Search Claude conversations, print the results and return them
+
+    Uses the warm search daemon when one is running and falls back to
+    loading everything in-process otherwise. Forcing a backend skips the
+    daemon, which serves whatever the indexer last built; so does a
+    ``snapshot`` file. ``context`` adds that many turns either side of each
+    hit, read through the turn index (-1 for the whole conversation).
+    """
+    results = None
+    if use_daemon and backend is None and snapshot is None:
+        results = query_daemon(query, top_k, similarity_threshold, mode, filters)
+
+    if results is None:
+        results = search_in_process(query, top_k, similarity_threshold, mode, filters, backend,
+                                    snapshot)
+        if results is None:
+            return []
+
+    if context:
+        with METRICS.time('search_context'):
+            attach_context(results, context)
+
+    print(f"🔎 Searching for: '{query}' ({mode})")
+    with METRICS.time('search_print'):
+        print_results(results)
+    return results
+
+def read_batch_queries(lines: Iterable[str]) -> Iterator[Tuple[Any, str]]:
+    """(id, query) pairs from plain-text lines or {"id": ..., "query": ...} JSON lines
+
+    Plain lines are numbered from 0 in input order; blank lines are skipped.
+    """
+    for number, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            record = json.loads(line)
+            yield record.get('id', number), record['query']
+        else:
+            yield number, line
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def search_batch(lines: Iterable[str], out, top_k: int = 5, similarity_threshold: float = 0.0,
+                 use_daemon: bool = True, mode: str = "semantic",
+                 filters: Optional[SearchFilters] = None, backend: Optional[str] = None,
+                 workers: int = 4, context: int = 0, snapshot: Optional[str] = None) -> int:
+    """Answer every query in lines, writing one JSON line per query to out
+
+    Queries are processed QUERY_BATCH_SIZE at a time, through the daemon if
+    one is running, otherwise with indexes loaded once in this process.
+    Progress messages go to stderr so out can be stdout. Returns the
+    number of queries answered.
+    """
+    indexes = None
+    duplicates = None
+    turn_index = load_turn_index() if context else None
+    answered = 0
+    for chunk in _chunks(read_batch_queries(lines), QUERY_BATCH_SIZE):
+        texts = [query for _, query in chunk]
+        results = None
+        if use_daemon and backend is None and snapshot is None and indexes is None:
+            results = query_daemon_batch(texts, top_k, similarity_threshold, mode, filters)
+            use_daemon = results is not None
+
+        if results is None:
+            if indexes is None:
+                with redirect_stdout(sys.stderr):
+                    indexes = open_indexes(mode, backend, snapshot)
+                if indexes is None:
+                    return answered
+                duplicates = load_duplicates()
+            store, keyword_index, embedder = indexes
+            results = run_batch_search(store, texts, top_k, similarity_threshold, mode,
+                                       keyword_index, filters, embedder, workers, duplicates)
+            for query_results in results:
+                attach_duplicates(query_results, duplicates)
+
+        for (query_id, query), query_results in zip(chunk, results):
+            if turn_index is not None:
+                attach_context(query_results, context, turn_index)
+            out.write(json.dumps({'id': query_id, 'query': query, 'results': query_results},
+                                 ensure_ascii=False) + '\n')
+        answered += len(chunk)
+        print(f"📦 {answered} queries answered", file=sys.stderr)
+
+    if indexes is not None and mode == "exact":
+        indexes[1].close()
+    if turn_index is not None:
+        turn_index.close()
+    return answered
+
 def main():
     parser = argparse.ArgumentParser(
         description="Search your Claude conversation history",
@@ -80,45 +523,199 @@ Examples:
   python src/search.py "python web scraping"
   python src/search.py "career advice" --top-k 10
   python src/search.py "debugging tips" --threshold 0.7
+  python src/search.py "ModuleNotFoundError" --mode keyword
+  python src/search.py "pd.to_numeric(" --mode exact
+  python src/search.py "pandas groupby" --mode hybrid
+  python src/search.py "docker networking" --since 30d --speaker claude
+  python src/search.py "resume tips" --context 2
+  python src/search.py "kubernetes" --snapshot data/index.snapshot
+  python src/search.py --batch queries.txt --output results.jsonl
+  cat queries.txt | python src/search.py --batch - --mode hybrid
+
+Start 'python src/search_daemon.py' in the background to keep the model warm.
         """
     )
-    
+
     parser.add_argument(
         "query",
+        nargs="?",
         help="Search query"
     )
-    
+
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Read one query per line (or {\"id\", \"query\"} JSON lines) from FILE, '-' for stdin, "
+             "and write one JSON line of results per query"
+    )
+
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Where --batch writes its JSON lines (default: stdout)"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Threads for concurrent searches in --batch mode (default: 4)"
+    )
+
     parser.add_argument(
         "--top-k",
         type=int,
         default=5,
         help="Number of results to return (default: 5)"
     )
-    
+
     parser.add_argument(
         "--threshold",
         type=float,
         default=0.0,
         help="Minimum similarity threshold (default: 0.0)"
     )
-    
+
+    parser.add_argument(
+        "--mode",
+        choices=SEARCH_MODES,
+        default="semantic",
+        help="semantic (embeddings), keyword (BM25), hybrid (both, rank-fused) or "
+             "exact (substring match, no model or postings loaded) (default: semantic)"
+    )
+
+    parser.add_argument(
+        "--since",
+        type=parse_time_bound,
+        help="Only turns at or after this date (2024-05-01) or age (7d, 2w, 1m)"
+    )
+
+    parser.add_argument(
+        "--until",
+        type=parse_until,
+        help="Only turns at or before this date or age"
+    )
+
+    parser.add_argument(
+        "--speaker",
+        choices=("human", "claude", "unknown"),
+        help="Only turns by this speaker"
+    )
+
+    parser.add_argument(
+        "--file",
+        help="Only this conversation file (e.g. sample-career-advice.md)"
+    )
+
+    parser.add_argument(
+        "--context",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Show N turns before and after each hit; -1 for the whole conversation (default: 0)"
+    )
+
+    parser.add_argument(
+        "--backend",
+        choices=("chroma", "flat"),
+        help="Vector store to query (default: the one the indexer last built)"
+    )
+
+    parser.add_argument(
+        "--snapshot",
+        nargs="?",
+        const=str(SNAPSHOT_PATH),
+        metavar="PATH",
+        help=f"Search an exported snapshot file instead of the data directory (default: {SNAPSHOT_PATH}); "
+             "keyword modes and --context still read the local indexes"
+    )
+
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Always search in-process, even if the search daemon is running"
+    )
+
+    parser.add_argument(
+        "--metrics-out",
+        metavar="PATH",
+        help="Record per-stage timings and write them to PATH (.prom for Prometheus text, else JSON); "
+             "stages run by the daemon are reported by 'search_daemon.py --metrics'"
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="Run under cProfile (in-process) and print the hottest functions; optionally save to PATH"
+    )
+
     if len(sys.argv) == 1:
         parser.print_help()
         return
-    
+
     args = parser.parse_args()
-    
-    try:
+    if args.query is None and args.batch is None:
+        parser.error("a query or --batch FILE is required")
+    if args.metrics_out:
+        METRICS.enable()
+
+    def run():
+        if args.batch is not None:
+            run_batch(args)
+            return
         search_conversations(
             query=args.query,
             top_k=args.top_k,
-            similarity_threshold=args.threshold
+            similarity_threshold=args.threshold,
+            # Profiling the daemon round trip would only show socket waits
+            use_daemon=not args.no_daemon and args.profile is None,
+            mode=args.mode,
+            filters=SearchFilters(args.since, args.until, args.speaker, args.file),
+            backend=args.backend,
+            context=args.context,
+            snapshot=args.snapshot
         )
+
+    try:
+        if args.profile is not None:
+            with profiled(args.profile or None):
+                run()
+        else:
+            run()
+        if args.metrics_out:
+            METRICS.print()
+            METRICS.dump(args.metrics_out)
     except KeyboardInterrupt:
         print("\n👋 Search cancelled.")
     except Exception as e:
         print(f"\n❌ Error during search: {e}")
         print("💡 Make sure you've run the setup script and indexed your conversations.")
 
+def run_batch(args: argparse.Namespace):
+    """--batch: stream queries from a file or stdin to JSON lines"""
+    source = sys.stdin if args.batch == '-' else open(args.batch, encoding='utf-8')
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        answered = search_batch(
+            source, out,
+            top_k=args.top_k,
+            similarity_threshold=args.threshold,
+            use_daemon=not args.no_daemon and args.profile is None,
+            mode=args.mode,
+            filters=SearchFilters(args.since, args.until, args.speaker, args.file),
+            backend=args.backend,
+            workers=args.workers,
+            context=args.context,
+            snapshot=args.snapshot
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ {answered} queries answered", file=sys.stderr)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Local HTTP API
+Asyncio JSON service over one warm model; concurrent queries share embedding passes
+"""
+
+import json
+import asyncio
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from config import API_HOST, API_PORT, SNAPSHOT_PATH, VAULT_PATH
+from metrics import METRICS
+from search_filters import SearchFilters, parse_time_bound
+
+# Queries arriving within this window share one forward pass
+BATCH_WINDOW_MS = 5.0
+MAX_BATCH = 64
+
+MAX_BODY_BYTES = 1 << 20
+SEARCH_MODES = ("semantic", "keyword", "hybrid", "exact")
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """Collect queries for a few milliseconds, then embed them in one call
+
+    The model runs on a single dedicated thread, so forward passes never
+    contend with each other and the event loop stays free to accept requests
+    while one is in flight; everything that queues up meanwhile forms the
+    next batch.
+    """
+
+    def __init__(self, embedder, window_ms: float = BATCH_WINDOW_MS, max_batch: int = MAX_BATCH):
+        self.embedder = embedder
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self.model_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self.flush_task: Optional[asyncio.Task] = None
+
+    async def embed(self, query: str) -> List[float]:
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((query, future))
+        if len(self.pending) >= self.max_batch:
+            self._flush_now()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self.flush_task = None
+        self._flush_now()
+
+    def _flush_now(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        batch, self.pending = self.pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [query for query, _ in batch]
+        METRICS.inc('api_embed_batches')
+        METRICS.inc('api_embed_queries', len(texts))
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self.model_thread, self._embed_batch, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        with METRICS.time('api_embed_batch'):
+            return self.embedder.embed_documents(texts)
+
+    def close(self):
+        self.model_thread.shutdown(wait=False)
+
+
+def parse_filters(params: Dict[str, Any]) -> SearchFilters:
+    """SearchFilters from request fields; times are epoch seconds, ISO dates or ages like 7d"""
+    if not isinstance(params, dict):
+        raise HTTPError(400, "filters must be a JSON object")
+
+    def bound(value, upper=False):
+        if value is None or value == "":
+            return None
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            return parse_time_bound(str(value), upper=upper)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    return SearchFilters(
+        since=bound(params.get('since')),
+        until=bound(params.get('until'), upper=True),
+        speaker=params.get('speaker') or None,
+        filename=params.get('file') or params.get('filename') or None
+    )
+
+
+def _int(params: Dict[str, Any], name: str, default: int, upper: int = 1000, lower: int = 1) -> int:
+    try:
+        return max(lower, min(upper, int(params.get(name, default))))
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be an integer")
+
+
+class SearchAPI:
+    """Request handlers over the daemon's SearchState"""
+
+    def __init__(self, state, batcher: MicroBatcher, workers: int = 4):
+        self.state = state
+        self.batcher = batcher
+        self.search_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+
+    async def _in_pool(self, call, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.search_pool, call, *args)
+
+    async def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        query = str(params.get('query') or params.get('q') or '').strip()
+        if not query:
+            raise HTTPError(400, "query is required")
+        mode = params.get('mode', 'semantic')
+        if mode not in SEARCH_MODES:
+            raise HTTPError(400, f"mode must be one of {', '.join(SEARCH_MODES)}")
+        top_k = _int(params, 'top_k', 5)
+        try:
+            threshold = float(params.get('threshold', 0.0))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "threshold must be a number")
+        filters = parse_filters(params.get('filters') or params)
+        context = _int(params, 'context', 0, upper=100, lower=-1)
+
+        start = time.perf_counter()
+        vector = None
+        if mode in ("semantic", "hybrid"):
+            vector = await self.batcher.embed(query)
+
+        def search():
+            if self.state.refresh().vectordb is None:
+                raise HTTPError(503, "no conversation database - run index_conversations.py first")
+            return self.state.search(query, top_k, threshold, mode, filters, vector)
+
+        results = await self._in_pool(search)
+        if context:
+            results = await self._in_pool(self._attach_context, results, context)
+        METRICS.observe('api_search', time.perf_counter() - start)
+        return {'query': query, 'mode': mode, 'results': results}
+
+    def _attach_context(self, results: List[Dict[str, Any]], turns: int) -> List[Dict[str, Any]]:
+        from turn_index import attach_context
+
+        return attach_context(results, self.state.refresh().turn_index, turns)
+
+    async def filter(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Newest chunks matching the filters, without a query"""
+        from search import _result
+
+        filters = parse_filters(params.get('filters') or params)
+        limit = _int(params, 'limit', 20)
+
+        def browse():
+            index = self.state.refresh().keyword_index
+            if index is None:
+                raise HTTPError(503, "no keyword index - run index_conversations.py first")
+            hits = index.browse(filters, limit)
+            records = index.fetch([doc for doc, _ in hits])
+            return [_result(record['id'], record['text'], record['metadata'], timestamp)
+                    for record, (_, timestamp) in zip(records, hits)]
+
+        return {'results': await self._in_pool(browse)}
+
+    async def conversation(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Every turn of one vault file, from the turn index or parsed if it is stale"""
+        name = str(params.get('file') or params.get('filename') or '')
+        vault = VAULT_PATH.resolve()
+        path = (vault / name).resolve()
+        # Only files directly in the vault, never a path that escapes it
+        if not name or path.parent != vault or path.suffix != '.md':
+            raise HTTPError(400, "file must name a .md file in the vault")
+        if not path.exists():
+            raise HTTPError(404, f"no conversation named {name}")
+
+        def parse():
+            from index_conversations import ClaudeChatLoader
+
+            turn_index = self.state.refresh().turn_index
+            turns = turn_index.conversation(str(VAULT_PATH / name)) if turn_index else None
+            if turns is not None:
+                return turns
+            content = path.read_text(encoding='utf-8')
+            turns = ClaudeChatLoader(str(vault))._parse_conversation_turns(content, path.stat().st_mtime)
+            return [dict(turn, turn=i) for i, turn in enumerate(turns)]
+
+        return {'file': name, 'turns': await self._in_pool(parse)}
+
+    async def health(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {'ok': True, 'indexed': self.state.vectordb is not None}
+
+    def close(self):
+        self.search_pool.shutdown(wait=False)
+        self.batcher.close()
+
+
+class HTTPServer:
+    """Minimal HTTP/1.1 with keep-alive: JSON bodies in, JSON out"""
+
+    def __init__(self, api: SearchAPI):
+        self.api = api
+        self.routes = {
+            '/search': api.search,
+            '/filter': api.filter,
+            '/conversation': api.conversation,
+            '/health': api.health,
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status, body, content_type = await self.dispatch(request_line, headers, reader)
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request_line: bytes, headers: Dict[str, str],
+                       reader: asyncio.StreamReader) -> Tuple[int, bytes, str]:
+        try:
+            try:
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            except ValueError:
+                raise HTTPError(400, "malformed request line")
+            url = urlsplit(target)
+            params: Dict[str, Any] = dict(parse_qsl(url.query))
+
+            try:
+                length = int(headers.get('content-length', 0) or 0)
+            except ValueError:
+                raise HTTPError(400, "Content-Length must be an integer")
+            if length < 0:
+                raise HTTPError(400, "Content-Length must not be negative")
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(413, "request body too large")
+            if length:
+                body = await reader.readexactly(length)
+                if body.strip():
+                    try:
+                        data = json.loads(body)
+                    except ValueError:
+                        data = None
+                    if not isinstance(data, dict):
+                        raise HTTPError(400, "body must be a JSON object")
+                    params.update(data)
+
+            if url.path == '/metrics':
+                return 200, METRICS.to_prometheus().encode('utf-8'), "text/plain; version=0.0.4"
+            handler = self.routes.get(url.path)
+            if handler is None:
+                raise HTTPError(404, f"no endpoint {url.path}")
+            if method not in ('GET', 'POST'):
+                raise HTTPError(405, "use GET or POST")
+            response = await handler(params)
+            status = 200
+        except HTTPError as e:
+            status, response = e.status, {'error': str(e)}
+        except asyncio.IncompleteReadError:
+            raise
+        except Exception as e:
+            status, response = 500, {'error': str(e)}
+        return status, json.dumps(response, ensure_ascii=False).encode('utf-8'), "application/json"
+
+
+async def serve(host: str, port: int, window_ms: float, max_batch: int, workers: int,
+                snapshot: Optional[str] = None):
+    from search_daemon import SearchState
+
+    # Same reasoning as the daemon: a long-lived server is where timings pay off
+    METRICS.enable()
+    state = SearchState(snapshot)
+    api = SearchAPI(state, MicroBatcher(state.embedder, window_ms, max_batch), workers)
+    server = await asyncio.start_server(HTTPServer(api).handle, host, port)
+    print(f"✅ Search API ready on http://{host}:{port} "
+          f"(batch window {window_ms:g} ms, up to {max_batch} queries per pass)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve Claude conversation search as local HTTP/JSON",
+        epilog="""
+Endpoints (GET with query parameters or POST with a JSON body):
+  /search        query, mode, top_k, threshold, since, until, speaker, file,
+                 context (turns around each hit, -1 for the whole conversation)
+  /filter        since, until, speaker, file, limit - newest matching chunks
+  /conversation  file - every turn of one vault file
+  /health, /metrics
+
+Example:
+  curl 'http://127.0.0.1:8765/search?q=docker+networking&mode=hybrid&since=30d'
+        """,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default=API_HOST, help=f"Interface to bind (default: {API_HOST})")
+    parser.add_argument("--port", type=int, default=API_PORT, help=f"Port (default: {API_PORT})")
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS,
+                        help=f"How long to wait for more queries before embedding (default: {BATCH_WINDOW_MS:g})")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH,
+                        help=f"Queries per embedding pass at most (default: {MAX_BATCH})")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Threads running index lookups (default: 4)")
+    parser.add_argument("--snapshot", nargs="?", const=str(SNAPSHOT_PATH), metavar="PATH",
+                        help=f"Serve an exported snapshot file instead of the data directory (default: {SNAPSHOT_PATH})")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.batch_window_ms, args.max_batch, args.workers,
+                          args.snapshot))
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down.")
+
+
+if __name__ == "__main__":
+    main()
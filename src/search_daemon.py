@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Warm Search Daemon
+Keep the embedding model and vector store loaded so each CLI query costs milliseconds
+"""
+
+import os
+import sys
+import json
+import socket
+import argparse
+import threading
+import socketserver
+import weakref
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from config import SOCKET_PATH, INDEX_INFO_PATH, SNAPSHOT_PATH
+
+# Client side: kept free of heavy imports so search.py starts instantly
+
+def query_daemon(query: str, top_k: int = 5, similarity_threshold: float = 0.0,
+                 mode: str = "semantic", filters=None,
+                 timeout: float = 30.0) -> Optional[List[Dict[str, Any]]]:
+    """Ask a running daemon to search; returns None if no daemon is listening"""
+    response = _send({
+        'query': query,
+        'top_k': top_k,
+        'threshold': similarity_threshold,
+        'mode': mode,
+        'filters': filters.to_dict() if filters else None
+    }, timeout)
+
+    if response is None:
+        return None
+    if 'error' in response:
+        raise RuntimeError(f"search daemon: {response['error']}")
+    return response['results']
+
+def query_daemon_batch(queries: List[str], top_k: int = 5, similarity_threshold: float = 0.0,
+                       mode: str = "semantic", filters=None,
+                       timeout: float = 600.0) -> Optional[List[List[Dict[str, Any]]]]:
+    """Ask a running daemon to answer many queries; None if no daemon is listening"""
+    response = _send({
+        'command': 'batch',
+        'queries': queries,
+        'top_k': top_k,
+        'threshold': similarity_threshold,
+        'mode': mode,
+        'filters': filters.to_dict() if filters else None
+    }, timeout)
+
+    if response is None:
+        return None
+    if 'error' in response:
+        raise RuntimeError(f"search daemon: {response['error']}")
+    return response['results']
+
+def _send(request: Dict[str, Any], timeout: float) -> Optional[Dict[str, Any]]:
+    """Send one JSON line and read one JSON line back"""
+    if not hasattr(socket, 'AF_UNIX') or not SOCKET_PATH.exists():
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(SOCKET_PATH))
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as reader:
+                line = reader.readline()
+    except (ConnectionRefusedError, FileNotFoundError):
+        # Stale socket file from a daemon that is no longer running
+        return None
+
+    if not line:
+        return None
+    return json.loads(line)
+
+# Server side
+
+class IndexView:
+    """One published generation of the indexes; replaced whole, never modified"""
+
+    def __init__(self, vectordb=None, keyword_index=None, substring_index=None,
+                 duplicates: Optional[Dict[str, Any]] = None, generation=None,
+                 turn_index=None):
+        self.vectordb = vectordb
+        self.keyword_index = keyword_index
+        self.substring_index = substring_index
+        self.duplicates = duplicates or {}
+        self.generation = generation
+        self.turn_index = turn_index
+        if vectordb is not None:
+            # Once the last query on a superseded view is done: stops Chroma's
+            # system and lets the indexer delete the generation
+            weakref.finalize(self, vectordb.close)
+
+def published_generation(path: Path = INDEX_INFO_PATH):
+    """Token that changes whenever the indexer publishes a finished run"""
+    # index_info.json is replaced atomically after every store is saved (and
+    # a snapshot after it is fully written), so a new mtime means a complete
+    # new generation is on disk
+    return path.stat().st_mtime_ns if path.exists() else None
+
+class SearchState:
+    """Embedder and the current IndexView, shared by all connections
+
+    Each query works on the view it started with. When the indexer publishes
+    a new generation, the first query to notice loads it while the others
+    keep answering from the old view, then the reference is swapped; old
+    views are left to the garbage collector once their last query finishes,
+    which closes their vector store.
+    """
+
+    def __init__(self, snapshot: Optional[str] = None):
+        from search import load_embedder
+
+        print("🧠 Loading embedding model...")
+        self.embedder = load_embedder()
+        # Serve an exported snapshot file instead of the data directory
+        self.snapshot = snapshot
+        self.lock = threading.Lock()
+        self.view = IndexView()
+        self.refresh()
+
+    @property
+    def vectordb(self):
+        return self.view.vectordb
+
+    @property
+    def keyword_index(self):
+        return self.view.keyword_index
+
+    def refresh(self) -> IndexView:
+        """The newest published view, loading it first if it is new"""
+        from search import (load_vector_store, load_keyword_index, load_substring_index,
+                            load_duplicates, load_turn_index)
+
+        generation = published_generation(Path(self.snapshot) if self.snapshot else INDEX_INFO_PATH)
+        view = self.view
+        if view.vectordb is not None and generation == view.generation:
+            return view
+
+        # Only the very first load makes queries wait; later reloads happen
+        # while other threads keep serving the view they already have
+        if not self.lock.acquire(blocking=view.vectordb is None):
+            return view
+        try:
+            if self.view.vectordb is None or generation != self.view.generation:
+                print(f"🔍 Loading conversation database (generation {_generation_number()})...")
+                self.view = IndexView(
+                    load_vector_store(self.embedder, snapshot=self.snapshot),
+                    load_keyword_index(),
+                    load_substring_index(),
+                    load_duplicates(),
+                    generation,
+                    load_turn_index()
+                )
+            return self.view
+        finally:
+            self.lock.release()
+
+    def search(self, query: str, top_k: int, threshold: float, mode: str,
+               filters=None, query_vector: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        from search import run_search, attach_duplicates
+
+        view = self.refresh()
+        if view.vectordb is None:
+            raise RuntimeError("no conversation database found - run index_conversations.py first")
+        keyword_index = view.substring_index if mode == "exact" else view.keyword_index
+        results = run_search(view.vectordb, query, top_k, threshold, mode, keyword_index,
+                             filters, self.embedder, query_vector, view.duplicates)
+        return attach_duplicates(results, view.duplicates)
+
+    def search_batch(self, queries: List[str], top_k: int, threshold: float, mode: str,
+                     filters=None) -> List[List[Dict[str, Any]]]:
+        from search import run_batch_search, attach_duplicates
+
+        view = self.refresh()
+        if view.vectordb is None:
+            raise RuntimeError("no conversation database found - run index_conversations.py first")
+        keyword_index = view.substring_index if mode == "exact" else view.keyword_index
+        results = run_batch_search(view.vectordb, queries, top_k, threshold, mode, keyword_index,
+                                   filters, self.embedder, duplicates=view.duplicates)
+        return [attach_duplicates(query_results, view.duplicates) for query_results in results]
+
+def _generation_number():
+    try:
+        return json.loads(INDEX_INFO_PATH.read_text(encoding='utf-8')).get('generation', 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+class SearchRequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, one JSON response line out"""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        shutdown = False
+        try:
+            request = json.loads(line)
+            if request.get('command') == 'shutdown':
+                response = {'ok': True}
+                shutdown = True
+            elif request.get('command') == 'ping':
+                response = {'ok': True, 'pid': os.getpid()}
+            elif request.get('command') == 'metrics':
+                from metrics import METRICS
+                response = {'metrics': METRICS.as_dict(), 'prometheus': METRICS.to_prometheus()}
+            elif request.get('command') == 'batch':
+                from search_filters import SearchFilters
+                response = {'results': self.server.state.search_batch(
+                    request['queries'],
+                    int(request.get('top_k', 5)),
+                    float(request.get('threshold', 0.0)),
+                    request.get('mode', 'semantic'),
+                    SearchFilters.from_dict(request.get('filters'))
+                )}
+            else:
+                from search_filters import SearchFilters
+                response = {'results': self.server.state.search(
+                    request['query'],
+                    int(request.get('top_k', 5)),
+                    float(request.get('threshold', 0.0)),
+                    request.get('mode', 'semantic'),
+                    SearchFilters.from_dict(request.get('filters'))
+                )}
+        except Exception as e:
+            response = {'error': str(e)}
+
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+        self.wfile.flush()
+        if shutdown:
+            # Only after replying: handler threads die with the server process
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+class SearchServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, state: SearchState):
+        self.state = state
+        super().__init__(str(SOCKET_PATH), SearchRequestHandler)
+
+def serve(snapshot: Optional[str] = None):
+    """Load everything once and answer queries until interrupted"""
+    if _send({'command': 'ping'}, timeout=2.0) is not None:
+        print(f"⚠️ A search daemon is already listening on {SOCKET_PATH}")
+        return
+
+    # Remove a socket left behind by a crashed daemon
+    if SOCKET_PATH.exists():
+        SOCKET_PATH.unlink()
+    SOCKET_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    from metrics import METRICS
+    # A long-lived process is where stage timings are most useful, and the
+    # handful of clock reads per query is negligible next to the search itself
+    METRICS.enable()
+
+    state = SearchState(snapshot)
+    server = SearchServer(state)
+    print(f"✅ Search daemon ready on {SOCKET_PATH} (pid {os.getpid()})")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down.")
+    finally:
+        server.server_close()
+        if SOCKET_PATH.exists():
+            SOCKET_PATH.unlink()
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep Claude conversation search warm in the background")
+    parser.add_argument(
+        "--stop",
+        action="store_true",
+        help="Stop a running daemon"
+    )
+    parser.add_argument(
+        "--metrics",
+        choices=("json", "prometheus"),
+        nargs="?",
+        const="json",
+        help="Print the running daemon's per-stage timings and counters"
+    )
+    parser.add_argument(
+        "--snapshot",
+        nargs="?",
+        const=str(SNAPSHOT_PATH),
+        metavar="PATH",
+        help=f"Serve an exported snapshot file, reloading it when it is replaced (default: {SNAPSHOT_PATH})"
+    )
+    args = parser.parse_args()
+
+    if not hasattr(socket, 'AF_UNIX'):
+        print("❌ Unix sockets are not available on this platform.")
+        sys.exit(1)
+
+    if args.metrics:
+        response = _send({'command': 'metrics'}, timeout=5.0)
+        if response is None:
+            print("😕 No search daemon is running.")
+        elif args.metrics == "prometheus":
+            print(response['prometheus'], end='')
+        else:
+            print(json.dumps(response['metrics'], indent=2))
+        return
+
+    if args.stop:
+        if _send({'command': 'shutdown'}, timeout=5.0) is None:
+            print("😕 No search daemon is running.")
+        else:
+            print("👋 Search daemon stopped.")
+        return
+
+    serve(args.snapshot)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Search Engine
+One in-process searcher with LRU caches, shared by every session of the web UI
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+from config import ENGINE_RESULT_CACHE_SIZE, ENGINE_VECTOR_CACHE_SIZE
+from search_daemon import SearchState
+from search_filters import SearchFilters
+
+# Results are fetched in blocks of this many, so the pages of a query and the
+# UI's 5/10/15 result counts all share one cache entry
+RESULT_BLOCK = 20
+
+
+class LRUCache:
+    """Bounded mapping that drops the least recently used entry; thread-safe"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value or None"""
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class SearchEngine:
+    """Model, indexes and caches for in-process searches, safe to share across threads
+
+    Built on the daemon's SearchState, so it switches to each index
+    generation the indexer publishes without a restart. Query vectors and
+    result lists are kept in LRU caches that are emptied when the generation
+    changes: a rebuilt index can hold other chunks or come from another model.
+    Callers get copies of the cached results and may add to them.
+    """
+
+    def __init__(self, snapshot: Optional[str] = None,
+                 vector_cache_size: int = ENGINE_VECTOR_CACHE_SIZE,
+                 result_cache_size: int = ENGINE_RESULT_CACHE_SIZE):
+        self.state = SearchState(snapshot)
+        self.vectors = LRUCache(vector_cache_size)
+        self.results = LRUCache(result_cache_size)
+        self.generation = self.state.view.generation
+        self.lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        """True once an index has been built and loaded"""
+        return self.state.vectordb is not None
+
+    def _view(self):
+        """Current IndexView, dropping the caches if it is a new generation"""
+        view = self.state.refresh()
+        with self.lock:
+            if view.generation != self.generation:
+                self.vectors.clear()
+                self.results.clear()
+                self.generation = view.generation
+        return view
+
+    def _vector(self, query: str) -> List[float]:
+        vector = self.vectors.get(query)
+        if vector is None:
+            vector = self.state.embedder.embed_query(query)
+            self.vectors.put(query, vector)
+        return vector
+
+    def search(self, query: str, top_k: int = 5, mode: str = "semantic",
+               filters: Optional[SearchFilters] = None,
+               threshold: float = 0.0) -> List[Dict[str, Any]]:
+        """Best top_k results, as dicts shaped like search.py's"""
+        return self.page(query, 0, top_k, mode, filters, threshold)
+
+    def page(self, query: str, page: int, per_page: int = 5, mode: str = "semantic",
+             filters: Optional[SearchFilters] = None,
+             threshold: float = 0.0) -> List[Dict[str, Any]]:
+        """Results page * per_page up to (page + 1) * per_page of a query"""
+        query = query.strip()
+        end = (page + 1) * per_page
+        depth = -(-end // RESULT_BLOCK) * RESULT_BLOCK
+        view = self._view()
+        key = (view.generation, query, mode,
+               tuple(sorted((filters or SearchFilters()).to_dict().items())), depth, threshold)
+
+        results = self.results.get(key)
+        if results is None:
+            vector = self._vector(query) if mode in ("semantic", "hybrid") else None
+            results = self.state.search(query, depth, threshold, mode, filters, vector)
+            self.results.put(key, results)
+        return [dict(result) for result in results[page * per_page:end]]
+
+    def attach_context(self, results: List[Dict[str, Any]], turns: int) -> List[Dict[str, Any]]:
+        """Add the ``turns`` turns around each result (whole conversation if < 0) as 'context'"""
+        from turn_index import attach_context
+
+        return attach_context(results, self._view().turn_index, turns)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'generation': self.generation,
+                'vector_cache': self.vectors.stats(),
+                'result_cache': self.results.stats()}
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Search Filters
+Time range, speaker and file filters that are pushed down into each index
+"""
+
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+# Parsed from exports: 2024-05-01, 2024-05-01 10:32, 2024-05-01T10:32:00.123Z, ...
+TIMESTAMP_PATTERN = re.compile(
+    r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?"
+)
+
+# A bare date, which as an upper bound means the whole day
+_DATE_ONLY = re.compile(r"\d{4}-\d{2}-\d{2}(?:Z|[+-]\d{2}:?\d{2})?")
+
+_RELATIVE = re.compile(r"^(\d+)\s*([hdwmy])$")
+_UNIT_SECONDS = {'h': 3600, 'd': 86400, 'w': 7 * 86400, 'm': 30 * 86400, 'y': 365 * 86400}
+
+# Values of the time filter select in the web UI
+TIME_FILTER_SECONDS = {'week': 7 * 86400, 'month': 30 * 86400}
+
+
+def parse_timestamp(text: str) -> Optional[float]:
+    """Epoch seconds for the first ISO-style timestamp in text, if any"""
+    match = TIMESTAMP_PATTERN.search(text)
+    if not match:
+        return None
+    value = match.group().replace('Z', '+00:00')
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def parse_time_bound(text: str, now: Optional[float] = None, upper: bool = False) -> float:
+    """CLI time bound: an ISO date/time, or a relative age such as 7d, 2w, 1m
+
+    An ``upper`` bound given as a date without a time covers that whole day.
+    """
+    match = _RELATIVE.match(text.strip().lower())
+    if match:
+        now = time.time() if now is None else now
+        return now - int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+    value = parse_timestamp(text)
+    if value is None:
+        raise ValueError(f"not a date or relative age: {text!r}")
+    date = TIMESTAMP_PATTERN.search(text).group()
+    if upper and _DATE_ONLY.fullmatch(date):
+        # Last microsecond of the day; the wall clock is kept across DST changes
+        day = datetime.fromisoformat(date.replace('Z', '+00:00'))
+        return (day + timedelta(days=1)).timestamp() - 1e-6
+    return value
+
+
+def parse_until(text: str) -> float:
+    """parse_time_bound for an inclusive upper bound (--until)"""
+    return parse_time_bound(text, upper=True)
+
+
+class SearchFilters:
+    """Restrictions applied inside the vector and keyword queries, not after them"""
+
+    def __init__(self, since: Optional[float] = None, until: Optional[float] = None,
+                 speaker: Optional[str] = None, filename: Optional[str] = None):
+        self.since = since
+        self.until = until
+        self.speaker = speaker
+        self.filename = filename
+
+    @classmethod
+    def from_time_filter(cls, time_filter: str, **kwargs) -> "SearchFilters":
+        """Filters for the UI's 'all' / 'week' / 'month' select"""
+        seconds = TIME_FILTER_SECONDS.get(time_filter)
+        # Whole minutes, so reruns within a minute build equal filters (and cache keys)
+        since = (time.time() - seconds) // 60 * 60 if seconds else None
+        return cls(since=since, **kwargs)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "SearchFilters":
+        data = data or {}
+        return cls(data.get('since'), data.get('until'), data.get('speaker'), data.get('filename'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'since': self.since,
+            'until': self.until,
+            'speaker': self.speaker,
+            'filename': self.filename
+        }
+
+    def __bool__(self) -> bool:
+        return any(value is not None for value in self.to_dict().values())
+
+    def to_chroma_where(self) -> Optional[Dict[str, Any]]:
+        """Chroma metadata filter, evaluated by the vector query itself"""
+        clauses = []
+        if self.since is not None:
+            clauses.append({'timestamp': {'$gte': self.since}})
+        if self.until is not None:
+            clauses.append({'timestamp': {'$lte': self.until}})
+        if self.speaker is not None:
+            clauses.append({'speaker': self.speaker})
+        if self.filename is not None:
+            clauses.append({'filename': self.filename})
+
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {'$and': clauses}
+
+    def matches(self, timestamp: float, speaker: str, filename: str) -> bool:
+        """Check one chunk's metadata"""
+        if self.since is not None and timestamp < self.since:
+            return False
+        if self.until is not None and timestamp > self.until:
+            return False
+        if self.speaker is not None and speaker != self.speaker:
+            return False
+        if self.filename is not None and filename != self.filename:
+            return False
+        return True
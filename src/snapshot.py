@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Index Snapshot
+One self-contained, memory-mappable file holding vectors, IDs, metadata and chunk text
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import EMBEDDING_MODEL, FLAT_DTYPE, SNAPSHOT_PATH
+from chunk_metadata import MetadataColumns
+from flat_store import ID_DTYPE, FlatVectorStore, Hit
+
+SNAPSHOT_VERSION = 2
+MAGIC = b'CRMSNAP\0'
+
+# Fixed header: magic, then version, table offset and table length as
+# uint64, then the SHA-256 of everything after the header
+HEADER_SIZE = 64
+
+# Every block starts on this boundary, so NumPy can view it in place
+ALIGNMENT = 64
+
+HASH_BLOCK = 16 * 2 ** 20
+
+
+class _HashingWriter:
+    """File wrapper that hashes and counts what goes through it"""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha = hashlib.sha256()
+        self.position = f.tell()
+
+    def write(self, data) -> int:
+        self.f.write(data)
+        self.sha.update(data)
+        self.position += len(data)
+        return len(data)
+
+    def align(self):
+        padding = -self.position % ALIGNMENT
+        if padding:
+            self.write(b'\0' * padding)
+
+
+def export_snapshot(store, path: Path = SNAPSHOT_PATH, model: str = EMBEDDING_MODEL,
+                    dtype: str = FLAT_DTYPE) -> Dict[str, Any]:
+    """Write every live chunk of a vector store (any backend) to one snapshot file
+
+    Layout, each block aligned to 64 bytes:
+      header    magic, version, table offset/length, SHA-256 of the rest
+      vectors   (count, dim) rows, L2-normalised
+      ids       count fixed-width chunk IDs
+      metadata  MetadataColumns columns
+      offsets   count + 1 uint64 offsets into the text block
+      text      chunk text, UTF-8, back to back
+      table     JSON: model, dimension, dtype, count, block offsets, string tables
+
+    The file is written beside the target and renamed over it, so servers
+    mapping the old snapshot keep reading a complete one. Returns the table.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dtype = np.dtype(dtype)
+    tmp_path = path.with_name(path.name + '.tmp')
+
+    meta = MetadataColumns()
+    ids: List[str] = []
+    text_offsets = array('Q', [0])
+    dim = 0
+    blocks: Dict[str, List[int]] = {}
+
+    # Text goes to a spool file until the fixed-width blocks are written
+    with open(tmp_path, 'wb') as f, tempfile.TemporaryFile() as texts:
+        f.write(b'\0' * HEADER_SIZE)
+        out = _HashingWriter(f)
+        for batch_ids, vectors, batch_texts, metadatas in store.iter_rows():
+            matrix = np.asarray(vectors, dtype=np.float32)
+            if not len(matrix):
+                continue
+            dim = dim or matrix.shape[1]
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            out.write((matrix / np.where(norms == 0, 1.0, norms)).astype(dtype).tobytes())
+            ids.extend(batch_ids)
+            for text, metadata in zip(batch_texts, metadatas):
+                data = text.encode('utf-8')
+                texts.write(data)
+                text_offsets.append(text_offsets[-1] + len(data))
+                meta.append(metadata)
+        blocks['vectors'] = [HEADER_SIZE, out.position - HEADER_SIZE]
+
+        def block(name: str, write):
+            out.align()
+            start = out.position
+            write()
+            blocks[name] = [start, out.position - start]
+
+        block('ids', lambda: out.write(np.array(ids, dtype=ID_DTYPE).tobytes()))
+        block('metadata', lambda: meta.write_columns(out))
+        block('offsets', lambda: out.write(text_offsets.tobytes()))
+        texts.seek(0)
+        block('text', lambda: shutil.copyfileobj(texts, out, HASH_BLOCK))
+
+        table = {
+            'version': SNAPSHOT_VERSION,
+            'model': model,
+            'dim': dim,
+            'dtype': dtype.name,
+            'count': len(ids),
+            'created': time.time(),
+            'blocks': blocks,
+            'tables': meta.tables()
+        }
+        out.align()
+        table_start = out.position
+        table_bytes = json.dumps(table, ensure_ascii=False).encode('utf-8')
+        out.write(table_bytes)
+
+        f.seek(0)
+        f.write(MAGIC)
+        f.write(array('Q', [SNAPSHOT_VERSION, table_start, len(table_bytes)]).tobytes())
+        f.write(out.sha.digest())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return table
+
+
+class SnapshotStore(FlatVectorStore):
+    """Read-only flat store over a mapped snapshot file
+
+    Opening reads the header and the JSON table; vectors, IDs, metadata and
+    text are NumPy or memoryview slices of the map, so a cold start costs
+    page faults for the rows a query touches rather than deserialising the
+    index. Search is FlatVectorStore's exact scan.
+    """
+
+    def __init__(self, path: Path = SNAPSHOT_PATH):
+        super().__init__(path, quantization="none")
+        self.model = ""
+        self.checksum = b""
+        self.table: Dict[str, Any] = {}
+        self._mapped: Optional[mmap.mmap] = None
+        self._text_start = 0
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    @classmethod
+    def open(cls, path: Path = SNAPSHOT_PATH, model: Optional[str] = EMBEDDING_MODEL,
+             verify: bool = False) -> "SnapshotStore":
+        """Map a snapshot, checking it was embedded with ``model`` (None skips the check)
+
+        ``verify`` also checks the SHA-256, which reads the whole file.
+        """
+        store = cls(path)
+        with open(store.path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            store._map(mapped, model)
+        except Exception:
+            mapped.close()
+            raise
+        if verify:
+            store.verify()
+        return store
+
+    def _map(self, mapped: mmap.mmap, model: Optional[str]):
+        if len(mapped) < HEADER_SIZE or mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not an index snapshot")
+        version, table_start, table_length = array('Q', mapped[len(MAGIC):len(MAGIC) + 24])
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        if table_start + table_length > len(mapped):
+            raise ValueError(f"{self.path} is truncated")
+        self.checksum = mapped[len(MAGIC) + 24:HEADER_SIZE]
+        self.table = json.loads(mapped[table_start:table_start + table_length])
+        self.model = self.table['model']
+        if model is not None and self.model != model:
+            raise ValueError(f"Snapshot was embedded with {self.model}, but queries use {model}; "
+                             f"re-export it or change EMBEDDING_MODEL")
+
+        self.dim = self.table['dim']
+        self.count = self.table['count']
+        self.dtype = np.dtype(self.table['dtype'])
+        blocks = self.table['blocks']
+        expected = {'vectors': self.count * self.dim * self.dtype.itemsize,
+                    'ids': self.count * np.dtype(ID_DTYPE).itemsize,
+                    'offsets': (self.count + 1) * 8}
+        for name, size in expected.items():
+            if blocks[name][1] != size:
+                raise ValueError(f"Snapshot {name} block is {blocks[name][1]} bytes, expected {size}")
+
+        def view(name: str, dtype, count: int) -> np.ndarray:
+            return np.frombuffer(mapped, dtype=dtype, count=count, offset=blocks[name][0])
+
+        self.vectors = view('vectors', self.dtype, self.count * self.dim).reshape(self.count, self.dim)
+        self.ids = view('ids', ID_DTYPE, self.count)
+        self.offsets = view('offsets', np.uint64, self.count + 1)
+        self.alive = np.ones(self.count, dtype=bool)
+        self.scales = np.ones(self.count, dtype=np.float32)
+        buffer = memoryview(mapped)
+        self.meta, _ = MetadataColumns.map_columns(buffer, blocks['metadata'][0],
+                                                    self.count, self.table['tables'])
+        self.meta._views.insert(0, buffer)
+        self._text_start = blocks['text'][0]
+        self._mapped = mapped
+
+    def verify(self):
+        """Raise ValueError unless the file matches its recorded SHA-256"""
+        sha = hashlib.sha256()
+        with memoryview(self._mapped) as view:
+            for start in range(HEADER_SIZE, len(view), HASH_BLOCK):
+                sha.update(view[start:start + HASH_BLOCK])
+        if sha.digest() != self.checksum:
+            raise ValueError(f"Snapshot checksum mismatch: {self.path} is damaged")
+
+    def add(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+            texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        raise ValueError("Snapshots are read-only; export a new one with index_conversations.py")
+
+    def delete(self, ids: Sequence[str]):
+        raise ValueError("Snapshots are read-only; export a new one with index_conversations.py")
+
+    def save(self):
+        """Nothing to write"""
+
+    def close(self):
+        self.meta.release()
+        self.meta = MetadataColumns()
+        self.vectors = None
+        self.ids = self.offsets = self.alive = self.scales = np.zeros(0)
+        if self._mapped is not None:
+            try:
+                self._mapped.close()
+            except BufferError:
+                # A caller still holds a slice; the map closes when it is collected
+                pass
+            self._mapped = None
+
+    def fetch(self, rows: Sequence[int], scores: Sequence[float]) -> List[Hit]:
+        text = self._text_start
+        hits = []
+        for row, score in zip(rows, scores):
+            row = int(row)
+            start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+            hits.append((self.ids[row].decode('ascii'),
+                         self._mapped[text + start:text + end].decode('utf-8'),
+                         self.meta.row(row), float(score)))
+        return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and verify an index snapshot")
+    parser.add_argument("path", nargs="?", default=str(SNAPSHOT_PATH),
+                        help=f"Snapshot file (default: {SNAPSHOT_PATH})")
+    args = parser.parse_args()
+
+    try:
+        store = SnapshotStore.open(Path(args.path), model=None)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    try:
+        table = store.table
+        print(f"📦 {args.path}: {table['count']} chunks, {table['dim']}-d {table['dtype']} "
+              f"vectors from {table['model']}")
+        print(f"🕒 Exported {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(table['created']))}")
+        if store.model != EMBEDDING_MODEL:
+            print(f"⚠️ This install embeds queries with {EMBEDDING_MODEL}; searches will refuse it")
+        print("🔐 Verifying checksum...")
+        store.verify()
+        print("✅ Checksum OK")
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Synthetic Vault Generator
+Write fake Human:/Claude: conversations for benchmarks, at any size
+"""
+
+import random
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+# Size presets accepted wherever a chunk count is expected
+SIZE_PRESETS = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+TURNS_PER_FILE = (6, 40)
+
+# Each topic has its own vocabulary, so queries have real nearest neighbours
+TOPICS: Dict[str, List[str]] = {
+    'python': ['python', 'pandas', 'dataframe', 'groupby', 'virtualenv', 'pip', 'asyncio',
+               'decorator', 'generator', 'ModuleNotFoundError', 'TypeError', 'pytest', 'typing'],
+    'web': ['requests', 'BeautifulSoup', 'selenium', 'scraping', 'html', 'css', 'javascript',
+            'fetch', 'cors', 'cookies', 'headers', 'robots.txt', 'rate limiting'],
+    'docker': ['docker', 'container', 'image', 'compose', 'volume', 'network', 'port',
+               'Dockerfile', 'kubernetes', 'pod', 'deployment', 'registry', 'healthcheck'],
+    'career': ['resume', 'interview', 'salary', 'negotiation', 'portfolio', 'linkedin',
+               'recruiter', 'promotion', 'mentor', 'feedback', 'offer', 'manager', 'skills'],
+    'data': ['sql', 'postgres', 'index', 'query', 'join', 'migration', 'schema', 'transaction',
+             'sqlite', 'vacuum', 'explain', 'partition', 'replication'],
+    'ml': ['embedding', 'vector', 'transformer', 'tokenizer', 'fine-tuning', 'gradient',
+           'overfitting', 'dataset', 'inference', 'quantization', 'recall', 'precision', 'epoch'],
+}
+
+FILLER = ['the', 'a', 'to', 'and', 'with', 'for', 'when', 'this', 'that', 'my', 'your',
+          'how', 'why', 'should', 'can', 'use', 'try', 'keep', 'check', 'make', 'about']
+
+QUESTION_OPENERS = ['How do I', 'Why does', 'What is the best way to', 'Can you explain',
+                    'I keep getting an error when I', 'Should I']
+
+
+def resolve_size(size: str) -> int:
+    """Chunk count from a preset name (1k, 100k, 1m) or a plain number"""
+    key = str(size).lower().replace('_', '')
+    if key in SIZE_PRESETS:
+        return SIZE_PRESETS[key]
+    return int(key)
+
+
+def _sentence(rng: random.Random, topic: str, words: int) -> str:
+    vocab = TOPICS[topic]
+    tokens = [rng.choice(vocab) if rng.random() < 0.35 else rng.choice(FILLER) for _ in range(words)]
+    tokens[0] = tokens[0].capitalize()
+    return ' '.join(tokens) + '.'
+
+
+def _turn(rng: random.Random, topic: str, speaker: str) -> str:
+    """One turn of roughly chunk size; some are long enough to be split"""
+    if speaker == 'Human':
+        opener = rng.choice(QUESTION_OPENERS)
+        return f"Human: {opener} {' '.join(rng.sample(TOPICS[topic], 3))}? " + _sentence(rng, topic, rng.randint(8, 30))
+
+    sentences = [_sentence(rng, topic, rng.randint(8, 20)) for _ in range(rng.randint(2, 6))]
+    text = "Claude: " + ' '.join(sentences)
+    if rng.random() < 0.15:
+        # Code blocks and lists, like real answers
+        text += f"\n\n```python\nimport {rng.choice(['os', 'json', 're', 'time'])}\nresult = run('{rng.choice(TOPICS[topic])}')\n```"
+    return text
+
+
+def iter_conversation(rng: random.Random, index: int, turns: int) -> List[str]:
+    """Markdown sections of one conversation file, in vault/sample-*.md format"""
+    topic = rng.choice(list(TOPICS))
+    started = datetime(2023, 1, 1) + timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+    sections = [
+        f"# Conversation {index} - {topic.title()} help",
+        f"Date: {started:%Y-%m-%d %H:%M}",
+    ]
+    for turn in range(turns):
+        # Conversations drift between topics now and then
+        if rng.random() < 0.1:
+            topic = rng.choice(list(TOPICS))
+        sections.append(_turn(rng, topic, 'Human' if turn % 2 == 0 else 'Claude'))
+    return sections
+
+
+def generate_vault(path: Path, chunks: int, seed: int = 0) -> Dict[str, int]:
+    """Write conversation files until about `chunks` turns exist
+
+    Most turns fit in one 500-character chunk, so the indexed chunk count
+    lands close to the target; the benchmark reports the exact number.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+
+    files = turns = size = 0
+    while turns < chunks:
+        count = min(rng.randint(*TURNS_PER_FILE), chunks - turns)
+        text = '\n\n'.join(iter_conversation(rng, files, count)) + '\n'
+        (path / f"synthetic-{files:07d}.md").write_text(text, encoding='utf-8')
+        files += 1
+        turns += count
+        size += len(text.encode('utf-8'))
+
+    return {'files': files, 'turns': turns, 'bytes': size}
+
+
+def sample_queries(count: int, seed: int = 1) -> List[str]:
+    """Search queries drawn from the same topic vocabularies as the vault"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        topic = rng.choice(list(TOPICS))
+        queries.append(' '.join(rng.sample(TOPICS[topic], rng.randint(2, 4))))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Claude conversation vault")
+    parser.add_argument("path", help="Directory to write the .md files into")
+    parser.add_argument("--chunks", default="1k", help="Target size: 1k, 10k, 100k, 1m or a number (default: 1k)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    stats = generate_vault(Path(args.path), resolve_size(args.chunks), args.seed)
+    print(f"✅ Wrote {stats['files']} files, {stats['turns']} turns "
+          f"({stats['bytes'] / 2 ** 20:.1f} MB) to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Turn Index
+Byte offsets of every turn and chunk in the vault, for context expansion without re-parsing
+"""
+
+import json
+import mmap
+import os
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import TURN_INDEX_PATH
+
+TURN_INDEX_VERSION = 1
+
+SPEAKERS = ('unknown', 'human', 'claude')
+
+# Rewrite without the rows of re-indexed files once they make up this share
+COMPACT_DEAD_FRACTION = 0.25
+
+# (name, typecode, per) - per-turn columns, then per-chunk ones; 8-byte
+# columns come first so every column in the mapped file stays aligned
+_COLUMNS = (
+    ('turn_start', 'Q', 'turn'),
+    ('turn_end', 'Q', 'turn'),
+    ('turn_time', 'd', 'turn'),
+    ('turn_chunk', 'Q', 'turn'),
+    ('chunk_start', 'Q', 'chunk'),
+    ('chunk_end', 'Q', 'chunk'),
+    ('turn_speaker', 'B', 'turn'),
+)
+
+# One chunk as the loader produced it: (turn, char_start, char_end, speaker, timestamp)
+ChunkSpan = Tuple[int, int, int, str, float]
+
+
+def byte_offsets(raw: bytes, offsets: Sequence[int]) -> Dict[int, int]:
+    """Map character offsets into the loader's text of a file to byte offsets in the file
+
+    The loader reads in text mode, so its offsets count decoded characters
+    with line endings folded to a single newline. Plain-ASCII files with
+    Unix endings map one to one, which is checked in C and costs nothing.
+    """
+    if raw.isascii() and b'\r' not in raw:
+        return {offset: offset for offset in offsets}
+
+    wanted = sorted(set(offsets))
+    mapped: Dict[int, int] = {}
+    i = 0
+    chars = position = 0
+    for raw_line in raw.splitlines(keepends=True):
+        line = raw_line.decode('utf-8', errors='replace')
+        stripped = line.rstrip('\r\n')
+        if len(stripped) < len(line):
+            line = stripped + '\n'
+        while i < len(wanted) and wanted[i] < chars + len(line):
+            mapped[wanted[i]] = position + len(line[:wanted[i] - chars].encode('utf-8'))
+            i += 1
+        chars += len(line)
+        position += len(raw_line)
+    for offset in wanted[i:]:
+        mapped[offset] = len(raw)
+    return mapped
+
+
+class TurnIndex:
+    """Positional index of (file, turn, chunk) -> byte range in the vault file
+
+    Everything lives in one file, replaced atomically on save: fixed-width
+    columns for turns and chunks, then a JSON table mapping each source to
+    its fingerprint and row ranges. Readers map the file and look rows up in
+    place, so a lookup is O(1) and a context window is one ranged read of the
+    conversation. A file whose size or mtime no longer matches what was
+    indexed is reported as stale rather than read at the wrong offsets.
+    """
+
+    def __init__(self, path: Path = TURN_INDEX_PATH):
+        self.path = Path(path)
+        self.files: Dict[str, List[int]] = {}
+        self.dead_turns = 0
+        for name, typecode, _ in _COLUMNS:
+            setattr(self, name, array(typecode))
+        self._mapped: Optional[mmap.mmap] = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @classmethod
+    def load(cls, path: Path = TURN_INDEX_PATH, writable: bool = False) -> "TurnIndex":
+        """Open the index; readers map it, writers copy the columns into memory"""
+        index = cls(path)
+        try:
+            with open(index.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return index
+
+        turns, chunks, table_start = array('Q', mapped[:24])
+        table = json.loads(mapped[table_start:])
+        if table.get('version') != TURN_INDEX_VERSION:
+            # Unknown layout: treat as missing, the indexer rebuilds it
+            mapped.close()
+            return index
+        index.files = table['files']
+        index.dead_turns = table['dead_turns']
+
+        position = 24
+        for name, typecode, per in _COLUMNS:
+            column = getattr(index, name)
+            size = (turns if per == 'turn' else chunks) * column.itemsize
+            if writable:
+                column.frombytes(mapped[position:position + size])
+            else:
+                with memoryview(mapped) as view:
+                    setattr(index, name, view[position:position + size].cast(typecode))
+            position += size
+        if writable:
+            mapped.close()
+        else:
+            index._mapped = mapped
+        return index
+
+    def save(self):
+        if self.dead_turns > COMPACT_DEAD_FRACTION * len(self.turn_start):
+            self.compact()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            columns = [getattr(self, name) for name, _, _ in _COLUMNS]
+            table_start = 24 + sum(len(column) * column.itemsize for column in columns)
+            array('Q', [len(self.turn_start), len(self.chunk_start), table_start]).tofile(f)
+            for column in columns:
+                column.tofile(f)
+            f.write(json.dumps({
+                'version': TURN_INDEX_VERSION, 'dead_turns': self.dead_turns, 'files': self.files
+            }, separators=(',', ':')).encode('utf-8'))
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        if self._mapped is not None:
+            for name, typecode, _ in _COLUMNS:
+                getattr(self, name).release()
+                setattr(self, name, array(typecode))
+            self._mapped.close()
+            self._mapped = None
+
+    # Writing
+
+    def record(self, file_path: Path, fingerprint: Dict[str, Any], chunks: Sequence[ChunkSpan]):
+        """Store the turns and chunks of one file, replacing what it had before
+
+        ``chunks`` carry the loader's character offsets; they are converted
+        to byte offsets against the file as it is on disk now.
+        """
+        self.forget(str(file_path))
+        raw = Path(file_path).read_bytes()
+        to_bytes = byte_offsets(raw, [offset for chunk in chunks for offset in chunk[1:3]])
+
+        first_turn, first_chunk = len(self.turn_start), len(self.chunk_start)
+        turn = -1
+        for number, char_start, char_end, speaker, timestamp in chunks:
+            start, end = to_bytes[char_start], to_bytes[char_end]
+            if number != turn:
+                turn = number
+                self.turn_start.append(start)
+                self.turn_end.append(end)
+                self.turn_time.append(timestamp or 0.0)
+                self.turn_chunk.append(len(self.chunk_start))
+                self.turn_speaker.append(SPEAKERS.index(speaker) if speaker in SPEAKERS else 0)
+            self.turn_end[-1] = max(self.turn_end[-1], end)
+            self.chunk_start.append(start)
+            self.chunk_end.append(end)
+
+        self.files[str(file_path)] = [
+            fingerprint['size'], fingerprint['mtime_ns'],
+            first_turn, len(self.turn_start) - first_turn,
+            first_chunk, len(self.chunk_start) - first_chunk
+        ]
+
+    def sync(self, fingerprints: Dict[str, Dict[str, Any]]) -> bool:
+        """Adopt the size and mtime of files touched without being edited
+
+        Returns True if any entry changed and the index needs saving.
+        """
+        changed = False
+        for source, fingerprint in fingerprints.items():
+            entry = self.files.get(source)
+            if entry is not None and entry[:2] != [fingerprint['size'], fingerprint['mtime_ns']]:
+                entry[:2] = [fingerprint['size'], fingerprint['mtime_ns']]
+                changed = True
+        return changed
+
+    def forget(self, source: str):
+        entry = self.files.pop(source, None)
+        if entry is not None:
+            self.dead_turns += entry[3]
+
+    def compact(self):
+        """Drop the rows of forgotten and re-recorded files"""
+        columns = {name: array(typecode) for name, typecode, _ in _COLUMNS}
+        for entry in self.files.values():
+            _, _, first_turn, turns, first_chunk, chunks = entry
+            shift = len(columns['chunk_start']) - first_chunk
+            for name, _, per in _COLUMNS:
+                start, count = (first_turn, turns) if per == 'turn' else (first_chunk, chunks)
+                columns[name].extend(getattr(self, name)[start:start + count])
+            moved = columns['turn_chunk']
+            for row in range(len(moved) - turns, len(moved)):
+                moved[row] += shift
+            entry[2] = len(columns['turn_start']) - turns
+            entry[4] = len(columns['chunk_start']) - chunks
+        for name, column in columns.items():
+            setattr(self, name, column)
+        self.dead_turns = 0
+
+    # Lookups
+
+    def turn_count(self, source: str) -> int:
+        entry = self.files.get(source)
+        return entry[3] if entry else 0
+
+    def span(self, source: str, turn: int, chunk: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """Byte range of one turn, or of one chunk of it, in the vault file"""
+        entry = self.files.get(source)
+        if entry is None or not 0 <= turn < entry[3]:
+            return None
+        row = entry[2] + turn
+        if chunk is None:
+            return self.turn_start[row], self.turn_end[row]
+        first = self.turn_chunk[row]
+        last = self.turn_chunk[row + 1] if turn + 1 < entry[3] else entry[4] + entry[5]
+        if not 0 <= chunk < last - first:
+            return None
+        return self.chunk_start[first + chunk], self.chunk_end[first + chunk]
+
+    def read_turns(self, source: str, first: int, last: int) -> Optional[List[Dict[str, Any]]]:
+        """Turns first..last (inclusive) of a file, read with one seek
+
+        Returns None if the file is unknown, gone or has changed since it was
+        indexed; the caller then falls back to what the result itself holds.
+        """
+        entry = self.files.get(source)
+        if entry is None:
+            return None
+        first, last = max(0, first), min(entry[3] - 1, last)
+        if first > last:
+            return []
+        try:
+            stat = os.stat(source)
+            if (stat.st_size, stat.st_mtime_ns) != (entry[0], entry[1]):
+                return None
+            rows = range(entry[2] + first, entry[2] + last + 1)
+            start = self.turn_start[rows[0]]
+            with open(source, 'rb') as f:
+                f.seek(start)
+                data = f.read(self.turn_end[rows[-1]] - start)
+        except OSError:
+            return None
+
+        return [{
+            'turn': row - entry[2],
+            'speaker': SPEAKERS[self.turn_speaker[row]],
+            'timestamp': self.turn_time[row],
+            'content': data[self.turn_start[row] - start:self.turn_end[row] - start]
+                .decode('utf-8', errors='replace').replace('\r\n', '\n')
+        } for row in rows]
+
+    def context(self, source: str, turn: int, turns: int = 2) -> Optional[List[Dict[str, Any]]]:
+        """The turn and up to ``turns`` turns either side of it"""
+        return self.read_turns(source, turn - turns, turn + turns)
+
+    def conversation(self, source: str) -> Optional[List[Dict[str, Any]]]:
+        """Every turn of one file"""
+        return self.read_turns(source, 0, self.turn_count(source) - 1)
+
+
+def attach_context(results: List[Dict[str, Any]], index: Optional[TurnIndex],
+                   turns: int) -> List[Dict[str, Any]]:
+    """Add the surrounding turns of each result's conversation as 'context'
+
+    ``turns`` < 0 attaches the whole conversation.
+    """
+    if index is None:
+        return results
+    for result in results:
+        turn = result.get('conversation_turn')
+        if not isinstance(turn, int):
+            continue
+        if turns < 0:
+            context = index.conversation(result['source'])
+        else:
+            context = index.context(result['source'], turn, turns)
+        if context is not None:
+            result['context'] = context
+    return results
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Vault Watcher
+Poll the vault for new or edited exports and index them in the background
+"""
+
+import os
+import time
+import fnmatch
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Set, Tuple
+
+from config import VAULT_PATH, VAULT_PATTERNS
+
+# Seconds between vault scans, and how long a file must stay unchanged
+# before it is indexed (exports are often written in several steps)
+POLL_INTERVAL = 1.0
+DEBOUNCE_SECONDS = 2.0
+
+
+class VaultWatcher:
+    """Detect vault changes by polling directory entries
+
+    One scandir per interval costs a stat per file, with no dependencies
+    and the same behaviour on every platform. Changes are held back until
+    the vault has been quiet for the debounce period, so a file still being
+    written is indexed once, complete.
+    """
+
+    def __init__(self, vault_path: Path = VAULT_PATH, interval: float = POLL_INTERVAL,
+                 debounce: float = DEBOUNCE_SECONDS):
+        self.vault_path = Path(vault_path)
+        self.interval = interval
+        self.debounce = debounce
+        self.snapshot = self.scan()
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        """(size, mtime_ns) of every export in the vault"""
+        entries = {}
+        try:
+            with os.scandir(self.vault_path) as it:
+                for entry in it:
+                    if any(fnmatch.fnmatch(entry.name, pattern) for pattern in VAULT_PATTERNS) \
+                            and entry.is_file():
+                        stat = entry.stat()
+                        entries[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def changes(self, stop: threading.Event) -> Iterator[List[str]]:
+        """Yield batches of added, edited or removed paths until stop is set"""
+        pending: Set[str] = set()
+        last_change = 0.0
+        while not stop.wait(self.interval):
+            current = self.scan()
+            changed = {path for path in current.keys() | self.snapshot.keys()
+                       if current.get(path) != self.snapshot.get(path)}
+            self.snapshot = current
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+            elif pending and time.monotonic() - last_change >= self.debounce:
+                yield sorted(pending)
+                pending = set()
+
+
+class BackgroundIndexer:
+    """Single worker thread that runs an index pass for each queued batch
+
+    Batches queued while a pass is running are merged into the next pass,
+    which picks up everything changed since the manifest was last written.
+    """
+
+    def __init__(self, run_pass: Callable[[List[str]], None]):
+        self.run_pass = run_pass
+        self.queue: "queue.Queue" = queue.Queue()
+        self.thread = threading.Thread(target=self._work, name="indexer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def submit(self, paths: List[str]):
+        self.queue.put(paths)
+
+    def stop(self):
+        """Let the running pass finish, then exit"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _work(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            paths = set(batch)
+            # Coalesce everything that queued up while the last pass ran
+            while not self.queue.empty():
+                more = self.queue.get()
+                if more is None:
+                    self.queue.put(None)
+                    break
+                paths.update(more)
+            try:
+                self.run_pass(sorted(paths))
+            except Exception as e:
+                print(f"⚠️ Background index pass failed: {e}")
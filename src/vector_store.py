@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Claude RAG Memory Search - Vector Store Backends
+One small interface over ChromaDB and the flat NumPy store
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import re
+import shutil
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from config import (DB_PATH, FLAT_DB_PATH, FLAT_DTYPE, INDEX_INFO_PATH, INDEX_LOCK_PATH, SHARDS,
+                    SHARDS_PATH, VECTOR_BACKEND)
+from search_filters import SearchFilters
+
+try:
+    import fcntl
+except ImportError:  # Windows - no advisory locks, run single-writer by convention
+    fcntl = None
+
+BACKENDS = ("chroma", "flat")
+
+# Held shared by every reader of a Chroma generation, exclusively while deleting it
+READERS_LOCK = "readers.lock"
+
+
+def read_index_info() -> Dict[str, Any]:
+    """Backend, model and dimension the current index was built with"""
+    if not INDEX_INFO_PATH.exists():
+        return {}
+    return json.loads(INDEX_INFO_PATH.read_text(encoding='utf-8'))
+
+
+def write_index_info(**info: Any):
+    """Publish a finished index; readers swap to it when this file changes"""
+    info['generation'] = read_index_info().get('generation', 0) + 1
+    INDEX_INFO_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = INDEX_INFO_PATH.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(info), encoding='utf-8')
+    os.replace(tmp_path, INDEX_INFO_PATH)
+
+
+def publish_index(store, **info: Any):
+    """Point index_info.json at what a writable store wrote, then drop what it superseded
+
+    Call it once the store is saved: readers may open the new generation straight away.
+    """
+    write_index_info(**dict(info, **store.index_info()))
+    store.remove_stale_generations()
+
+
+@contextmanager
+def index_writer_lock():
+    """Hold the index for writing; waits while another indexer or compaction runs
+
+    Searches never take it: they read whatever generation is published.
+    """
+    INDEX_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(INDEX_LOCK_PATH, 'w') as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                print("⏳ Another indexer or compaction is writing the index; waiting for it...")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def indexed_backend() -> str:
+    """Backend recorded by the last indexer run, or the configured default"""
+    return read_index_info().get('backend', VECTOR_BACKEND)
+
+
+def shard_of(source: str, shards: int) -> int:
+    """Shard holding every chunk of one vault file"""
+    return int(hashlib.sha1(source.encode('utf-8')).hexdigest()[:8], 16) % shards
+
+
+def shard_path(shard: int) -> Path:
+    return SHARDS_PATH / f"{shard:02d}"
+
+
+def chroma_path(base: Path, generation: int) -> Path:
+    """Persist directory of one Chroma generation; generation 0 keeps the original name"""
+    return base.with_name(f"{base.name}.g{generation}") if generation else base
+
+
+def chroma_generations(base: Path) -> Dict[int, Path]:
+    """Every generation directory of a Chroma store, by number"""
+    pattern = re.compile(rf'^{re.escape(base.name)}(?:\.g(\d+))?$')
+    found = {}
+    if base.parent.exists():
+        for path in base.parent.iterdir():
+            match = pattern.match(path.name)
+            if match and path.is_dir():
+                found[int(match.group(1) or 0)] = path
+    return found
+
+
+def copy_chroma(source: Path, target: Path):
+    """Copy a Chroma persist directory that readers may have open
+
+    SQLite goes through its backup API, which copies one consistent state;
+    the HNSW segment files are only written by indexers, which hold the
+    writer lock. The copy is renamed into place once complete.
+    """
+    tmp = target.with_name(target.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.copytree(source, tmp, ignore=shutil.ignore_patterns('chroma.sqlite3*', READERS_LOCK))
+    with closing(sqlite3.connect(source / "chroma.sqlite3")) as src, \
+            closing(sqlite3.connect(tmp / "chroma.sqlite3")) as dst:
+        src.backup(dst)
+    os.replace(tmp, target)
+
+
+def _hold_generation(path: Path) -> Optional[int]:
+    """Share-lock a generation so it is not deleted while open; None if it is gone"""
+    try:
+        fd = os.open(path / READERS_LOCK, os.O_RDWR | os.O_CREAT)
+    except FileNotFoundError:
+        return None
+    if fcntl is not None:
+        # Waits out a deletion in progress, after which the database is gone
+        fcntl.flock(fd, fcntl.LOCK_SH)
+    if not (path / "chroma.sqlite3").exists():
+        os.close(fd)
+        return None
+    return fd
+
+
+def _remove_unread_generation(path: Path) -> bool:
+    """Delete a generation directory unless a reader still holds it"""
+    try:
+        fd = os.open(path / READERS_LOCK, os.O_RDWR | os.O_CREAT)
+    except FileNotFoundError:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+    try:
+        shutil.rmtree(path, ignore_errors=True)
+    finally:
+        os.close(fd)
+    return True
+
+
+class ChromaStore:
+    """ChromaDB persist directory behind the same interface as FlatVectorStore
+
+    Chroma updates its files in place, so every indexing pass writes to a
+    new generation instead: a copy of the published directory
+    (chroma_db.g<N>) that index_info.json points at once the pass is done.
+    Readers hold a shared lock on the generation they opened, and the
+    indexer deletes superseded generations only when nobody holds them.
+    """
+
+    def __init__(self, path=DB_PATH, embedder=None, generation: int = 0,
+                 readers: Optional[int] = None):
+        self.base = Path(path)
+        self.generation = generation
+        self.path = chroma_path(self.base, generation)
+        self.embedder = embedder
+        # Descriptor holding the shared readers lock, for read-only stores
+        self._readers = readers
+        self._connect()
+
+    @classmethod
+    def open(cls, path: Path = DB_PATH, embedder=None,
+             writable: bool = False) -> Optional["ChromaStore"]:
+        """The published generation to read, or the next one to write; None if not built
+
+        A writable store starts as a copy of the published generation, or
+        carries on with the copy an interrupted pass left behind, whose
+        writes the manifest may already count.
+        """
+        published = read_index_info().get('chroma_generation', 0)
+        if writable:
+            for generation, debris in chroma_generations(path).items():
+                # Left by a compaction interrupted before it could retire its source
+                if generation > published + 1:
+                    shutil.rmtree(debris, ignore_errors=True)
+            target = chroma_path(path, published + 1)
+            source = chroma_path(path, published)
+            if not target.exists() and (source / "chroma.sqlite3").exists():
+                copy_chroma(source, target)
+            return cls(path, embedder, published + 1)
+
+        generation = None
+        while published != generation:
+            generation = published
+            readers = _hold_generation(chroma_path(path, generation))
+            if readers is not None:
+                return cls(path, embedder, generation, readers)
+            # Superseded and deleted between reading the pointer and locking
+            published = read_index_info().get('chroma_generation', 0)
+        return None
+
+    def _connect(self):
+        from langchain_chroma import Chroma
+
+        self.vectordb = Chroma(
+            persist_directory=str(self.path),
+            embedding_function=self.embedder
+        )
+        # Distance -> relevance mapping LangChain uses for this collection
+        self.relevance = self.vectordb._select_relevance_score_fn()
+
+    def add(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+            texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        """Store pre-computed embeddings, replacing existing IDs"""
+        if not ids:
+            return
+        self.vectordb._collection.upsert(
+            ids=list(ids),
+            embeddings=[list(map(float, vector)) for vector in embeddings],
+            documents=list(texts),
+            metadatas=list(metadatas)
+        )
+
+    def delete(self, ids: Sequence[str]):
+        if ids:
+            self.vectordb.delete(ids=list(ids))
+
+    def search(self, query: Sequence[float], k: int = 5,
+               filters: Optional[SearchFilters] = None,
+               ids: Optional[Sequence[str]] = None) -> List[tuple]:
+        """Approximate top-k (id, text, metadata, relevance) via HNSW
+
+        With ``ids`` only those chunks are ranked and the filters are ignored.
+        """
+        if ids is not None and not len(ids):
+            return []
+        where = filters.to_chroma_where() if filters and ids is None else None
+        results = self.vectordb._collection.query(
+            query_embeddings=[list(map(float, query))],
+            n_results=k,
+            where=where,
+            ids=list(ids) if ids is not None else None,
+            include=['documents', 'metadatas', 'distances']
+        )
+        return [
+            (doc_id, text, metadata, float(self.relevance(distance)))
+            for doc_id, text, metadata, distance in zip(
+                results['ids'][0], results['documents'][0],
+                results['metadatas'][0], results['distances'][0]
+            )
+        ]
+
+    def search_many(self, queries: Sequence[Sequence[float]], k: int = 5,
+                    filters: Optional[SearchFilters] = None, workers: int = 4,
+                    ids: Optional[Sequence[str]] = None) -> List[List[tuple]]:
+        """Top-k for many queries in one Chroma call, which fans out internally"""
+        if not len(queries):
+            return []
+        if ids is not None and not len(ids):
+            return [[] for _ in queries]
+        where = filters.to_chroma_where() if filters and ids is None else None
+        results = self.vectordb._collection.query(
+            query_embeddings=[list(map(float, query)) for query in queries],
+            n_results=k,
+            where=where,
+            ids=list(ids) if ids is not None else None,
+            include=['documents', 'metadatas', 'distances']
+        )
+        return [
+            [
+                (doc_id, text, metadata, float(self.relevance(distance)))
+                for doc_id, text, metadata, distance in zip(ids, texts, metadatas, distances)
+            ]
+            for ids, texts, metadatas, distances in zip(
+                results['ids'], results['documents'], results['metadatas'], results['distances']
+            )
+        ]
+
+    def iter_rows(self, batch_size: int = 4096) -> Iterator[tuple]:
+        """(ids, embeddings, texts, metadatas) of every stored chunk, in batches"""
+        collection = self.vectordb._collection
+        for offset in range(0, collection.count(), batch_size):
+            rows = collection.get(include=['embeddings', 'documents', 'metadatas'],
+                                  limit=batch_size, offset=offset)
+            yield rows['ids'], rows['embeddings'], rows['documents'], rows['metadatas']
+
+    def live_ids(self) -> List[str]:
+        return self.vectordb._collection.get(include=[])['ids']
+
+    def compact(self) -> Dict[str, int]:
+        """Rebuild the live rows as the next generation, which replaces this one
+
+        Chroma does not shrink its SQLite file or HNSW graph after deletes;
+        a copy of the live rows builds both anew. Neither generation has been
+        published, so no reader has them open, and the copy is renamed into
+        place only when complete: an interrupted compaction leaves this
+        generation as it was.
+        """
+        if self._readers is not None:
+            raise ValueError("Open the store writable to compact it")
+        generation = self.generation + 1
+        target = chroma_path(self.base, generation)
+        fresh = target.with_name(target.name + '.tmp')
+        shutil.rmtree(fresh, ignore_errors=True)
+
+        before = self.vectordb._collection.count()
+        copy = ChromaStore(fresh, self.embedder)
+        for ids, embeddings, texts, metadatas in self.iter_rows():
+            copy.add(ids, embeddings, texts, metadatas)
+        after = copy.vectordb._collection.count()
+        copy.close()
+        # Filling the copy leaves freed pages behind in its SQLite file
+        with closing(sqlite3.connect(fresh / "chroma.sqlite3")) as db:
+            db.execute("VACUUM")
+
+        os.replace(fresh, target)
+        self.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.generation, self.path = generation, target
+        self._connect()
+        return {'rows_before': before, 'rows_after': after}
+
+    def index_info(self) -> Dict[str, Any]:
+        """What index_info.json must record to open this generation"""
+        return {'chroma_generation': self.generation}
+
+    def remove_stale_generations(self):
+        """Delete the generations before this one that no reader has open
+
+        Run once this generation is published; one still open is left for a
+        later pass. Without advisory locks (Windows), the previous generation
+        is always kept.
+        """
+        newest_stale = self.generation - (1 if fcntl is not None else 2)
+        for generation, path in sorted(chroma_generations(self.base).items()):
+            if generation <= newest_stale:
+                if fcntl is None:
+                    shutil.rmtree(path, ignore_errors=True)
+                elif not _remove_unread_generation(path):
+                    print(f"💤 {path.name} is still open in a search; removing it later")
+
+    def save(self):
+        """Chroma persists on every write"""
+
+    def close(self):
+        """Stop Chroma's system (once no other store in this process uses it) and let the generation go"""
+        if self.vectordb is not None:
+            self.vectordb._client.close()
+            self.vectordb = None
+        if self._readers is not None:
+            os.close(self._readers)
+            self._readers = None
+
+
+class ShardedStore:
+    """N stores of one backend, each holding whole vault files
+
+    Writes are routed by source file and run on one thread per shard;
+    searches fan out to every shard and the per-shard top-k lists are merged
+    with a heap. A shard that is missing or fails to open is left out of
+    searches with a warning, so the rest stay usable while it is rebuilt.
+    """
+
+    def __init__(self, stores: List[Any], path: Path = SHARDS_PATH):
+        self.stores = stores
+        self.path = path
+        self.pool = ThreadPoolExecutor(max_workers=len(stores), thread_name_prefix="shard")
+
+    @property
+    def live(self) -> List[Any]:
+        return [store for store in self.stores if store is not None]
+
+    @property
+    def quantization(self) -> str:
+        return getattr(self.live[0], 'quantization', 'none') if self.live else 'none'
+
+    def _each(self, call, stores: Optional[List[Any]] = None) -> List[Any]:
+        return list(self.pool.map(call, self.live if stores is None else stores))
+
+    def add(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+            texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        rows: Dict[int, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            rows.setdefault(shard_of(metadata.get('source', ''), len(self.stores)), []).append(row)
+
+        def add_shard(shard: int):
+            picked = rows[shard]
+            self.stores[shard].add([ids[i] for i in picked], [embeddings[i] for i in picked],
+                                   [texts[i] for i in picked], [metadatas[i] for i in picked])
+
+        list(self.pool.map(add_shard, rows))
+
+    def delete(self, ids: Sequence[str]):
+        """IDs carry no source, so every shard drops the ones it holds"""
+        if ids:
+            self._each(lambda store: store.delete(ids))
+
+    def search(self, query: Sequence[float], k: int = 5,
+               filters: Optional[SearchFilters] = None,
+               ids: Optional[Sequence[str]] = None) -> List[tuple]:
+        hits = self._each(lambda store: store.search(query, k, filters, ids))
+        return heapq.nlargest(k, chain.from_iterable(hits), key=lambda hit: hit[3])
+
+    def search_many(self, queries: Sequence[Sequence[float]], k: int = 5,
+                    filters: Optional[SearchFilters] = None, workers: int = 4,
+                    ids: Optional[Sequence[str]] = None) -> List[List[tuple]]:
+        per_shard = self._each(lambda store: store.search_many(queries, k, filters, workers, ids))
+        return [heapq.nlargest(k, chain.from_iterable(hits), key=lambda hit: hit[3])
+                for hits in zip(*per_shard)] if per_shard else [[] for _ in queries]
+
+    def footprint(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for footprint in self._each(lambda store: store.footprint()):
+            for key, value in footprint.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def measure_recall(self, k: int = 5, **kwargs) -> float:
+        """Mean of the per-shard recalls of the quantized scan"""
+        recalls = self._each(lambda store: store.measure_recall(k=k, **kwargs))
+        return sum(recalls) / len(recalls) if recalls else 1.0
+
+    def iter_rows(self, batch_size: int = 4096) -> Iterator[tuple]:
+        """Every shard's rows, one shard after the other"""
+        return chain.from_iterable(store.iter_rows(batch_size) for store in self.live)
+
+    def live_ids(self) -> List[str]:
+        return list(chain.from_iterable(self._each(lambda store: store.live_ids())))
+
+    def compact(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for counts in self._each(lambda store: store.compact()):
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def index_info(self) -> Dict[str, Any]:
+        """Every shard is written as the same generation"""
+        return self.live[0].index_info() if self.live else {}
+
+    def remove_stale_generations(self):
+        for store in self.live:
+            store.remove_stale_generations()
+
+    def save(self):
+        self._each(lambda store: store.save())
+
+    def close(self):
+        self._each(lambda store: store.close())
+        self.pool.shutdown()
+
+
+def _open_backend(backend: str, chroma_base: Path, flat_path: Path, embedder=None,
+                  writable: bool = False, quantization: Optional[str] = None):
+    if backend == "chroma":
+        if writable:
+            chroma_base.parent.mkdir(parents=True, exist_ok=True)
+        return ChromaStore.open(chroma_base, embedder, writable)
+
+    if backend == "flat":
+        from flat_store import FlatVectorStore
+
+        if not writable and not FlatVectorStore(flat_path).exists():
+            return None
+        return FlatVectorStore.open(flat_path, writable=writable, dtype=FLAT_DTYPE,
+                                    quantization=quantization)
+
+    raise ValueError(f"Unknown vector backend: {backend} (choose from {', '.join(BACKENDS)})")
+
+
+def open_vector_store(backend: Optional[str] = None, embedder=None, writable: bool = False,
+                      quantization: Optional[str] = None, shards: Optional[int] = None):
+    """Open the index for the given backend; None if it has not been built yet
+
+    ``quantization`` applies to the flat backend only (see flat_store.py).
+    ``shards`` defaults to what the last indexer run recorded; more than one
+    gives a ShardedStore.
+    """
+    info = read_index_info()
+    backend = backend or info.get('backend', VECTOR_BACKEND)
+    shards = shards or info.get('shards', SHARDS)
+
+    if shards <= 1:
+        return _open_backend(backend, DB_PATH, FLAT_DB_PATH, embedder, writable, quantization)
+
+    stores = []
+    for shard in range(shards):
+        base = shard_path(shard)
+        try:
+            store = _open_backend(backend, base / DB_PATH.name, base / FLAT_DB_PATH.name,
+                                  embedder, writable, quantization)
+        except Exception as e:
+            if writable:
+                raise
+            print(f"⚠️ Shard {shard:02d} failed to open ({e}); searching the others")
+            store = None
+        if store is None and not writable:
+            # Every shard is saved, even one without files, so a missing
+            # directory means lost data just like an incomplete one
+            state = "incomplete" if base.exists() else "missing"
+            print(f"⚠️ Shard {shard:02d} is {state} - rebuild it with "
+                  f"'python src/index_conversations.py --rebuild-shard {shard}'")
+        stores.append(store)
+
+    if not any(store is not None for store in stores):
+        return None
+    return ShardedStore(stores)
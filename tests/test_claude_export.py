@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from claude_export import iter_json_array
+from index_conversations import ClaudeChatLoader, document_id
+
+
+def conversation(uuid, *texts):
+    messages = [{'sender': 'human' if i % 2 == 0 else 'assistant', 'text': text,
+                 'created_at': '2024-05-01T10:00:00Z'} for i, text in enumerate(texts)]
+    return {'uuid': uuid, 'name': uuid, 'chat_messages': messages}
+
+
+def chunk_ids(tmp_path, conversations):
+    export = tmp_path / 'conversations.json'
+    export.write_text(json.dumps(conversations))
+    return {doc.page_content: document_id(doc)
+            for doc in ClaudeChatLoader().iter_file_documents(export)}
+
+
+def test_inserting_a_conversation_keeps_the_other_chunk_ids(tmp_path):
+    first = conversation('a', "How do I tune autovacuum?", "Lower the scale factor.")
+    second = conversation('b', "Why is my ingress 404ing?", "Check the path rewrite annotation.")
+    before = chunk_ids(tmp_path, [first, second])
+
+    added = conversation('c', "What is a bloom filter?", "A probabilistic set.")
+    after = chunk_ids(tmp_path, [added, first, second])
+
+    assert len(before) == 4
+    assert all(after[text] == chunk for text, chunk in before.items())
+
+
+def test_syntax_error_is_raised_without_reading_the_rest():
+    read = []
+
+    def blocks():
+        yield '[{"uuid": "a"},, '
+        for i in range(1000):
+            read.append(i)
+            yield '{"uuid": "%d"}, ' % i
+        yield ']'
+
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(blocks()))
+    assert len(read) < 10
@@ -0,0 +1,46 @@
+"""search.py must start without loading the model or the vector database libraries"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmark import HEAVY_MODULES
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# Generous: a cold 'import search' takes well under a second when nothing heavy loads
+IMPORT_SECONDS_LIMIT = 3.0
+
+
+def run(args, cwd):
+    return subprocess.run([sys.executable, *args], cwd=cwd, capture_output=True, text=True,
+                          check=True, env={'PYTHONPATH': str(SRC), 'PATH': ''})
+
+
+def imported_modules(importtime_log):
+    """Top-level module names and the total cumulative microseconds from -X importtime"""
+    names, total = set(), 0
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        names.add(name.strip().split(".")[0])
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return names, total
+
+
+def test_import_search_loads_no_heavy_modules(tmp_path):
+    script = ("import json, sys\nimport search\n"
+              f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))")
+    assert json.loads(run(["-c", script], tmp_path).stdout) == []
+
+
+def test_help_loads_no_heavy_modules(tmp_path, record_property):
+    result = run(["-X", "importtime", str(SRC / "search.py"), "--help"], tmp_path)
+    assert "usage:" in result.stdout
+
+    names, total = imported_modules(result.stderr)
+    assert names.isdisjoint(HEAVY_MODULES)
+    record_property("import_seconds", total / 1e6)
+    assert total / 1e6 < IMPORT_SECONDS_LIMIT
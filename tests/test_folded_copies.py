@@ -0,0 +1,59 @@
+import pytest
+
+from flat_store import FlatVectorStore
+from keyword_index import KeywordIndex
+from search import run_search
+from search_filters import SearchFilters
+
+
+class FixedEmbedder:
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0]
+
+
+def metadata(source, speaker, turn):
+    return {'source': source, 'filename': source, 'conversation_id': '', 'speaker': speaker,
+            'conversation_turn': turn, 'chunk_id': 0, 'total_chunks': 1, 'timestamp': 1.0e9,
+            'conversation_timestamp': 1.0e9, 'char_start': 0, 'char_end': 40}
+
+
+@pytest.fixture
+def indexes(tmp_path):
+    ids = ['a-0', 'a-1']
+    texts = ["retry the request with exponential backoff", "pin the numpy version"]
+    metadatas = [metadata('a.md', 'claude', 0), metadata('a.md', 'claude', 1)]
+    vectors = [[1.0, 0.1, 0.0], [0.0, 1.0, 0.0]]
+
+    store = FlatVectorStore.open(tmp_path / "flat", writable=True)
+    store.add(ids, vectors, texts, metadatas)
+    keyword_index = KeywordIndex(tmp_path / "keyword")
+    keyword_index.add(ids, texts, metadatas)
+
+    # b.md repeats a.md's first chunk, which was folded into it
+    copy = dict(metadata('b.md', 'human', 3), id='b-3')
+    yield store, keyword_index, {'a-0': [copy]}
+    keyword_index.close()
+    store.close()
+
+
+@pytest.mark.parametrize("mode", ["semantic", "keyword", "hybrid"])
+def test_file_filter_matches_a_folded_copy(indexes, mode):
+    store, keyword_index, duplicates = indexes
+    filters = SearchFilters(filename='b.md')
+
+    results = run_search(store, "exponential backoff", 5, -1.0, mode, keyword_index, filters,
+                         FixedEmbedder(), duplicates=duplicates)
+
+    assert [(r['id'], r['filename'], r['speaker'], r['conversation_turn']) for r in results] == \
+        [('b-3', 'b.md', 'human', 3)]
+    assert results[0]['content'] == "retry the request with exponential backoff"
+
+
+def test_original_that_passes_is_not_repeated_as_its_copy(indexes):
+    store, keyword_index, duplicates = indexes
+    filters = SearchFilters(since=0.0)
+
+    results = run_search(store, "exponential backoff", 5, -1.0, "keyword", keyword_index, filters,
+                         FixedEmbedder(), duplicates=duplicates)
+
+    assert [r['id'] for r in results] == ['a-0']
@@ -0,0 +1,98 @@
+"""A long-lived reader must serve what another process indexes or compacts"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+DIM = 8
+
+# Runs in its own process, like the indexer or --compact
+WRITER = """
+import json, sys
+from vector_store import open_vector_store, publish_index
+
+job = json.loads(sys.argv[1])
+store = open_vector_store(job['backend'], writable=True, shards=1)
+store.delete(job['delete'])
+store.add(job['ids'], job['vectors'], job['ids'],
+          [{'source': 'vault/a.md', 'filename': 'a.md', 'speaker': 'human', 'timestamp': 1.0e9,
+            'conversation_turn': i, 'chunk_id': 0} for i in range(len(job['ids']))])
+if job['compact']:
+    store.compact()
+store.save()
+store.close()
+if job['publish']:
+    publish_index(store, backend=job['backend'], model='test', dim=%d, quantization='none', shards=1)
+""" % DIM
+
+
+def vectors(count, seed):
+    rows = np.random.default_rng(seed).normal(size=(count, DIM))
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).tolist()
+
+
+def write(backend, ids, rows, delete=(), compact=False, publish=True):
+    job = {'backend': backend, 'ids': ids, 'vectors': rows, 'delete': list(delete),
+           'compact': compact, 'publish': publish}
+    subprocess.run([sys.executable, "-c", WRITER, json.dumps(job)], check=True,
+                   env={'PYTHONPATH': str(SRC), 'PATH': ''}, capture_output=True)
+
+
+def top_hit(state, vector):
+    results = state.search("", 1, -10.0, "semantic", None, vector)
+    return results[0]['id'], results[0]['score']
+
+
+@pytest.mark.parametrize("backend", ["chroma", "flat"])
+def test_reader_serves_rows_written_and_compacted_by_another_process(tmp_path, monkeypatch, backend):
+    from search_daemon import SearchState
+
+    monkeypatch.chdir(tmp_path)
+    old = vectors(20, seed=0)
+    write(backend, [f"t{i}" for i in range(20)], old)
+
+    state = SearchState()
+    assert top_hit(state, old[0])[0] == "t0"
+
+    new = vectors(20, seed=1)
+    write(backend, [f"n{i}" for i in range(20)], new)
+    assert top_hit(state, new[15]) == ("n15", pytest.approx(1.0, abs=1e-3))
+
+    late = vectors(1, seed=2)
+    before = state.view
+    write(backend, ["late"], late, delete=[f"t{i}" for i in range(10)], compact=True)
+    assert top_hit(state, late[0]) == ("late", pytest.approx(1.0, abs=1e-3))
+    assert top_hit(state, old[3])[0] != "t3"
+    # A search still running on the view from before compaction keeps its files
+    assert before.vectordb.search(old[3], k=1)[0][0] == "t3"
+
+
+def test_chroma_reader_sees_whole_passes_and_frees_superseded_generations(tmp_path, monkeypatch):
+    from search_daemon import SearchState
+    from vector_store import chroma_generations
+
+    monkeypatch.chdir(tmp_path)
+    old = vectors(20, seed=0)
+    write("chroma", [f"t{i}" for i in range(20)], old)
+    state = SearchState()
+    assert top_hit(state, old[0])[0] == "t0"
+
+    # A pass that has not been published yet is invisible, even to a new reader
+    new = vectors(20, seed=1)
+    write("chroma", [f"n{i}" for i in range(20)], new, delete=["t0"], publish=False)
+    assert top_hit(SearchState(), old[0])[0] == "t0"
+    assert top_hit(state, old[0])[0] == "t0"
+
+    # Publishing picks up the interrupted pass; the open generation survives it
+    write("chroma", [], [])
+    assert sorted(chroma_generations(tmp_path / "data" / "chroma_db")) == [1, 2]
+    assert top_hit(state, new[15]) == ("n15", pytest.approx(1.0, abs=1e-3))
+    assert top_hit(state, old[0])[0] != "t0"
+
+    # The reader moved on, so the next pass deletes generation 1
+    write("chroma", [], [])
+    assert sorted(chroma_generations(tmp_path / "data" / "chroma_db")) == [2, 3]
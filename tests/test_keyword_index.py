@@ -0,0 +1,46 @@
+from keyword_index import KeywordIndex, SubstringIndex
+
+
+def metadata(i):
+    return {'source': 'vault/a.md', 'filename': 'a.md', 'speaker': 'human', 'timestamp': 1.0e9 + i,
+            'conversation_turn': i, 'chunk_id': 0}
+
+
+def check_readers(path):
+    """Every reader opened now returns each hit's own text"""
+    index = KeywordIndex.load(path)
+    hits = index.search("survivor", k=50)
+    assert len(hits) == 10
+    for record in index.fetch([doc for doc, _ in hits]):
+        assert record['text'] == f"chunk {record['id']} survivor"
+
+    substring = SubstringIndex.open(path)
+    hits = substring.search("survivor", k=50)
+    assert len(hits) == 10
+    for record in substring.fetch([doc for doc, _ in hits]):
+        assert record['text'] == f"chunk {record['id']} survivor"
+    substring.close()
+
+
+def test_readers_never_mix_files_of_two_compactions(tmp_path, monkeypatch):
+    path = tmp_path / "keyword_index"
+    index = KeywordIndex(path)
+    ids = [f"c{i}" for i in range(30)]
+    index.add(ids, [f"chunk c{i} {'survivor' if i % 3 == 0 else 'doomed'}" for i in range(30)],
+              [metadata(i) for i in range(30)])
+    index.save()
+    index.remove([doc_id for i, doc_id in enumerate(ids) if i % 3])
+
+    publish = KeywordIndex._publish
+
+    def publish_checking(staged):
+        for pair in staged:
+            publish([pair])
+            check_readers(path)
+
+    monkeypatch.setattr(KeywordIndex, '_publish', staticmethod(publish_checking))
+    index.compact()
+    index.close()
+
+    assert sorted(p.name for p in path.iterdir()) == [
+        "columns.1.bin", "docs.1.jsonl", "fold.1.bin", "index.1.pkl", "tables.json"]
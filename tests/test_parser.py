@@ -0,0 +1,42 @@
+from index_conversations import ClaudeChatLoader
+
+
+def parse(text):
+    return list(ClaudeChatLoader()._iter_conversation_turns(text.splitlines(keepends=True)))
+
+
+def test_metadata_word_inside_a_turn_is_content():
+    turns = parse(
+        "Human: Why is this slow?\n"
+        "\n"
+        "Claude: The loop copies the list.\n"
+        "\n"
+        "Updated: I changed the loop to use a generator.\n"
+    )
+
+    assert [turn['speaker'] for turn in turns] == ['human', 'claude']
+    assert turns[1]['content'].endswith("Updated: I changed the loop to use a generator.")
+
+
+def test_dated_header_inside_a_turn_is_still_metadata():
+    turns = parse(
+        "Human: First question\n"
+        "\n"
+        "Date: 2024-05-01\n"
+        "\n"
+        "Human: Second question\n"
+    )
+
+    assert [turn['content'] for turn in turns] == ["First question", "Second question"]
+
+
+def test_date_header_right_after_a_title():
+    turns = parse(
+        "# Career chat\n"
+        "Date: 2024-05-01\n"
+        "\n"
+        "Human: How do I prepare?\n"
+    )
+
+    assert [turn['speaker'] for turn in turns] == ['human']
+    assert turns[0]['timestamp'] == turns[0]['conversation_timestamp'] > 0
@@ -0,0 +1,67 @@
+import asyncio
+import json
+from typing import Optional
+
+from search_api import HTTPServer, SearchAPI
+
+
+class EmptyState:
+    """SearchState before anything has been indexed"""
+    vectordb = None
+
+    def refresh(self):
+        return self
+
+
+class NoModel:
+    async def embed(self, query):
+        return [0.0]
+
+    def close(self):
+        pass
+
+
+def request(body: bytes, target: str = "/search", request_line: Optional[str] = None,
+            length: Optional[str] = None):
+    async def run():
+        api = SearchAPI(EmptyState(), NoModel())
+        reader = asyncio.StreamReader()
+        reader.feed_data(body)
+        reader.feed_eof()
+        try:
+            status, payload, _ = await HTTPServer(api).dispatch(
+                (request_line or f"POST {target} HTTP/1.1").encode(),
+                {'content-length': str(len(body)) if length is None else length}, reader)
+        finally:
+            api.close()
+        return status, json.loads(payload)
+
+    return asyncio.run(run())
+
+
+def test_body_that_is_not_an_object_is_a_bad_request():
+    assert request(b"5")[0] == 400
+    assert request(b'["query"]')[0] == 400
+    assert request(b'{"query": "x", "filters": 5}')[0] == 400
+
+
+def test_malformed_request_line_is_a_bad_request():
+    status, payload = request(b"", request_line="GET/search")
+
+    assert status == 400
+    assert payload['error'] == "malformed request line"
+
+
+def test_non_integer_content_length_is_a_bad_request():
+    status, payload = request(b'{"query": "x"}', length="ten")
+
+    assert status == 400
+    assert payload['error'] == "Content-Length must be an integer"
+    assert request(b'{"query": "x"}', length="-5")[0] == 400
+
+
+def test_search_without_an_index_is_unavailable():
+    status, payload = request(b'{"query": "docker networking"}')
+
+    assert status == 503
+    assert "index_conversations.py" in payload['error']
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from search_filters import SearchFilters, parse_time_bound, parse_until
+
+
+def test_until_date_covers_the_whole_day():
+    filters = SearchFilters(until=parse_until("2024-06-30"))
+
+    assert filters.matches(datetime(2024, 6, 30, 23, 59, 59).timestamp(), 'human', 'a.md')
+    assert not filters.matches(datetime(2024, 7, 1).timestamp(), 'human', 'a.md')
+
+
+def test_until_with_a_time_is_exact():
+    assert parse_until("2024-06-30 12:00") == datetime(2024, 6, 30, 12).timestamp()
+
+
+def test_since_date_starts_at_midnight():
+    assert parse_time_bound("2024-06-30") == datetime(2024, 6, 30).timestamp()
+
+
+def test_relative_ages_are_not_rounded():
+    assert parse_time_bound("2d", now=1_000_000.0) == 1_000_000.0 - 2 * 86400
+    assert parse_time_bound("2d", now=1_000_000.0, upper=True) == 1_000_000.0 - 2 * 86400